@@ -0,0 +1,116 @@
+from datetime import date
+from typing import NamedTuple, Optional, Tuple
+
+from sqlalchemy import String, case, cast, func, select
+from sqlalchemy.orm import Session
+
+from models import Movement, MovementRollup
+from utils import dias_do_mes
+
+# -----------------------------
+# Resultados (pequenos e imutáveis)
+# -----------------------------
+class KindTotals(NamedTuple):
+    receitas: float
+    despesas: float
+    count: int
+
+    @property
+    def saldo(self) -> float:
+        return self.receitas - self.despesas
+
+class PeriodTotalsRow(NamedTuple):
+    period: str          # 'AAAA-MM' ou 'AAAA-MM-DD'
+    receitas: float
+    despesas: float
+    count: int
+
+class BucketTotalsRow(NamedTuple):
+    bucket_id: Optional[int]
+    receitas: float
+    despesas: float
+    count: int
+
+def _sum_kind(kind: str):
+    return func.coalesce(func.sum(case((Movement.kind == kind, Movement.amount), else_=0.0)), 0.0)
+
+def _totals_columns():
+    return (_sum_kind("Receita"), _sum_kind("Despesa"), func.count(Movement.id))
+
+def _where_range(stmt, uid: int, start: Optional[date], end: Optional[date]):
+    stmt = stmt.where(Movement.user_id == uid)
+    if start is not None:
+        stmt = stmt.where(Movement.date >= start)
+    if end is not None:
+        stmt = stmt.where(Movement.date <= end)
+    return stmt
+
+def _year_month(col):
+    return func.substr(cast(col, String), 1, 7)
+
+# -----------------------------
+# Rollup mensal (movement_rollups): O(meses) em vez de O(movimentações)
+# -----------------------------
+def _use_rollup(db: Session, start: Optional[date], end: Optional[date]) -> bool:
+    """Só períodos de meses inteiros podem vir do rollup (e só no SQLite, onde há triggers)."""
+    if db.get_bind().dialect.name != "sqlite":
+        return False
+    if start is not None and start.day != 1:
+        return False
+    if end is not None and end.day != dias_do_mes(end):
+        return False
+    return True
+
+def _rollup_sum_kind(kind: str):
+    return func.coalesce(func.sum(case((MovementRollup.kind == kind, MovementRollup.total), else_=0.0)), 0.0)
+
+def _rollup_totals_columns():
+    return (_rollup_sum_kind("Receita"), _rollup_sum_kind("Despesa"),
+            func.coalesce(func.sum(MovementRollup.count), 0))
+
+def _rollup_where(stmt, uid: int, start: Optional[date], end: Optional[date]):
+    stmt = stmt.where(MovementRollup.user_id == uid)
+    if start is not None:
+        stmt = stmt.where(MovementRollup.year_month >= f"{start:%Y-%m}")
+    if end is not None:
+        stmt = stmt.where(MovementRollup.year_month <= f"{end:%Y-%m}")
+    return stmt
+
+# -----------------------------
+# Consultas
+# -----------------------------
+def totals_by_kind(db: Session, uid: int, start: Optional[date] = None, end: Optional[date] = None) -> KindTotals:
+    """Receitas, despesas e quantidade de movimentações no período (datas inclusivas)."""
+    if _use_rollup(db, start, end):
+        row = db.execute(_rollup_where(select(*_rollup_totals_columns()), uid, start, end)).one()
+    else:
+        row = db.execute(_where_range(select(*_totals_columns()), uid, start, end)).one()
+    return KindTotals(*row)
+
+def totals_by_month(db: Session, uid: int, start: Optional[date] = None,
+                    end: Optional[date] = None) -> Tuple[PeriodTotalsRow, ...]:
+    if _use_rollup(db, start, end):
+        ym = MovementRollup.year_month
+        stmt = _rollup_where(select(ym, *_rollup_totals_columns()), uid, start, end).group_by(ym).order_by(ym)
+        return tuple(map(PeriodTotalsRow._make, db.execute(stmt).tuples()))
+    ym = _year_month(Movement.date).label("ym")
+    stmt = _where_range(select(ym, *_totals_columns()), uid, start, end).group_by(ym).order_by(ym)
+    return tuple(map(PeriodTotalsRow._make, db.execute(stmt).tuples()))
+
+def totals_by_day(db: Session, uid: int, start: Optional[date] = None,
+                  end: Optional[date] = None) -> Tuple[PeriodTotalsRow, ...]:
+    day = cast(Movement.date, String).label("day")
+    stmt = _where_range(select(day, *_totals_columns()), uid, start, end).group_by(day).order_by(day)
+    return tuple(map(PeriodTotalsRow._make, db.execute(stmt).tuples()))
+
+def totals_by_bucket(db: Session, uid: int, start: Optional[date] = None,
+                     end: Optional[date] = None) -> Tuple[BucketTotalsRow, ...]:
+    if _use_rollup(db, start, end):
+        # bucket_id 0 no rollup = movimentação sem balde
+        bucket = case((MovementRollup.bucket_id == 0, None), else_=MovementRollup.bucket_id)
+        stmt = (_rollup_where(select(bucket, *_rollup_totals_columns()), uid, start, end)
+                .group_by(MovementRollup.bucket_id))
+        return tuple(map(BucketTotalsRow._make, db.execute(stmt).tuples()))
+    stmt = (_where_range(select(Movement.bucket_id, *_totals_columns()), uid, start, end)
+            .group_by(Movement.bucket_id))
+    return tuple(map(BucketTotalsRow._make, db.execute(stmt).tuples()))
@@ -0,0 +1,99 @@
+"""Rateio em lote de entradas/saídas pelos baldes (NumPy + um INSERT e um UPDATE)."""
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import case, func, insert, update
+from sqlalchemy.orm import Session
+
+from balances import record_deltas
+from models import Bucket, Movement
+from money import from_cents, to_cents
+
+class Entry(NamedTuple):
+    valor: float
+    tipo: str          # "Entrada" ou "Saída"
+    data: date
+    desc: str = ""
+
+class Allocation(NamedTuple):
+    movements: int
+    deltas: Dict[int, int]   # bucket_id -> variação de saldo em centavos
+
+def split_cents(cents: np.ndarray, weights: Sequence[float]) -> np.ndarray:
+    """Maior resto vetorizado: matriz (entradas x baldes) de centavos; cada linha soma a entrada.
+
+    Mesmo resultado de money.allocate_cents linha a linha (inclusive no desempate).
+    """
+    w = np.clip(np.asarray(weights, dtype=np.float64), 0.0, None)
+    soma = w.sum()
+    if soma <= 0:
+        raise ValueError("A soma dos pesos deve ser maior que zero.")
+    cents = np.asarray(cents, dtype=np.int64)
+    sinal = np.where(cents < 0, -1, 1)
+    total = np.abs(cents)
+    exatas = total[:, None] * w[None, :] / soma
+    partes = np.floor(exatas).astype(np.int64)
+    sobra = total - partes.sum(axis=1)
+    ordem = np.argsort(partes - exatas, axis=1, kind="stable")
+    posicao = np.empty_like(ordem)
+    np.put_along_axis(posicao, ordem, np.broadcast_to(np.arange(w.size), ordem.shape), axis=1)
+    partes += posicao < sobra[:, None]
+    return partes * sinal[:, None]
+
+def _kind(tipo: str) -> str:
+    return "Receita" if tipo == "Entrada" else "Despesa"
+
+def allocate_entries(db: Session, user_id: int, buckets: Sequence, entries: Iterable[Entry],
+                     bucket_id: Optional[int] = None) -> Allocation:
+    """Grava o rateio de várias entradas: um executemany de movements e um UPDATE ... CASE de saldos.
+
+    As variações por dia também vão para o log de saldos (balances.record_deltas).
+
+    Com `bucket_id`, cada entrada vai inteira para aquele balde; sem ele, é dividida
+    pelos percentuais. Não faz commit.
+    """
+    entries = list(entries)
+    if not entries:
+        return Allocation(0, {})
+    cents = np.fromiter((to_cents(e.valor) for e in entries), dtype=np.int64, count=len(entries))
+    # Entrada soma no saldo, saída subtrai
+    sinal = np.fromiter((1 if e.tipo == "Entrada" else -1 for e in entries), dtype=np.int64, count=len(entries))
+
+    if bucket_id is not None:
+        alvo = [b for b in buckets if b.id == bucket_id]
+        if not alvo:
+            raise ValueError("Balde inválido.")
+        partes = cents[:, None]
+        rotulos = [""]
+    else:
+        alvo = list(buckets)
+        partes = split_cents(cents, [b.percent for b in alvo])
+        rotulos = [f" (auto {b.percent:.1f}%)" for b in alvo]
+
+    rows: List[dict] = []
+    for i, e in enumerate(entries):
+        kind = _kind(e.tipo)
+        for j, b in enumerate(alvo):
+            c = int(partes[i, j])
+            if c:
+                rows.append({"user_id": user_id, "bucket_id": b.id, "kind": kind,
+                             "amount": from_cents(c), "description": f"{e.desc}{rotulos[j]}", "date": e.data})
+    if rows:
+        db.execute(insert(Movement.__table__), rows)  # executemany do Core, sem o bulk do ORM
+
+    variacoes = partes * sinal[:, None]
+    totais = variacoes.sum(axis=0)
+    deltas = {b.id: int(d) for b, d in zip(alvo, totais) if d}
+    if deltas:
+        # Centavos crus no CASE: a coluna é INTEGER, sem passar pelo Cents
+        db.execute(
+            update(Bucket)
+            .where(Bucket.user_id == user_id, Bucket.id.in_(list(deltas)))
+            .values(balance=func.coalesce(Bucket.balance, 0) + case(deltas, value=Bucket.id, else_=0))
+            .execution_options(synchronize_session=False)
+        )
+        # Histórico por dia de cada entrada (balances.py)
+        record_deltas(db, user_id, ((b.id, e.data, variacoes[i, j])
+                                    for i, e in enumerate(entries) for j, b in enumerate(alvo)))
+    return Allocation(len(rows), deltas)
@@ -1,33 +1,14 @@
-
 from typing import Optional
-import re
-from babel.numbers import format_currency
-
-def _to_float_br(texto: str) -> float:
-    if texto is None:
-        return 0.0
-    s = str(texto).strip()
-    s = re.sub(r"[^0-9,\.]", "", s)
-    if s == "":
-        return 0.0
-    if "," in s and "." in s:
-        s = s.replace(".", "").replace(",", ".")
-    elif "," in s:
-        s = s.replace(",", ".")
-    try:
-        return float(s)
-    except ValueError:
-        return 0.0
 
 def currency_input(label: str, key: str, default: float = 0.0, help: Optional[str] = None) -> float:
     if key not in st.session_state:
         st.session_state[key] = default
     valor_atual = st.session_state.get(key, default)
-    texto_inicial = format_currency(float(valor_atual), 'BRL', locale='pt_BR')
+    texto_inicial = money_br(valor_atual)
     txt = st.text_input(label, value=texto_inicial, key=f"{key}__txt", help=help)
     valor_float = _to_float_br(txt)
     st.session_state[key] = valor_float
-    st.caption(f"Valor: {format_currency(valor_float, 'BRL', locale='pt_BR')}")
+    st.caption(f"Valor: {money_br(valor_float)}")
     return valor_float
 
 def persisted_number_input(label: str, key: str, default: float = 0.0, **kwargs) -> float:
@@ -40,30 +21,46 @@ def persisted_number_input(label: str, key: str, default: float = 0.0, **kwargs)
 # app.py — DAVI (Streamlit, organizado)
 # ======================================
 
+import json
 import os
-from typing import Optional
-import time
 from datetime import date, timedelta, datetime
 from contextlib import contextmanager
 
-import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
 
-from sqlalchemy import create_engine, select, delete
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import QueuePool
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
 
 from models import (
-    Base, User, UserProfile, Bucket, Giant, Movement, Bill, GiantPayment
-)
-from db_helpers import (
-    init_db_pragmas, delete_giant_safe, distribute_by_buckets,
-    giant_forecast_simple
+    User, UserProfile, Bucket, Giant, Bill, BillRule
 )
+from db_helpers import delete_giant, distribute_by_buckets
 from utils import (
-    money_br, dias_do_mes
+    money_br, dias_do_mes, hash_password, _to_float_br, mes_br
+)
+from money import from_cents
+from importer import import_file, text_stream
+from bootstrap import DB_URL, get_runtime, boot_stats
+from snapshots import (
+    fetch_profile, fetch_buckets, fetch_giants, fetch_giant_totals, fetch_bills, fetch_movements,
+    fetch_ledger_page, LedgerFilter, fetch_bill_rules, fetch_bill_occurrences
+)
+from aggregates import totals_by_kind, totals_by_month, totals_by_day
+from user_cache import (
+    user_cached, invalidate, cache_stats, prefetch,
+    PROFILE, BUCKETS, GIANTS, BILLS, MOVEMENTS, SEARCH
 )
+from search import search
+from forecast import forecast, forecast_inputs
+from recurrence import FREQS, FREQ_LABELS, iter_occurrences, month_window, shift_month, set_status, delete_rule
+from payoff import STRATEGIES, STRATEGY_LABELS, payoff_inputs, simulate, plan_updates, save_plan
+from balances import balance_curve, balances_at, set_balance
+from reconcile import check as check_balances, repair as repair_balances
+from metrics import STORE as METRICS, PHASES, page_run, phase, instrument
+from frames import date_br, recent_frame, monthly_frame, ledger_frame
+from charts import daily_series, daily_chart_png, forecast_figure
+
+money_br = instrument(money_br, "format")   # formatação entra na fase "format" do diagnóstico
 
 # -----------------------------
 # Configuração de página
@@ -76,14 +73,20 @@ st.set_page_config(
     menu_items={'About': 'DAVI — Controle Financeiro Inteligente'}
 )
 
+# -----------------------------
+# Runtime (engine, schema, seed, assets) — uma vez por processo
+# -----------------------------
+RUNTIME = get_runtime(DB_URL)
+engine = RUNTIME.engine
+WRITER = RUNTIME.writer          # toda escrita passa pela fila (writer.py)
+ReadSession = RUNTIME.ReadSession  # loaders leem pelo pool só de leitura (reader.py)
+
 # -----------------------------
 # CSS mobile-first (estilo limpo)
 # -----------------------------
 def load_css():
-    p = "styles.css"
-    if os.path.exists(p):
-        with open(p, "r", encoding="utf-8") as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+    if RUNTIME.css:
+        st.markdown(f"<style>{RUNTIME.css}</style>", unsafe_allow_html=True)
 
 st.markdown("""
 <style>
@@ -97,92 +100,39 @@ st.markdown("""
 load_css()
 
 # -----------------------------
-# Engine / Session (SQLite)
+# Session (SQLite)
 # -----------------------------
-DB_URL = os.getenv("DATABASE_URL", "sqlite:///sql_app.db")
-engine = create_engine(
-    DB_URL,
-    poolclass=QueuePool,
-    pool_size=10,
-    max_overflow=20,
-    connect_args={'check_same_thread': False} if DB_URL.startswith("sqlite") else {},
-    pool_timeout=30,
-    pool_recycle=1800,
-    pool_pre_ping=True,
-    future=True,
-)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False, future=True)
+def write(op):
+    """Roda `op(db)` na fila de escrita do processo (commit em grupo) e devolve o resultado."""
+    with phase("write"):
+        return WRITER.run(op)
 
 @contextmanager
-def get_db() -> Session:
-    """Sessão com commit/rollback automático e limpeza garantida."""
-    session = SessionLocal()
+def read_session() -> Session:
+    """Sessão de leitura sem `st`: os loaders também rodam no prefetch, fora do script."""
+    session = ReadSession()
     try:
         yield session
         session.commit()
-    except Exception as e:
+    except Exception:
         session.rollback()
-        st.error(f"Erro de banco de dados: {e}")
         raise
     finally:
         session.close()
 
-# Cria tabelas e pragmas na primeira carga
-
-Base.metadata.create_all(bind=engine)
-init_db_pragmas(engine)
+@contextmanager
+def get_db() -> Session:
+    """Sessão de leitura (pool somente leitura) das páginas; escritas vão por `write`."""
+    try:
+        with read_session() as session:
+            yield session
+    except Exception as e:
+        st.error(f"Erro de banco de dados: {e}")
+        raise
 
 # =====================
 # Autenticação minimal
 # =====================
-def hash_password(plain: str) -> str:
-    import hashlib
-    return hashlib.sha256(plain.encode("utf-8")).hexdigest()
-
-# --- Seed seguro (não altera estrutura, só cria um usuário se não existir) ---
-def _ensure_default_user():
-    with get_db() as db:
-        exists = db.query(User).first()
-        if not exists:
-            import hashlib
-            demo = User(
-                name="demo",
-                password_hash=hash_password("1234")
-            )
-            db.add(demo)
-            db.commit()
-            st.info("Usuário padrão criado: usuário **demo** / senha **1234**")
-
-_ensure_default_user()
-
-# -----------------------------
-# Matplotlib (tema leve)
-# -----------------------------
-plt.style.use('default')
-plt.rcParams.update({
-    'figure.facecolor': '#FFFFFF',
-    'axes.facecolor':   '#FFFFFF',
-    'axes.grid': True,
-    'grid.alpha': 0.30,
-    'grid.color': '#E5E7EB',
-    'axes.labelcolor': '#111827',
-    'xtick.color': '#6B7280',
-    'ytick.color': '#6B7280',
-    'figure.autolayout': True,
-    'font.size': 10
-})
-
-def date_br(dt):
-    if isinstance(dt, str):
-        try:
-            dt = pd.to_datetime(dt)
-        except Exception:
-            return dt
-    if isinstance(dt, (pd.Timestamp, date, datetime)):
-        return dt.strftime('%d/%m/%y')
-    return str(dt)
-    return hashlib.sha256(plain.encode("utf-8")).hexdigest()
-
 def auth_user(db: Session, username: str, password: str):
 
     u = db.query(User).filter(User.name == username).first()
@@ -206,7 +156,7 @@ def create_user(db: Session, username: str, password: str) -> Optional[User]:
         st.error("Este usuário já existe. Tente outro nome.")
         return None
     u = User(name=uname, password_hash=hash_password(pwd))
-    db.add(u); db.commit(); db.refresh(u)
+    write(lambda w: (w.add(u), w.flush()))
     return u
 
 def init_auth():
@@ -227,6 +177,8 @@ def logout():
 
 def show_login():
     st.markdown("<h1 style='text-align:center'>DAVI</h1><p style='text-align:center;color:#10B981'>Vença seus gigantes financeiros</p>", unsafe_allow_html=True)
+    if RUNTIME.seeded_demo:
+        st.info("Usuário padrão criado: usuário **demo** / senha **1234**")
     tab1, tab2 = st.tabs(["Login", "Cadastro"])
     with tab1:
         with st.form("login"):
@@ -269,45 +221,126 @@ def show_login():
 # =====================
 # Cache de leitura
 # =====================
-@st.cache_data(ttl=300)
+@user_cached(PROFILE, ttl=300)
 def load_profile(uid: int):
-    with get_db() as db:
-        prof = db.execute(select(UserProfile).where(UserProfile.user_id == uid)).scalar_one_or_none()
+    with read_session() as db:
+        prof = fetch_profile(db, uid)
         if not prof:
-            prof = UserProfile(user_id=uid, monthly_income=0.0, monthly_expense=0.0)
-            db.add(prof); db.commit(); db.refresh(prof)
+            write(lambda w: w.add(UserProfile(user_id=uid, monthly_income=0.0, monthly_expense=0.0)))
+            prof = fetch_profile(db, uid)
         return prof
 
-@st.cache_data(ttl=120)
+@user_cached(BUCKETS, ttl=120)
 def load_buckets(uid: int):
-    with get_db() as db:
-        return db.query(Bucket).filter(Bucket.user_id == uid).all()
+    with read_session() as db:
+        return fetch_buckets(db, uid)
 
-@st.cache_data(ttl=120)
+@user_cached(BUCKETS, ttl=120)
+def load_balance_curve(uid: int, inicio: Optional[date] = None, fim: Optional[date] = None):
+    """Saldo por balde no período (balances.py): diário com limites, mensal em "Tudo"."""
+    with read_session() as db:
+        return balance_curve(db, uid, inicio, fim)
+
+@user_cached(BUCKETS, ttl=120)
+def load_balances_at(uid: int, quando: date):
+    with read_session() as db:
+        return balances_at(db, uid, quando)
+
+@user_cached(GIANTS, ttl=120)
 def load_giants(uid: int):
-    with get_db() as db:
-        return db.query(Giant).filter(Giant.user_id == uid).all()
+    with read_session() as db:
+        return fetch_giants(db, uid)
 
-@st.cache_data(ttl=120)
-def load_bills(uid: int):
-    with get_db() as db:
-        return db.query(Bill).filter(Bill.user_id == uid).order_by(Bill.due_date.asc()).all()
+@user_cached(GIANTS, ttl=120)
+def load_giant_totals(uid: int):
+    with read_session() as db:
+        return fetch_giant_totals(db, uid)
+
+@user_cached(GIANTS, ttl=120)
+def load_payoff(uid: int, extra: float = 0.0):
+    return simulate(payoff_inputs(load_giants(uid), load_giant_totals(uid)), extra)
 
-@st.cache_data(ttl=120)
+@user_cached(BILLS, ttl=120)
+def load_bills(uid: int):
+    with read_session() as db:
+        return fetch_bills(db, uid)
+
+@user_cached(BILLS, ttl=120)
+def load_bill_rules(uid: int):
+    with read_session() as db:
+        return fetch_bill_rules(db, uid)
+
+@user_cached(BILLS, ttl=120)
+def load_occurrences(uid: int, inicio: date, fim: date):
+    """Ocorrências das contas recorrentes só na janela (recurrence.py)."""
+    with read_session() as db:
+        overrides = fetch_bill_occurrences(db, uid, inicio, fim)
+    return tuple(iter_occurrences(load_bill_rules(uid), overrides, inicio, fim))
+
+@user_cached(MOVEMENTS, ttl=120)
 def load_movements(uid: int, limit: int = 300):
-    with get_db() as db:
-        return db.query(Movement).filter(Movement.user_id == uid).order_by(Movement.date.desc()).limit(limit).all()
+    with read_session() as db:
+        return fetch_movements(db, uid, limit)
+
+@user_cached(SEARCH, ttl=120)
+def load_search(uid: int, texto: str, limit: int = 20, offset: int = 0):
+    with read_session() as db:
+        return search(db, uid, texto, limit, offset)
+
+@user_cached(MOVEMENTS, ttl=120)
+def load_ledger_page(uid: int, flt: LedgerFilter, after=None, limit: int = 50):
+    with read_session() as db:
+        return fetch_ledger_page(db, uid, flt, after, limit)
+
+@user_cached(MOVEMENTS, ttl=120)
+def load_totals(uid: int, inicio: Optional[date] = None, fim: Optional[date] = None):
+    with read_session() as db:
+        return totals_by_kind(db, uid, inicio, fim)
+
+@user_cached(MOVEMENTS, ttl=120)
+def load_monthly_totals(uid: int, inicio: Optional[date] = None, fim: Optional[date] = None):
+    with read_session() as db:
+        return totals_by_month(db, uid, inicio, fim)
+
+@user_cached(MOVEMENTS, ttl=120)
+def load_daily_totals(uid: int, inicio: Optional[date] = None, fim: Optional[date] = None):
+    with read_session() as db:
+        return totals_by_day(db, uid, inicio, fim)
+
+@user_cached(MOVEMENTS, ttl=120)
+def load_daily_chart(uid: int, inicio: Optional[date] = None, fim: Optional[date] = None) -> bytes:
+    """PNG do gráfico de evolução (charts.py); refeito quando as movimentações do usuário mudam ou o ttl vence."""
+    return daily_chart_png(daily_series(load_daily_totals(uid, inicio, fim), inicio, fim))
 
 # =====================
 # Páginas
 # =====================
+PERIODOS = ["Tudo", "Este mês", "Últimos 90 dias", "Este ano"]
+
+def periodo_range(periodo: str, hoje: Optional[date] = None):
+    """(início, fim) inclusivos do período do Dashboard; None = sem limite.
+
+    Períodos de meses inteiros são lidos do rollup mensal (ver aggregates.py).
+    """
+    hoje = hoje or date.today()
+    if periodo == "Este mês":
+        return hoje.replace(day=1), hoje.replace(day=dias_do_mes(hoje))
+    if periodo == "Últimos 90 dias":
+        return hoje - timedelta(days=89), hoje
+    if periodo == "Este ano":
+        return hoje.replace(month=1, day=1), hoje.replace(month=12, day=31)
+    return None, None
+
 def page_dashboard(user: User):
+    import pandas as pd
     st.markdown("## 📊 Visão Geral")
-    movs = load_movements(user.id, 500)
+    periodo = st.selectbox("Período", PERIODOS, key="dashboard_periodo")
+    inicio, fim = periodo_range(periodo)
+    tot = load_totals(user.id, inicio, fim)
 
-    total_in  = sum(m.amount for m in movs if m.kind == "Receita")
-    total_out = sum(m.amount for m in movs if m.kind == "Despesa")
-    saldo     = total_in - total_out
+    total_in  = tot.receitas
+    total_out = tot.despesas
+    saldo     = tot.saldo
 
     c1, c2, c3 = st.columns(3)
     c1.metric("Receitas",  money_br(total_in))
@@ -332,93 +365,180 @@ def page_dashboard(user: User):
         if c3.button("✏️ Editar saldo", key="dashboard_edit_saldo_total"):
             st.session_state["edit_saldo_total"] = True
 
-    if movs:
-        df = pd.DataFrame([{
-            "Data": date_br(m.date), "Tipo": m.kind,
-            "Valor": m.amount if m.kind == "Receita" else -m.amount,
-            "Descrição": m.description
-        } for m in movs]).sort_values("Data")
-
+    if tot.count:
+        # Série diária somada no SQL, em datas de verdade (diária ou semanal) e já renderizada em cache
         st.subheader("📈 Evolução")
-        fig, ax = plt.subplots(figsize=(10,4))
-        df_in  = df[df["Tipo"] == "Receita"]
-        df_out = df[df["Tipo"] == "Despesa"]
-        ax.plot(df_in["Data"],  df_in["Valor"],  color="green", marker="o", label="Receitas")
-        ax.plot(df_out["Data"], -df_out["Valor"], color="red",   marker="o", label="Despesas")
-        ax.legend(); ax.grid(True, alpha=.3)
-        ax.spines['top'].set_visible(False); ax.spines['right'].set_visible(False)
-        st.pyplot(fig)
+        with phase("chart"):
+            st.image(load_daily_chart(user.id, inicio, fim), use_column_width=True)
 
         st.subheader("📝 Últimas Movimentações")
-        df_tail = df.tail(12).sort_values("Data", ascending=False).copy()
-        df_tail["Valor"] = df_tail["Valor"].apply(money_br)
-        st.dataframe(df_tail, hide_index=True, use_container_width=True)
+        with phase("dataframe"):
+            st.dataframe(recent_frame(load_movements(user.id, 12)), hide_index=True, use_container_width=True)
     else:
         st.info("Sem movimentações ainda.")
 
+    curva = load_balance_curve(user.id, inicio, fim)
+    if curva.bucket_ids and len(curva.dates) > 1:
+        st.subheader("🪣 Saldo dos baldes")
+        nomes = {b.id: b.name for b in load_buckets(user.id)}
+        with phase("chart"):
+            st.line_chart(pd.DataFrame(curva.balances, index=pd.to_datetime(curva.dates),
+                                       columns=[nomes.get(b, f"#{b}") for b in curva.bucket_ids]))
+
+    with st.expander("🔮 Previsão de caixa (Monte Carlo)"):
+        previsao_ui(user)
+
+def previsao_ui(user: User):
+    """Faixas de saldo por balde e risco das contas em aberto (forecast.py)."""
+    import pandas as pd
+    semanas = st.selectbox("Horizonte", [12, 26, 52], index=2, format_func=lambda w: f"{w} semanas", key="prev_semanas")
+    hoje = date.today()
+    contas = load_bills(user.id) + load_occurrences(user.id, hoje - timedelta(days=31), hoje + timedelta(weeks=semanas))
+    inp = forecast_inputs(load_profile(user.id), load_buckets(user.id), contas, hoje, weeks=semanas)
+    if not inp.weekly_income and not inp.weekly_expense:
+        st.info("Informe renda e despesa mensais em Configurações para gerar a previsão.")
+        return
+    fc = forecast(inp)
+    st.caption(f"{inp.paths:,} cenários · renda ±{inp.income_cv:.0%} e gasto ±{inp.expense_cv:.0%} por semana · "
+               f"calculado em {fc.seconds * 1000:.0f} ms".replace(",", "."))
+
+    opcoes = ["Total"] + list(fc.bucket_names)
+    alvo = st.selectbox("Balde", opcoes, key="prev_balde")
+    serie = fc.total if alvo == "Total" else fc.bands[:, :, opcoes.index(alvo) - 1]
+    with phase("chart"):
+        st.pyplot(forecast_figure(serie, len(fc.weeks), len(fc.percentiles) // 2))
+
+    if fc.bills:
+        with phase("dataframe"):
+            st.dataframe(pd.DataFrame([{
+                "Conta": ("⚠️ " if b.critical else "") + b.title, "Vencimento": date_br(b.due_date),
+                "Valor": money_br(b.amount), "Risco de não pagar": f"{b.p_unpaid:.0%}",
+            } for b in fc.bills]), hide_index=True, use_container_width=True)
+
 def page_plano_ataque(user: User):
+    import pandas as pd
     st.markdown("## 🎯 Plano de Ataque")
     giants = load_giants(user.id)
+    totals = {t.giant_id: t for t in load_giant_totals(user.id)}
 
     rows = []
-    with get_db() as db:
-        for g in giants:
-            total_pago = sum(p.amount for p in db.query(GiantPayment).filter_by(giant_id=g.id).all())
-            restante   = max((g.total_to_pay or 0.0) - total_pago, 0.0)
-            rows.append({"ID": g.id, "Nome": g.name, "Total": g.total_to_pay or 0.0, "Pago": total_pago, "Restante": restante})
-
-    df = pd.DataFrame(rows)
+    for g in giants:
+        t = totals.get(g.id)
+        rows.append({
+            "ID": g.id, "Nome": g.name, "Total": g.total_to_pay or 0.0,
+            "Pago": t.paid if t else 0.0,
+            "Restante": t.remaining if t else (g.total_to_pay or 0.0),
+            "Último pgto": date_br(t.last_payment) if t and t.last_payment else "—",
+        })
+
+    with phase("dataframe"):
+        df = pd.DataFrame(rows)
     if not df.empty:
         df_fmt = df.copy()
         df_fmt["Total"]    = df_fmt["Total"].apply(money_br)
         df_fmt["Pago"]     = df_fmt["Pago"].apply(money_br)
         df_fmt["Restante"] = df_fmt["Restante"].apply(money_br)
-        st.dataframe(df_fmt, hide_index=True, use_container_width=True)
+        with phase("dataframe"):
+            st.dataframe(df_fmt, hide_index=True, use_container_width=True)
     else:
         st.info("Nenhum gigante cadastrado.")
 
     st.caption("Ações")
-    with get_db() as db:
-        for _, r in df.iterrows():
-            c1, c2, c3, c4, c5, c6 = st.columns([2,5,3,3,3,2])
-            with c1: st.write(f"**#{int(r['ID'])}**")
-            with c2: st.write(r["Nome"])
-            with c3: st.write(money_br(r["Total"]))
-            with c4: st.write(money_br(r["Pago"]))
-            with c5: st.write(money_br(r["Restante"]))
-            with c6:
-                b1, b2 = st.columns(2)
-                if b1.button("✏️", key=f"edit_{r['ID']}"):
-                    st.session_state.edit_giant_id = int(r["ID"]); st.rerun()
-                if b2.button("🗑️", key=f"del_{r['ID']}"):
-                    ok = delete_giant_safe(db, user.id, int(r["ID"]))
-                    st.cache_data.clear()
-                    st.rerun()
-
-    st.markdown("### ➕ Novo Gigante")
-    with get_db() as db:
-        with st.form("novo_giant", clear_on_submit=True):
-            nome   = st.text_input("Nome do Gigante", key="novo_giant_nome")
-            total  = currency_input("Total a Quitar", key="novo_giant_total", default=0.0)
-            weekly = currency_input("Meta semanal (R$)", key="novo_giant_weekly", default=0.0)
-            juros  = persisted_number_input("Juros a.m. (%)", key="novo_giant_juros", default=0.0, min_value=0.0, step=0.1, format="%.2f")
-            ok     = st.form_submit_button("Criar")
-
-        if ok:
-            if not nome or total <= 0:
-                st.error("Informe nome e valor > 0.")
-            else:
+    for _, r in df.iterrows():
+        c1, c2, c3, c4, c5, c6 = st.columns([2,5,3,3,3,2])
+        with c1: st.write(f"**#{int(r['ID'])}**")
+        with c2: st.write(r["Nome"])
+        with c3: st.write(money_br(r["Total"]))
+        with c4: st.write(money_br(r["Pago"]))
+        with c5: st.write(money_br(r["Restante"]))
+        with c6:
+            b1, b2 = st.columns(2)
+            if b1.button("✏️", key=f"edit_{r['ID']}"):
+                st.session_state.edit_giant_id = int(r["ID"]); st.rerun()
+            if b2.button("🗑️", key=f"del_{r['ID']}"):
                 try:
-                    g = Giant(user_id=user.id, name=nome, total_to_pay=total,
-                              weekly_goal=weekly, interest_rate=juros,
-                              status="active", priority=1, parcels=0, payoff_efficiency=0.0)
-                    db.add(g); db.commit()
-                    st.success("Gigante criado.")
-                    st.cache_data.clear(); st.rerun()
+                    if write(lambda db: delete_giant(db, user.id, int(r["ID"]))):
+                        st.toast("🗑️ Excluído!")
+                    else:
+                        st.info("Nada foi excluído (já não existia).")
                 except Exception as e:
-                    db.rollback(); st.error(f"Erro ao criar: {e}")
+                    st.error(f"Erro ao excluir: {e}")
+                invalidate(user.id, GIANTS)
+                st.rerun()
+
+    if giants:
+        simulacao_ui(user, giants, totals)
+
+    st.markdown("### ➕ Novo Gigante")
+    with st.form("novo_giant", clear_on_submit=True):
+        nome   = st.text_input("Nome do Gigante", key="novo_giant_nome")
+        total  = currency_input("Total a Quitar", key="novo_giant_total", default=0.0)
+        weekly = currency_input("Meta semanal (R$)", key="novo_giant_weekly", default=0.0)
+        juros  = persisted_number_input("Juros a.m. (%)", key="novo_giant_juros", default=0.0, min_value=0.0, step=0.1, format="%.2f")
+        parcelas   = persisted_number_input("Parcelas restantes (0 = usar meta semanal)", key="novo_giant_parcelas", default=0, min_value=0, step=1)
+        prioridade = persisted_number_input("Prioridade (1 = atacar primeiro)", key="novo_giant_prioridade", default=1, min_value=1, step=1)
+        ok     = st.form_submit_button("Criar")
+
+    if ok:
+        if not nome or total <= 0:
+            st.error("Informe nome e valor > 0.")
+        else:
+            try:
+                g = Giant(user_id=user.id, name=nome, total_to_pay=total,
+                          weekly_goal=weekly, interest_rate=juros,
+                          status="active", priority=int(prioridade), parcels=int(parcelas), payoff_efficiency=0.0)
+                write(lambda db: db.add(g))
+                st.success("Gigante criado.")
+                invalidate(user.id, GIANTS); st.rerun()
+            except Exception as e:
+                st.error(f"Erro ao criar: {e}")
+
+def simulacao_ui(user: User, giants, totals):
+    """Projeção mês a mês com juros em cada estratégia (payoff.py) e gravação no plano."""
+    import pandas as pd
+    st.markdown("### 📈 Simulação de quitação")
+    extra = currency_input("Extra mensal além dos mínimos (R$)", key="sim_extra", default=0.0)
+    sim = load_payoff(user.id, float(extra))
+    if not sim.giant_ids:
+        st.info("Nenhum gigante ativo com saldo a simular.")
+        return
+    st.caption(f"Orçamento mensal: {money_br(sim.budget)} (mínimos + extra), horizonte de 30 anos.")
+
+    with phase("dataframe"):
+        st.dataframe(pd.DataFrame([
+            {"Estratégia": STRATEGY_LABELS[s],
+             "Quita tudo em": mes_br(sim.freedom_month(i)),
+             "Meses": sim.freedom_month(i) if sim.freedom_month(i) > 0 else None,
+             "Juros": money_br(float(sim.interest[i].sum())),
+             "Total pago": money_br(float(sim.paid[i].sum()))}
+            for i, s in enumerate(sim.strategies)
+        ]), hide_index=True, use_container_width=True)
+    fim = max([sim.freedom_month(i) for i in range(len(sim.strategies))] + [1])
+    with phase("chart"):
+        st.line_chart(pd.DataFrame(
+            {STRATEGY_LABELS[s]: sim.remaining[i, :fim + 1] for i, s in enumerate(sim.strategies)}
+        ), height=220)
+
+    escolha = st.selectbox("Estratégia do plano", STRATEGIES, format_func=STRATEGY_LABELS.get, key="sim_estrategia")
+    s = sim.strategies.index(escolha)
+    nomes = {g.id: g.name for g in giants}
+    with phase("dataframe"):
+        st.dataframe(pd.DataFrame([
+            {"Gigante": nomes[gid], "Quitação": mes_br(int(sim.months[s, i])),
+             "Juros": money_br(float(sim.interest[s, i])),
+             "Eficiência": f"{(1 - sim.interest[s, i] / sim.paid[s, i]) * 100:.1f}%" if sim.paid[s, i] > 0 else "—"}
+            for i, gid in enumerate(sim.giant_ids)
+        ]), hide_index=True, use_container_width=True)
+    if st.button("Salvar no plano", key="sim_salvar", help="Grava progresso e eficiência de quitação nos gigantes"):
+        try:
+            n = write(lambda db: save_plan(db, user.id, plan_updates(giants, totals.values(), sim, escolha)))
+            st.toast(f"Plano salvo em {n} gigantes.")
+        except Exception as e:
+            st.error(f"Erro ao salvar: {e}")
+        invalidate(user.id, GIANTS); st.rerun()
 
 def page_baldes(user: User):
+    import pandas as pd
     st.markdown("## 🪣 Baldes")
     with get_db() as db:
         buckets = load_buckets(user.id)
@@ -433,9 +553,9 @@ def page_baldes(user: User):
                 st.error("Informe o nome.")
             else:
                 b = Bucket(user_id=user.id, name=nome, description="", percent=float(perc), type=(tipo or "generic").lower())
-                db.add(b); db.commit()
+                write(lambda db: db.add(b))
                 st.success("Balde criado.")
-                st.cache_data.clear(); st.rerun()
+                invalidate(user.id, BUCKETS); st.rerun()
 
         if buckets:
             st.markdown("### Baldes")
@@ -457,11 +577,11 @@ def page_baldes(user: User):
                 with c5:
                     if st.button("🗑️", key=f"del_balde_{b.id}", help="Excluir balde"):
                         try:
-                            db.delete(b); db.commit()
+                            write(lambda db: db.execute(delete(Bucket).where(Bucket.id == b.id, Bucket.user_id == user.id)))
                             st.success(f"Balde '{b.name}' excluído.")
-                            st.cache_data.clear(); st.rerun()
+                            invalidate(user.id, BUCKETS, MOVEMENTS); st.rerun()
                         except Exception as e:
-                            db.rollback(); st.error(f"Erro ao excluir: {e}")
+                            st.error(f"Erro ao excluir: {e}")
 
             # Formulário de edição de balde, incluindo saldo
             if st.session_state.get("edit_balde_id") is not None:
@@ -474,26 +594,35 @@ def page_baldes(user: User):
                     ok_edit = st.form_submit_button("Salvar alterações")
                     if ok_edit:
                         try:
-                            balde = db.query(Bucket).filter(Bucket.id == st.session_state.edit_balde_id).first()
-                            balde.name = nome_edit
-                            balde.type = tipo_edit
-                            balde.percent = float(perc_edit)
-                            balde.balance = float(saldo_edit)
-                            db.add(balde); db.commit()
+                            bid = st.session_state.edit_balde_id
+                            def editar(w):
+                                w.execute(update(Bucket).where(Bucket.id == bid, Bucket.user_id == user.id)
+                                          .values(name=nome_edit, type=tipo_edit, percent=float(perc_edit)))
+                                # Diferença de saldo vira movimentação de ajuste de hoje (e entra no histórico)
+                                return set_balance(w, user.id, bid, float(saldo_edit), date.today())
+                            write(editar)
                             st.success("Balde editado com sucesso.")
-                            st.cache_data.clear()
+                            invalidate(user.id, BUCKETS, MOVEMENTS)
                             for k in ["edit_balde_id", "edit_balde_nome", "edit_balde_tipo", "edit_balde_perc"]:
                                 st.session_state.pop(k, None)
                             st.rerun()
                         except Exception as e:
-                            db.rollback(); st.error(f"Erro ao editar: {e}")
+                            st.error(f"Erro ao editar: {e}")
+
+            with st.expander("🕰️ Saldo em uma data"):
+                quando = st.date_input("Data", value=date.today(), format="DD/MM/YYYY", key="saldo_em_data")
+                saldos = load_balances_at(user.id, quando)
+                with phase("dataframe"):
+                    st.dataframe(pd.DataFrame([{
+                        "Balde": b.name, "Saldo na data": money_br(saldos.get(b.id, 0.0)), "Saldo atual": money_br(b.balance),
+                    } for b in buckets]), hide_index=True, use_container_width=True)
         else:
             st.info("Nenhum balde cadastrado.")
 
 def page_entradas(user: User):
+    import pandas as pd
     st.markdown("## 💰 Entradas e Saídas")
-    with get_db() as db:
-        buckets = load_buckets(user.id)
+    buckets = load_buckets(user.id)
 
     col1, col2 = st.columns(2)
     with col1:
@@ -506,28 +635,19 @@ def page_entradas(user: User):
             if valor <= 0:
                 st.error("Informe um valor maior que zero.")
             else:
+                def registrar(db):
+                    # Rateio grava as movimentações por balde (que somam o valor) e ajusta os saldos num único UPDATE
+                    return distribute_by_buckets(db, user.id, buckets, float(valor), "Entrada", dt, "Entrada diária", auto=True)
                 try:
-                    with get_db() as db:
-                        mov = Movement(user_id=user.id, kind="Receita", amount=float(valor), description="Entrada (rateada)", date=dt)
-                        db.add(mov); db.commit(); db.refresh(mov)
-                        buckets = load_buckets(user.id)
-                        dist = distribute_by_buckets(db, user.id, buckets, float(valor), "Entrada", dt, "Entrada diária", auto=True)
-                        # Atualiza saldo dos baldes após entrada
-                        for b in buckets:
-                            balde = db.query(Bucket).filter(Bucket.id == b.id).first()
-                            balde.balance += b.percent/100*float(valor)
-                            db.add(balde)
-                        db.commit()
-                        if not dist:
-                            st.error("Falha ao dividir nos baldes.")
-                            return
+                    dist = write(registrar)
                     st.success("✅ Registrado e dividido nos baldes.")
                     # Mostrar quanto cada balde recebeu
                     st.markdown("### Distribuição nos Baldes")
-                    df_dist = pd.DataFrame([{"Balde": b.name, "Recebeu": money_br(b.percent/100*valor)} for b in buckets])
-                    st.dataframe(df_dist, hide_index=True, use_container_width=True)
+                    with phase("dataframe"):
+                        df_dist = pd.DataFrame([{"Balde": b.name, "Recebeu": money_br(from_cents(dist.deltas.get(b.id, 0)))} for b in buckets])
+                        st.dataframe(df_dist, hide_index=True, use_container_width=True)
                     st.toast("💸 Registrado!", icon="💸")
-                    st.cache_data.clear(); st.stop()
+                    invalidate(user.id, BUCKETS, MOVEMENTS); st.stop()
                 except Exception as e:
                     st.error(f"Falha ao registrar: {e}")
 
@@ -547,87 +667,311 @@ def page_entradas(user: User):
             elif not balde_id:
                 st.error("Selecione o balde de origem da saída.")
             else:
+                def registrar_saida(db):
+                    # Debita só o balde escolhido (movimentação + saldo no mesmo rateio)
+                    return distribute_by_buckets(db, user.id, buckets, float(valor_s), "Saída", dt_s, f"Saída do balde {balde_opcoes.get(balde_id, '')}", auto=False, bucket_id=int(balde_id))
                 try:
-                    with get_db() as db:
-                        mov = Movement(user_id=user.id, kind="Despesa", amount=float(valor_s), description=f"Saída ({balde_opcoes.get(balde_id, '')})", date=dt_s)
-                        db.add(mov); db.commit(); db.refresh(mov)
-                        buckets = load_buckets(user.id)
-                        dist = distribute_by_buckets(db, user.id, buckets, float(valor_s), "Saída", dt_s, f"Saída do balde {balde_opcoes.get(balde_id, '')}", auto=True)
-                        # Atualiza saldo do balde escolhido
-                        balde = db.query(Bucket).filter(Bucket.id == int(balde_id)).first()
-                        if balde:
-                            balde.balance -= float(valor_s)
-                            db.add(balde)
-                            db.commit()
-                        if not dist:
-                            st.error("Falha ao dividir nos baldes.")
-                            return
+                    write(registrar_saida)
                     st.success(f"✅ Saída registrada e debitada do balde '{balde_opcoes.get(balde_id, '')}'.")
                     st.toast("💸 Saída registrada!", icon="💸")
-                    st.cache_data.clear(); st.stop()
+                    invalidate(user.id, BUCKETS, MOVEMENTS); st.stop()
                 except Exception as e:
                     st.error(f"Falha ao registrar: {e}")
 
+    with st.expander("📥 Importar extrato (CSV/OFX)"):
+        st.caption("Cada linha vira uma movimentação sem balde. Reimportar o mesmo extrato não duplica lançamentos.")
+        arquivo = st.file_uploader("Arquivo do banco", type=["csv", "ofx", "qfx", "txt"], key="import_arquivo")
+        encoding = st.selectbox("Codificação", ["utf-8", "latin-1"], key="import_encoding")
+        if arquivo is not None and st.button("Importar", key="import_ok"):
+            progresso = st.empty()
+            try:
+                rep = import_file(
+                    engine, user.id, text_stream(arquivo, encoding), arquivo.name, writer=WRITER,
+                    on_batch=lambda r: progresso.caption(f"{r.read} linhas lidas, {r.inserted} inseridas…"),
+                )
+            except Exception as e:
+                st.error(f"Falha ao importar: {e}")
+            else:
+                progresso.empty()
+                c1, c2, c3, c4 = st.columns(4)
+                c1.metric("Inseridas", rep.inserted)
+                c2.metric("Duplicadas", rep.duplicates)
+                c3.metric("Com erro", rep.errors)
+                c4.metric("Linhas/s", f"{rep.rows_per_sec:,.0f}".replace(",", "."))
+                for msg in rep.error_samples:
+                    st.warning(msg)
+            finally:
+                # Lotes já gravados ficam, mesmo se um lote posterior falhar
+                invalidate(user.id, MOVEMENTS)
+
 def page_livro_caixa(user: User):
     st.markdown("## 📚 Livro Caixa")
-    movs = load_movements(user.id, 500)
-    if not movs:
+    busca_ui(user)
+    st.markdown("### Resumo mensal")
+    with phase("dataframe"):
+        st.dataframe(monthly_frame(load_monthly_totals(user.id)), hide_index=True, use_container_width=True)
+
+    st.markdown("### Movimentações")
+    buckets = load_buckets(user.id)
+    nomes = {b.id: b.name for b in buckets}
+    f1, f2, f3, f4, f5 = st.columns([1, 1, 1, 1.3, 2])
+    inicio = f1.date_input("De", value=None, format="DD/MM/YYYY", key="livro_de")
+    fim    = f2.date_input("Até", value=None, format="DD/MM/YYYY", key="livro_ate")
+    tipo   = f3.selectbox("Tipo", ["Todos", "Receita", "Despesa"], key="livro_tipo")
+    balde  = f4.selectbox("Balde", [None, 0] + list(nomes), key="livro_balde",
+                          format_func=lambda b: "Todos" if b is None else ("Sem balde" if b == 0 else nomes.get(b, "")))
+    texto  = f5.text_input("Descrição contém", key="livro_texto")
+    tamanho = st.session_state.get("livro_tamanho", 50)
+    flt = LedgerFilter(inicio, fim, None if tipo == "Todos" else tipo, balde, texto.strip())
+
+    # Pilha de cursores (date, id): cursores[n] abre a página n; zera quando o filtro muda
+    if st.session_state.get("livro_filtro") != (flt, tamanho):
+        st.session_state["livro_filtro"] = (flt, tamanho)
+        st.session_state["livro_cursores"] = [None]
+    cursores = st.session_state["livro_cursores"]
+
+    page = load_ledger_page(user.id, flt, cursores[-1], tamanho)
+    if page.next_cursor is not None:
+        prefetch(load_ledger_page, user.id, flt, page.next_cursor, tamanho)
+
+    if page.rows:
+        with phase("dataframe"):
+            st.dataframe(ledger_frame(page.rows, nomes), hide_index=True, use_container_width=True)
+    else:
         st.info("Sem movimentações.")
+
+    n1, n2, n3, n4 = st.columns([1, 1, 2, 1])
+    if n1.button("◀ Anterior", disabled=len(cursores) == 1, key="livro_anterior", use_container_width=True):
+        cursores.pop(); st.rerun()
+    if n2.button("Próxima ▶", disabled=page.next_cursor is None, key="livro_proxima", use_container_width=True):
+        cursores.append(page.next_cursor); st.rerun()
+    n3.caption(f"Página {len(cursores)}")
+    n4.selectbox("Por página", [25, 50, 100, 200], index=1, key="livro_tamanho", label_visibility="collapsed")
+
+def busca_ui(user: User):
+    """Busca por texto em movimentações e contas, por relevância e paginada."""
+    import pandas as pd
+    termo = st.text_input("🔎 Buscar em movimentações e contas", key="busca_texto", placeholder="ex.: mercado, aluguel")
+    if not termo.strip():
         return
-    # Organiza todas as movimentações em uma tabela única
-    df = pd.DataFrame([
-        {
-            "ID": m.id,
-            "Data": date_br(m.date),
-            "Descrição": m.description,
-            "Tipo": "Receita" if m.kind == "Receita" else "Despesa",
-            "Valor": money_br(m.amount if m.kind == "Receita" else -m.amount)
-        }
-        for m in movs
-    ])
-    st.markdown("### Movimentações")
-    st.dataframe(df, hide_index=True, use_container_width=True)
+    tamanho = 20
+    if st.session_state.get("busca_termo") != termo:
+        st.session_state["busca_termo"] = termo
+        st.session_state["busca_offset"] = 0
+    offset = st.session_state["busca_offset"]
+    res = load_search(user.id, termo, tamanho, offset)
+    if not res.hits:
+        st.info("Nada encontrado.")
+        return
+    with phase("dataframe"):
+        st.dataframe(pd.DataFrame({
+            "Data":      [date_br(h.date) for h in res.hits],
+            "Descrição": [h.text for h in res.hits],
+            "Tipo":      [h.kind for h in res.hits],
+            "Valor":     [money_br(-h.amount if h.kind == "Despesa" else h.amount) for h in res.hits],
+        }), hide_index=True, use_container_width=True)
+    b1, b2, b3 = st.columns([1, 1, 3])
+    if b1.button("◀ Anterior", disabled=offset == 0, key="busca_anterior", use_container_width=True):
+        st.session_state["busca_offset"] = max(offset - tamanho, 0); st.rerun()
+    if b2.button("Próxima ▶", disabled=not res.has_more, key="busca_proxima", use_container_width=True):
+        st.session_state["busca_offset"] = offset + tamanho; st.rerun()
+    b3.caption(f"Resultados {offset + 1}–{offset + len(res.hits)}")
 
 def page_calendario(user: User):
     st.markdown("## 📅 Calendário")
-    with get_db() as db:
-        with st.form("conta"):
-            desc = st.text_input("Descrição", key="conta_desc")
-            val  = currency_input("Valor (R$)", key="conta_val", default=0.0)
-            venc = st.date_input("Vencimento", value=date.today(), key="conta_venc")
-            crit = st.checkbox("Importante", key="conta_crit")
-            ok   = st.form_submit_button("Adicionar")
-        if ok:
-            if not desc.strip() or val <= 0:
-                st.error("Preencha a descrição e valor > 0.")
-            else:
-                bill = Bill(user_id=user.id, title=desc.strip(), amount=float(val), due_date=venc, is_critical=crit, paid=False)
-                db.add(bill); db.commit()
-                st.success("Conta adicionada."); st.cache_data.clear(); st.rerun()
-
-        bills = load_bills(user.id)
-        if bills:
-            df = pd.DataFrame([{
-                "ID": b.id, "Descrição": b.title, "Valor": money_br(b.amount),
-                "Vencimento": date_br(b.due_date), "Importante": "🔴" if b.is_critical else "⚪", "Pago": "✅" if b.paid else "❌"
-            } for b in bills])
-            st.dataframe(df, hide_index=True, use_container_width=True)
+    with st.form("conta"):
+        desc = st.text_input("Descrição", key="conta_desc")
+        val  = currency_input("Valor (R$)", key="conta_val", default=0.0)
+        venc = st.date_input("Vencimento", value=date.today(), key="conta_venc")
+        crit = st.checkbox("Importante", key="conta_crit")
+        repete = st.selectbox("Repetir", ("", ) + FREQS, key="conta_freq",
+                              format_func=lambda f: FREQ_LABELS.get(f, "Não repete"))
+        intervalo = persisted_number_input("A cada (meses/semanas/dias)", key="conta_intervalo", default=1, min_value=1, step=1)
+        ok   = st.form_submit_button("Adicionar")
+    if ok:
+        if not desc.strip() or val <= 0:
+            st.error("Preencha a descrição e valor > 0.")
         else:
-            st.info("Nenhuma conta cadastrada.")
+            if repete:
+                conta = BillRule(user_id=user.id, title=desc.strip(), amount=float(val), is_critical=crit,
+                                 freq=repete, interval=int(intervalo), start_date=venc, day=venc.day)
+            else:
+                conta = Bill(user_id=user.id, title=desc.strip(), amount=float(val), due_date=venc, is_critical=crit, paid=False)
+            write(lambda db: db.add(conta))
+            st.success("Conta adicionada."); invalidate(user.id, BILLS); st.rerun()
+
+    # Visão do mês: contas avulsas + ocorrências das recorrentes só deste mês
+    mes = st.session_state.setdefault("cal_mes", date.today().replace(day=1))
+    c1, c2, c3 = st.columns([1, 3, 1])
+    if c1.button("◀", key="cal_anterior"):
+        st.session_state.cal_mes = shift_month(mes, -1); st.rerun()
+    c2.markdown(f"### {mes.month:02d}/{mes.year}")
+    if c3.button("▶", key="cal_proximo"):
+        st.session_state.cal_mes = shift_month(mes, 1); st.rerun()
+    inicio, fim = month_window(mes.year, mes.month)
+
+    itens = [("bill", b.id, b.due_date, b.title, b.amount, b.is_critical, "paid" if b.paid else "open")
+             for b in load_bills(user.id) if inicio <= b.due_date <= fim]
+    itens += [("rule", o.id, o.due_date, o.title, o.amount, o.is_critical, o.status)
+              for o in load_occurrences(user.id, inicio, fim)]
+    itens.sort(key=lambda i: (i[2], i[0], i[1]))
+    if not itens:
+        st.info("Nenhuma conta neste mês.")
+    situacao = {"open": "❌", "paid": "✅", "skipped": "⏭️"}
+    for origem, cid, venc, titulo, valor, critica, status in itens:
+        k = f"{origem}_{cid}_{venc.isoformat()}"
+        c1, c2, c3, c4, c5 = st.columns([2, 5, 3, 1, 2])
+        c1.write(date_br(venc))
+        c2.write(("🔴 " if critica else "") + titulo + (" 🔁" if origem == "rule" else ""))
+        c3.write(money_br(valor))
+        c4.write(situacao[status])
+        with c5:
+            b1, b2 = st.columns(2)
+            if status == "open":
+                pagar = b1.button("✅", key=f"pagar_{k}", help="Marcar como paga")
+                pular = origem == "rule" and b2.button("⏭️", key=f"pular_{k}", help="Pular esta ocorrência")
+                novo = "paid" if pagar else "skipped" if pular else None
+            else:
+                novo = "open" if b1.button("↩️", key=f"reabrir_{k}", help="Reabrir") else None
+        if novo:
+            try:
+                if origem == "rule":
+                    write(lambda db: set_status(db, user.id, cid, venc, novo))
+                else:
+                    write(lambda db: db.execute(update(Bill).where(Bill.id == cid, Bill.user_id == user.id)
+                                                .values(paid=novo == "paid")))
+            except Exception as e:
+                st.error(f"Erro ao atualizar: {e}")
+            invalidate(user.id, BILLS); st.rerun()
+
+    regras = load_bill_rules(user.id)
+    if regras:
+        with st.expander(f"🔁 Contas recorrentes ({len(regras)})"):
+            for r in regras:
+                c1, c2, c3 = st.columns([6, 3, 1])
+                passo = f"a cada {r.interval} · " if r.interval > 1 else ""
+                c1.write(f"{r.title} — {passo}{FREQ_LABELS.get(r.freq, r.freq)} desde {date_br(r.start_date)}")
+                c2.write(money_br(r.amount))
+                if c3.button("🗑️", key=f"del_regra_{r.id}"):
+                    write(lambda db: delete_rule(db, user.id, r.id))
+                    invalidate(user.id, BILLS); st.rerun()
 
 def page_config(user: User):
+    import pandas as pd
     st.markdown("## ⚙️ Configurações")
     prof = load_profile(user.id)
-    with get_db() as db:
-        with st.form("perfil"):
-            renda = currency_input("Renda Mensal", key="perfil_renda", default=float(prof.monthly_income))
-            desp  = currency_input("Despesa Mensal", key="perfil_desp", default=float(prof.monthly_expense))
-            ok = st.form_submit_button("Salvar")
-        if ok:
-            prof.monthly_income  = float(renda)
-            prof.monthly_expense = float(desp)
-            db.add(prof); db.commit()
-            st.success("Perfil atualizado."); st.cache_data.clear(); st.rerun()
+    with st.form("perfil"):
+        renda = currency_input("Renda Mensal", key="perfil_renda", default=float(prof.monthly_income))
+        desp  = currency_input("Despesa Mensal", key="perfil_desp", default=float(prof.monthly_expense))
+        ok = st.form_submit_button("Salvar")
+    if ok:
+        write(lambda db: db.execute(
+            update(UserProfile).where(UserProfile.id == prof.id)
+            .values(monthly_income=float(renda), monthly_expense=float(desp))
+        ))
+        st.success("Perfil atualizado."); invalidate(user.id, PROFILE); st.rerun()
+
+    with st.expander("🧮 Conferir saldos dos baldes"):
+        st.caption("Compara o saldo de cada balde com a soma das movimentações dele (receitas - despesas) e dos ajustes manuais de saldo.")
+        if st.button("Conferir agora", key="conciliar_conferir"):
+            with get_db() as db:
+                st.session_state["conciliacao"] = check_balances(db, [user.id])
+        drift = st.session_state.get("conciliacao")
+        if drift is not None:
+            if not drift:
+                st.success("Todos os saldos batem com as movimentações.")
+            else:
+                with phase("dataframe"):
+                    st.dataframe(pd.DataFrame([{
+                        "Balde": d.name, "Saldo": money_br(d.balance), "Esperado": money_br(d.expected),
+                        "Diferença": money_br(d.diff),
+                    } for d in drift]), hide_index=True, use_container_width=True)
+                if st.button("Corrigir saldos", key="conciliar_corrigir"):
+                    n = write(lambda db: repair_balances(db, drift))
+                    st.session_state.pop("conciliacao", None)
+                    st.success(f"{n} saldo(s) corrigido(s).")
+                    invalidate(user.id, BUCKETS)
+
+    with st.expander("🩺 Diagnóstico do processo"):
+        with phase("dataframe"):
+            st.dataframe(pd.DataFrame([
+                {"Etapa": k, "Execuções": int(v["runs"]), "Tempo (ms)": round(v["seconds"] * 1000, 1)}
+                for k, v in boot_stats().items()
+            ]), hide_index=True, use_container_width=True)
+        cs = cache_stats()
+        st.caption(
+            f"Cache: {cs['hits']} hits · {cs['misses']} misses · {cs['evictions']} evictions · "
+            f"{cs['entries']} entradas · taxa de acerto {cs['hit_rate']:.0%}"
+        )
+        ws = WRITER.stats()
+        st.caption(
+            f"Escrita: fila {ws['depth']} (máx. {ws['max_depth']}) · {ws['ops']} operações em {ws['batches']} commits "
+            f"(média {ws['avg_batch']:.1f}/commit) · commit {ws['commit_ms_avg']:.1f} ms (p95 {ws['commit_ms_p95']:.1f}) · "
+            f"{ws['retries']} novas tentativas · {ws['failed_ops']} falhas"
+        )
+        if RUNTIME.maintenance is not None:
+            ms = RUNTIME.maintenance.stats()
+            ultima = ms["last"]
+            st.caption(
+                f"Manutenção: banco {ms['db_bytes'] / 1024:,.0f} KB · WAL {ms['wal_bytes'] / 1024:,.0f} KB · "
+                f"{ms['runs']} execuções ({', '.join(f'{k} {v}' for k, v in ms['by_task'].items()) or 'nenhuma'}) · "
+                f"{ms['reclaimed'] / 1024:,.0f} KB recuperados · {ms['errors']} erros"
+                + (f" · última: {ultima.task} em {ultima.seconds * 1000:.0f} ms" if ultima else "")
+            )
+            if ms["auto_vacuum"] not in (None, "INCREMENTAL"):
+                st.warning(f"Vacuum incremental desligado (auto_vacuum={ms['auto_vacuum']}): "
+                           "rode `python maintenance.py --convert` com o app parado.")
+
+# Usuários que veem a página de diagnóstico (ADMIN_USERS=ana,bruno)
+ADMINS = {u.strip() for u in os.getenv("ADMIN_USERS", "").split(",") if u.strip()}
+
+def page_diagnostico(user: User):
+    import pandas as pd
+    st.markdown("## 🩺 Diagnóstico")
+    resumo = METRICS.summary()
+    st.caption(f"Últimas {len(METRICS.runs())} execuções de página neste processo; fases em tempo exclusivo (sem o SQL de dentro).")
+    if resumo:
+        with phase("dataframe"):
+            st.dataframe(pd.DataFrame([{
+                "Página": s.page, "Execuções": s.runs,
+                "p50 (ms)": round(s.p50 * 1000, 1), "p95 (ms)": round(s.p95 * 1000, 1),
+                "Consultas": round(s.queries, 1), "SQL (ms)": round(s.sql_seconds * 1000, 1),
+                **{f"{f.capitalize()} (ms)": round(dict(s.phases).get(f, 0.0) * 1000, 1) for f in PHASES},
+                "Cache": f"{s.cache_hit_rate:.0%}", "Erros": s.errors,
+            } for s in resumo]), hide_index=True, use_container_width=True)
+    else:
+        st.info("Nenhuma execução registrada ainda.")
+
+    st.markdown("### Engines")
+    st.caption(" · ".join(f"{k}: {int(v['queries'])} consultas em {v['seconds'] * 1000:,.0f} ms"
+                          for k, v in sorted(METRICS.engines().items())) or "Sem consultas registradas.")
+
+    lentas = METRICS.slow_queries()
+    if lentas:
+        st.markdown("### Consultas lentas")
+        with phase("dataframe"):
+            st.dataframe(pd.DataFrame([{
+                "ms": round(q.seconds * 1000, 1), "Página": q.page or "—", "Engine": q.engine, "SQL": q.statement,
+            } for q in lentas]), hide_index=True, use_container_width=True)
+
+    with st.expander("Execuções recentes"):
+        with phase("dataframe"):
+            st.dataframe(pd.DataFrame([{
+                "Quando": datetime.fromtimestamp(r.at).strftime("%H:%M:%S"), "Página": r.page,
+                "ms": round(r.seconds * 1000, 1), "Consultas": r.queries, "SQL (ms)": round(r.sql_seconds * 1000, 1),
+                "Cache": f"{r.cache_hits}/{r.cache_hits + r.cache_misses}", "Status": r.status,
+            } for r in reversed(METRICS.runs()[-50:])]), hide_index=True, use_container_width=True)
+
+    c1, c2, c3 = st.columns(3)
+    c1.download_button("⬇️ JSON", data=json.dumps(METRICS.to_json(), ensure_ascii=False, indent=1),
+                       file_name="davi_metrics.json", mime="application/json", key="diag_json")
+    c2.download_button("⬇️ Prometheus", data=METRICS.to_prometheus(),
+                       file_name="davi_metrics.prom", mime="text/plain", key="diag_prom")
+    if METRICS.export_path and c3.button("Exportar agora", key="diag_exportar"):
+        try:
+            st.success(f"Gravado em {METRICS.export()}")
+        except OSError as e:
+            st.error(f"Erro ao exportar: {e}")
 
 # =====================
 # Router principal
@@ -646,36 +990,29 @@ def main():
         if st.button("Sair"):
             logout()
         st.divider()
-        menu = st.radio(
-            "Navegar",
-            ["Dashboard", "Plano de Ataque", "Baldes", "Entradas", "Livro Caixa", "Calendário", "Configurações"],
-            index=0, label_visibility="collapsed"
-        )
-
-    # roteamento
-    if menu == "Dashboard":
-        page_dashboard(user)
-    elif menu == "Plano de Ataque":
-        page_plano_ataque(user)
-    elif menu == "Baldes":
-        page_baldes(user)
-    elif menu == "Entradas":
-        page_entradas(user)
-    elif menu == "Livro Caixa":
-        page_livro_caixa(user)
-    elif menu == "Calendário":
-        page_calendario(user)
-    else:
-        page_config(user)
+        paginas = ["Dashboard", "Plano de Ataque", "Baldes", "Entradas", "Livro Caixa", "Calendário", "Configurações"]
+        if user.name in ADMINS:
+            paginas.append("Diagnóstico")
+        menu = st.radio("Navegar", paginas, index=0, label_visibility="collapsed")
+
+    # roteamento (cada execução de página entra nas métricas de metrics.py)
+    with page_run(menu):
+        if menu == "Dashboard":
+            page_dashboard(user)
+        elif menu == "Plano de Ataque":
+            page_plano_ataque(user)
+        elif menu == "Baldes":
+            page_baldes(user)
+        elif menu == "Entradas":
+            page_entradas(user)
+        elif menu == "Livro Caixa":
+            page_livro_caixa(user)
+        elif menu == "Calendário":
+            page_calendario(user)
+        elif menu == "Diagnóstico":
+            page_diagnostico(user)
+        else:
+            page_config(user)
 
 if __name__ == "__main__":
-    # pragmas (apenas SQLite)
-    try:
-        if DB_URL.startswith("sqlite"):
-            with engine.connect() as c:
-                c.exec_driver_sql("PRAGMA journal_mode=WAL;")
-                c.exec_driver_sql("PRAGMA synchronous=NORMAL;")
-                c.exec_driver_sql("PRAGMA foreign_keys=ON;")
-    except Exception:
-        pass
     main()
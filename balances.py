@@ -0,0 +1,261 @@
+"""Histórico de saldo dos baldes: log de variações (bucket_deltas) + checkpoints mensais.
+
+Toda mudança de `Bucket.balance` também grava a variação no dia em que vale. O
+checkpoint de (balde, mês) guarda a soma das variações até o último dia do
+mês; existe para todo mês que teve variação e é ajustado na mesma transação
+quando entra um lançamento retroativo. O saldo em qualquer data é o último
+checkpoint antes do mês mais as variações do próprio mês: uma busca no índice
+e no máximo um mês de replay, não importa o tamanho do histórico.
+
+Uso: python balances.py --verify     compara saldos e checkpoints com o log de variações
+     python balances.py --rebuild    recalcula os checkpoints do zero (todos os usuários)
+"""
+import os
+import sys
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import groupby
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Date, Integer, and_, bindparam, case, create_engine, delete, func, insert, literal, select, tuple_, type_coerce, update
+from sqlalchemy.engine import Engine
+
+from models import Base, Bucket, BucketCheckpoint, BucketDelta, Cents, Movement
+from money import from_cents, to_cents
+from utils import dias_do_mes
+
+class BalanceCurve(NamedTuple):
+    dates: Tuple[date, ...]
+    bucket_ids: Tuple[int, ...]
+    balances: np.ndarray     # (datas, baldes) saldo em reais no fim de cada data
+
+class BalanceDrift(NamedTuple):
+    bucket_id: int
+    date: Optional[date]     # None = saldo atual (buckets.balance)
+    expected: float
+    actual: float
+
+def month_end(d: date) -> date:
+    return d.replace(day=dias_do_mes(d))
+
+def signed_amount():
+    """Valor da movimentação com sinal: receita soma no saldo do balde, despesa subtrai."""
+    return case((Movement.kind == "Receita", Movement.amount), else_=-Movement.amount)
+
+# -----------------------------
+# Gravação (operações da fila de escrita: sem commit)
+# -----------------------------
+def record_deltas(db, user_id: int, deltas: Iterable[Tuple[int, date, int]], source: str = "rateio") -> int:
+    """Grava variações (balde, dia, centavos) e mantém os checkpoints; retorna as linhas gravadas.
+
+    Quem chama já ajustou `Bucket.balance`; aqui só fica o histórico.
+    """
+    soma: Dict[Tuple[int, date], int] = defaultdict(int)
+    for bucket_id, quando, cents in deltas:
+        soma[(int(bucket_id), quando)] += int(cents)
+    soma = {k: c for k, c in soma.items() if c}
+    if not soma:
+        return 0
+    db.execute(insert(BucketDelta.__table__), [
+        {"user_id": user_id, "bucket_id": b, "date": d, "delta": from_cents(c), "source": source}
+        for (b, d), c in soma.items()
+    ])
+
+    # Checkpoints do mês da variação em diante já a incluem (centavos crus, sem o Cents)
+    cp = BucketCheckpoint.__table__
+    db.execute(
+        update(cp).where(cp.c.bucket_id == bindparam("b"), cp.c.date >= bindparam("d"))
+        .values(balance=cp.c.balance + bindparam("c", type_=Integer)),
+        [{"b": b, "d": d, "c": c} for (b, d), c in soma.items()],
+    )
+
+    # Mês sem checkpoint ainda: checkpoint anterior + variações do mês (inclusive as de agora).
+    # Em ordem de data, um a um: o checkpoint de um mês novo serve de base para o seguinte.
+    fins = sorted({(b, month_end(d)) for b, d in soma}, key=lambda k: (k[1], k[0]))
+    existentes = set(db.execute(
+        select(cp.c.bucket_id, cp.c.date).where(tuple_(cp.c.bucket_id, cp.c.date).in_(fins))
+    ).tuples())
+    for b, fim in fins:
+        if (b, fim) not in existentes:
+            db.execute(insert(cp), [{"bucket_id": b, "date": fim, "user_id": user_id,
+                                     "balance": balance_at(db, b, fim)}])
+    return len(soma)
+
+def set_balance(db, user_id: int, bucket_id: int, saldo: float, quando: date) -> int:
+    """Saldo editado à mão: grava a diferença como ajuste no dia `quando`; retorna a variação em centavos.
+
+    O ajuste fica só no log de variações (source "ajuste"), sem movimentação:
+    não é receita nem despesa. A conciliação (reconcile.py) soma esses ajustes
+    às movimentações do balde.
+    """
+    atual = db.execute(
+        select(Bucket.balance).where(Bucket.id == bucket_id, Bucket.user_id == user_id)
+    ).one_or_none()
+    if atual is None:
+        raise ValueError("Balde não encontrado.")
+    delta = to_cents(saldo) - to_cents(atual[0] or 0.0)
+    if delta:
+        db.execute(
+            update(Bucket).where(Bucket.id == bucket_id, Bucket.user_id == user_id)
+            .values(balance=saldo).execution_options(synchronize_session=False)
+        )
+        record_deltas(db, user_id, [(bucket_id, quando, delta)], "ajuste")
+    return delta
+
+# -----------------------------
+# Consultas
+# -----------------------------
+def balances_at_stmt(when: date):
+    """Saldo de cada balde no fim de `when`: último checkpoint antes do mês + variações do mês."""
+    inicio = when.replace(day=1)
+    checkpoint = (select(BucketCheckpoint.balance)
+                  .where(BucketCheckpoint.bucket_id == Bucket.id, BucketCheckpoint.date < inicio)
+                  .order_by(BucketCheckpoint.date.desc()).limit(1).scalar_subquery())
+    no_mes = (select(func.sum(BucketDelta.delta))
+              .where(BucketDelta.bucket_id == Bucket.id, BucketDelta.date.between(inicio, when))
+              .scalar_subquery())
+    saldo = type_coerce(func.coalesce(checkpoint, 0) + func.coalesce(no_mes, 0), Cents)
+    return select(Bucket.id, saldo).order_by(Bucket.id)
+
+def deltas_stmt(uid: int, start: date, end: date):
+    return (select(BucketDelta.bucket_id, BucketDelta.date, BucketDelta.delta)
+            .where(BucketDelta.user_id == uid, BucketDelta.date.between(start, end)))
+
+def balances_at(db, uid: int, when: date) -> Dict[int, float]:
+    return {b: v for b, v in db.execute(balances_at_stmt(when).where(Bucket.user_id == uid))}
+
+def balance_at(db, bucket_id: int, when: date) -> float:
+    row = db.execute(balances_at_stmt(when).where(Bucket.id == bucket_id)).one_or_none()
+    return row[1] if row else 0.0
+
+def _freeze(dates, ids, cents: np.ndarray) -> BalanceCurve:
+    out = cents / 100
+    out.flags.writeable = False
+    return BalanceCurve(tuple(dates), tuple(ids), out)
+
+def daily_curve(db, uid: int, start: date, end: date) -> BalanceCurve:
+    """Saldo de cada balde dia a dia em [start, end]: um ponto de partida + variações do período."""
+    base = balances_at(db, uid, start - timedelta(days=1))
+    ids = tuple(base)
+    col = {b: j for j, b in enumerate(ids)}
+    dias = max((end - start).days + 1, 0)
+    grade = np.zeros((dias, len(ids)), dtype=np.int64)
+    for b, d, v in db.execute(deltas_stmt(uid, start, end)).tuples():
+        if b in col:
+            grade[(d - start).days, col[b]] += to_cents(v)
+    partida = np.array([to_cents(base[b]) for b in ids], dtype=np.int64)
+    return _freeze((start + timedelta(days=i) for i in range(dias)), ids, partida + np.cumsum(grade, axis=0))
+
+def monthly_curve(db, uid: int, hoje: Optional[date] = None) -> BalanceCurve:
+    """Saldo no fim de cada mês com variação (só checkpoints, sem ler o log) e o saldo de hoje."""
+    hoje = hoje or date.today()
+    atual = balances_at(db, uid, hoje)
+    ids = tuple(atual)
+    col = {b: j for j, b in enumerate(ids)}
+    rows = db.execute(
+        select(BucketCheckpoint.date, BucketCheckpoint.bucket_id, BucketCheckpoint.balance)
+        .where(BucketCheckpoint.user_id == uid, BucketCheckpoint.date < hoje.replace(day=1))
+        .order_by(BucketCheckpoint.date)
+    ).tuples()
+    datas, linhas = [], []
+    saldo = np.zeros(len(ids), dtype=np.int64)
+    for d, grupo in groupby(rows, key=lambda r: r[0]):
+        for _, b, v in grupo:
+            if b in col:
+                saldo[col[b]] = to_cents(v)      # meses sem variação repetem o anterior
+        datas.append(d); linhas.append(saldo.copy())
+    datas.append(hoje); linhas.append(np.array([to_cents(atual[b]) for b in ids], dtype=np.int64))
+    return _freeze(datas, ids, np.vstack(linhas))
+
+def balance_curve(db, uid: int, start: Optional[date], end: Optional[date], hoje: Optional[date] = None) -> BalanceCurve:
+    """Curva do período do Dashboard: diária com limites, mensal (checkpoints) para "Tudo"."""
+    hoje = hoje or date.today()
+    if start is None:
+        return monthly_curve(db, uid, hoje)
+    return daily_curve(db, uid, start, min(end or hoje, hoje))
+
+# -----------------------------
+# Carga inicial, recálculo e conferência
+# -----------------------------
+def backfill(conn, hoje: Optional[date] = None) -> int:
+    """Log inicial a partir das movimentações com balde; a diferença para o saldo atual entra em `hoje`.
+
+    A diferença vai como "historico_gap", não como "ajuste": é divergência que a
+    conciliação (reconcile.py) deve continuar apontando.
+    """
+    hoje = hoje or date.today()
+    cols = ["user_id", "bucket_id", "date", "delta", "source"]
+    sinal = signed_amount()
+    historico = (select(Movement.user_id, Movement.bucket_id, Movement.date, func.sum(sinal), literal("historico"))
+                 .join(Bucket, and_(Bucket.id == Movement.bucket_id, Bucket.user_id == Movement.user_id))
+                 .group_by(Movement.user_id, Movement.bucket_id, Movement.date)
+                 .having(func.sum(sinal) != 0))
+    conn.execute(insert(BucketDelta.__table__).from_select(cols, historico))
+    soma = (select(func.coalesce(func.sum(BucketDelta.delta), 0))
+            .where(BucketDelta.bucket_id == Bucket.id).scalar_subquery())
+    falta = func.coalesce(Bucket.balance, 0) - soma
+    conn.execute(insert(BucketDelta.__table__).from_select(
+        cols, select(Bucket.user_id, Bucket.id, literal(hoje, Date), falta, literal("historico_gap")).where(falta != 0)))
+    return rebuild(conn)
+
+def _expected_checkpoints(conn, user_id: Optional[int] = None) -> Dict[Tuple[int, date], Tuple[int, int]]:
+    """(balde, fim do mês) -> (usuário, centavos) recalculado do log, em uma passada ordenada."""
+    stmt = (select(BucketDelta.bucket_id, BucketDelta.user_id, BucketDelta.date, func.sum(BucketDelta.delta))
+            .group_by(BucketDelta.bucket_id, BucketDelta.user_id, BucketDelta.date)
+            .order_by(BucketDelta.bucket_id, BucketDelta.date))
+    if user_id is not None:
+        stmt = stmt.where(BucketDelta.user_id == user_id)
+    out = {}
+    for (b, uid), grupo in groupby(conn.execute(stmt).tuples(), key=lambda r: (r[0], r[1])):
+        saldo = 0
+        for _, _, d, v in grupo:
+            saldo += to_cents(v)
+            out[(b, month_end(d))] = (uid, saldo)
+    return out
+
+def rebuild(conn, user_id: Optional[int] = None) -> int:
+    """Apaga e recalcula os checkpoints (de um usuário ou de todos); retorna as linhas gravadas."""
+    stmt = delete(BucketCheckpoint.__table__)
+    if user_id is not None:
+        stmt = stmt.where(BucketCheckpoint.user_id == user_id)
+    conn.execute(stmt)
+    rows = [{"bucket_id": b, "date": d, "user_id": uid, "balance": from_cents(c)}
+            for (b, d), (uid, c) in _expected_checkpoints(conn, user_id).items()]
+    if rows:
+        conn.execute(insert(BucketCheckpoint.__table__), rows)
+    return len(rows)
+
+def verify(conn, user_id: Optional[int] = None, tol: float = 0.005) -> List[BalanceDrift]:
+    """Checkpoints e saldos atuais que divergem do log de variações."""
+    drift = []
+    esperado = _expected_checkpoints(conn, user_id)
+    stmt = select(BucketCheckpoint.bucket_id, BucketCheckpoint.date, BucketCheckpoint.balance)
+    soma = (select(func.sum(BucketDelta.delta)).where(BucketDelta.bucket_id == Bucket.id).scalar_subquery())
+    saldos = select(Bucket.id, Bucket.balance, type_coerce(func.coalesce(soma, 0), Cents))
+    if user_id is not None:
+        stmt = stmt.where(BucketCheckpoint.user_id == user_id)
+        saldos = saldos.where(Bucket.user_id == user_id)
+    atual = {(b, d): v for b, d, v in conn.execute(stmt).tuples()}
+    for key in sorted(set(esperado) | set(atual)):
+        e = from_cents(esperado[key][1]) if key in esperado else 0.0
+        a = atual.get(key, 0.0)
+        if key not in esperado or key not in atual or abs(e - a) > tol:
+            drift.append(BalanceDrift(*key, e, a))
+    for b, saldo, log in conn.execute(saldos).tuples():
+        if abs((saldo or 0.0) - log) > tol:
+            drift.append(BalanceDrift(b, None, log, saldo or 0.0))
+    return drift
+
+if __name__ == "__main__":
+    engine: Engine = create_engine(os.getenv("DATABASE_URL", "sqlite:///sql_app.db"), future=True)
+    Base.metadata.create_all(engine)
+    if "--rebuild" in sys.argv:
+        with engine.begin() as conn:
+            print(f"checkpoints recalculados: {rebuild(conn)} linhas")
+    with engine.connect() as conn:
+        drift = verify(conn)
+    for d in drift:
+        print(f"divergência: {d}")
+    print(f"{len(drift)} divergências")
+    sys.exit(1 if drift else 0)
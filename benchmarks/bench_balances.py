@@ -0,0 +1,104 @@
+"""Saldo numa data: checkpoint + replay de um mês vs. somar todo o log de variações.
+
+Uso: python -m benchmarks.bench_balances [anos] [baldes]
+Grava o histórico por allocate_entries (com datas retroativas), confere checkpoints
+e saldos com balances.verify e sai com código 1 se houver divergência, se a busca
+por checkpoint der outro saldo que o replay completo ou se o custo dela crescer
+com o tamanho do histórico.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from allocation import Entry, allocate_entries
+from balances import balances_at, daily_curve, monthly_curve, verify
+from db_helpers import init_db_pragmas
+from migrations import run_migrations
+from models import Base, Bucket, BucketDelta, User
+
+HOJE = date(2026, 10, 15)
+
+def _seed(Session, anos: int, baldes: int, seed: int = 11) -> int:
+    rnd = random.Random(seed)
+    with Session() as db:
+        user = User(name="bench", password_hash="x")
+        db.add(user); db.flush()
+        for i in range(baldes):
+            db.add(Bucket(user_id=user.id, name=f"b{i}", percent=100 / baldes, balance=0.0))
+        db.commit()
+        buckets = db.scalars(select(Bucket).where(Bucket.user_id == user.id)).all()
+        inicio = HOJE - timedelta(days=365 * anos)
+        entradas = [Entry(round(rnd.uniform(5, 900), 2), rnd.choice(("Entrada", "Entrada", "Saída")),
+                          inicio + timedelta(days=rnd.randrange(365 * anos)), "lote")
+                    for _ in range(300 * anos)]
+        # Lotes fora de ordem: cada lote traz datas de todo o histórico (retroativas)
+        for k in range(0, len(entradas), 100):
+            allocate_entries(db, user.id, buckets, entradas[k:k + 100])
+            db.commit()
+        return user.id
+
+def _replay(db, uid: int, when: date):
+    """O jeito caro: soma todas as variações até a data."""
+    return dict(iter(db.execute(
+        select(BucketDelta.bucket_id, func.sum(BucketDelta.delta))
+        .where(BucketDelta.user_id == uid, BucketDelta.date <= when).group_by(BucketDelta.bucket_id)
+    ).tuples()))
+
+def _median_ms(fn, args, repeat: int = 3) -> float:
+    tempos = []
+    for _ in range(repeat):
+        for a in args:
+            t0 = time.perf_counter(); fn(a); tempos.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(tempos)
+
+if __name__ == "__main__":
+    anos = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    baldes = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'b.db')}", future=True)
+        Base.metadata.create_all(engine)
+        run_migrations(engine)
+        init_db_pragmas(engine)
+        Session = sessionmaker(bind=engine, future=True)
+        t0 = time.perf_counter()
+        uid = _seed(Session, anos, baldes)
+        carga = time.perf_counter() - t0
+
+        with engine.connect() as conn:
+            drift = verify(conn)
+        with Session() as db:
+            n = db.scalar(select(func.count()).select_from(BucketDelta))
+            rnd = random.Random(5)
+            datas = [HOJE - timedelta(days=rnd.randrange(365 * anos)) for _ in range(40)]
+            erros = 0
+            for d in datas:
+                rapido, lento = balances_at(db, uid, d), _replay(db, uid, d)
+                erros += any(abs(v - lento.get(b, 0.0)) > 0.005 for b, v in rapido.items())
+            antigas = [HOJE - timedelta(days=365 * anos - 40 + i) for i in range(20)]
+            recentes = [HOJE - timedelta(days=40 - i) for i in range(20)]
+            t_antiga = _median_ms(lambda d: balances_at(db, uid, d), antigas)
+            t_recente = _median_ms(lambda d: balances_at(db, uid, d), recentes)
+            t_replay = _median_ms(lambda d: _replay(db, uid, d), recentes)
+            t_dia = _median_ms(lambda d: daily_curve(db, uid, d - timedelta(days=89), d), recentes[:5])
+            t_mes = _median_ms(lambda d: monthly_curve(db, uid, d), recentes[:5])
+        engine.dispose()
+
+    print(f"{anos} anos, {baldes} baldes: {f'{n:,}'.replace(',', '.')} variações gravadas em {carga:.1f} s")
+    print(f"  saldo numa data (checkpoint)   antiga {t_antiga:7.3f} ms   recente {t_recente:7.3f} ms")
+    print(f"  saldo numa data (replay total) recente {t_replay:7.3f} ms")
+    print(f"  curva diária de 90 dias        {t_dia:7.3f} ms")
+    print(f"  curva mensal (checkpoints)     {t_mes:7.3f} ms")
+    print(f"  divergências: verify {len(drift)}, checkpoint vs. replay {erros} de {len(datas)} datas")
+    if drift or erros:
+        print("ERRO: histórico de saldos inconsistente")
+        sys.exit(1)
+    if t_recente > 3 * t_antiga + 0.5:
+        print("ERRO: custo da consulta cresce com o tamanho do histórico")
+        sys.exit(1)
@@ -0,0 +1,65 @@
+"""Previsão Monte Carlo: tempo de 10k caminhos x 52 semanas, acerto do cache e rateio por faixa vs. por caminho.
+
+Uso: python -m benchmarks.bench_forecast [caminhos] [semanas]
+Sai com código 1 se passar de 200 ms ou se o rateio das faixas divergir do rateio caminho a caminho.
+"""
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+from allocation import split_cents
+from forecast import PERCENTILES, _lognormal, forecast, forecast_inputs, input_key, run_forecast
+
+LIMITE_MS = 200.0
+
+def _inputs(paths: int, weeks: int):
+    hoje = date(2026, 1, 5)
+    profile = SimpleNamespace(monthly_income=6_500.0, monthly_expense=5_200.0)
+    buckets = [SimpleNamespace(id=i, name=f"b{i}", percent=p, balance=400.0 * i)
+               for i, p in enumerate((35, 25, 15, 15, 10), start=1)]
+    bills = [SimpleNamespace(id=i, title=f"conta {i}", due_date=hoje + timedelta(days=9 * i), amount=350.0 + 40 * (i % 5),
+                             is_critical=i % 3 == 0, paid=False) for i in range(1, 40)]
+    return forecast_inputs(profile, buckets, bills, hoje, weeks, paths)
+
+def _per_path(inp, key: str) -> np.ndarray:
+    """Rateio em cada caminho e semana (o caminho caro), mesmos números aleatórios de run_forecast."""
+    rng = np.random.default_rng(int(key[:16], 16))
+    P, W = inp.paths, inp.weeks
+    week_of = [min(max((b[2] - inp.start).days // 7 + 1, 1), W) for b in inp.bills]
+    due = np.zeros(W)
+    np.add.at(due, np.asarray(week_of) - 1, [b[3] for b in inp.bills])
+    net = _lognormal(rng, inp.weekly_income, inp.income_cv, (P, W))
+    net -= _lognormal(rng, inp.weekly_expense, inp.expense_cv, (P, W))
+    net -= due[None, :]
+    pesos = [b[2] for b in inp.buckets]
+    partes = split_cents(np.rint(np.cumsum(net, axis=1).ravel() * 100).astype(np.int64), pesos).reshape(P, W, -1)
+    saldos = np.array([b[3] for b in inp.buckets]) * 100
+    return np.percentile(saldos + partes, PERCENTILES, axis=0) / 100     # (Q, W, B)
+
+if __name__ == "__main__":
+    paths = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    weeks = int(sys.argv[2]) if len(sys.argv) > 2 else 52
+    inp = _inputs(paths, weeks)
+    tempos = [run_forecast(inp).seconds * 1000 for _ in range(5)]
+    t0 = time.perf_counter(); forecast(inp); frio = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter(); fc = forecast(inp); quente = (time.perf_counter() - t0) * 1000
+
+    ref = _per_path(inp, input_key(inp))
+    erro = float(np.abs(fc.bands[:, 1:, :] - ref).max())
+
+    print(f"{paths:,} caminhos x {weeks} semanas, {len(fc.bucket_ids)} baldes, {len(fc.bills)} contas")
+    print(f"  run_forecast   mediana {statistics.median(tempos):7.1f} ms  (mín. {min(tempos):.1f}, máx. {max(tempos):.1f})")
+    print(f"  forecast       1ª {frio:7.1f} ms   repetida {quente:6.3f} ms")
+    print(f"  faixas vs. rateio por caminho: diferença máx. R$ {erro:.2f}")
+    criticas = [b for b in fc.bills if b.critical]
+    print(f"  contas críticas com risco > 50%: {sum(b.p_unpaid > .5 for b in criticas)} de {len(criticas)}")
+    if statistics.median(tempos) > LIMITE_MS:
+        print(f"ERRO: previsão acima de {LIMITE_MS:.0f} ms")
+        sys.exit(1)
+    if erro > 1.0:
+        print("ERRO: rateio das faixas diverge do rateio por caminho")
+        sys.exit(1)
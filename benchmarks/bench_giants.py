@@ -0,0 +1,60 @@
+"""Plano de Ataque: N+1 antigo vs. GROUP BY único (contagem de consultas e tempo).
+
+Uso: python -m benchmarks.bench_giants
+A garantia de consultas constantes na página de verdade fica em tests/test_plano_ataque.py.
+"""
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, User, Giant, GiantPayment
+from snapshots import fetch_giants, fetch_giant_totals
+
+def _seed(engine, giants: int, payments_per_giant: int):
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "name": "bench", "password_hash": "x"}])
+        conn.execute(insert(Giant), [
+            {"id": g, "user_id": 1, "name": f"g{g}", "total_to_pay": 10_000.0, "weekly_goal": 100.0}
+            for g in range(1, giants + 1)
+        ])
+        d0 = date(2022, 1, 1)
+        conn.execute(insert(GiantPayment), [
+            {"user_id": 1, "giant_id": g, "amount": 10.0, "date": d0 + timedelta(days=i)}
+            for g in range(1, giants + 1) for i in range(payments_per_giant)
+        ])
+
+def _old_page(db):
+    rows = []
+    for g in fetch_giants(db, 1):
+        pago = sum(p.amount for p in db.query(GiantPayment).filter_by(giant_id=g.id).all())
+        rows.append((g.id, pago, max(g.total_to_pay - pago, 0.0)))
+    return rows
+
+def _new_page(db):
+    totals = {t.giant_id: t for t in fetch_giant_totals(db, 1)}
+    return [(g.id, totals[g.id].paid, totals[g.id].remaining) for g in fetch_giants(db, 1)]
+
+def measure(giants: int, payments_per_giant: int = 200):
+    engine = create_engine("sqlite://", future=True)
+    Base.metadata.create_all(engine)
+    _seed(engine, giants, payments_per_giant)
+    Session = sessionmaker(bind=engine, future=True)
+    count = [0]
+    event.listen(engine, "before_cursor_execute", lambda *a: count.__setitem__(0, count[0] + 1))
+    out = {}
+    for name, fn in (("N+1", _old_page), ("GROUP BY", _new_page)):
+        with Session() as db:
+            count[0] = 0
+            t0 = time.perf_counter(); result = fn(db); dt = time.perf_counter() - t0
+        out[name] = (count[0], dt, result)
+    assert sorted(out["N+1"][2]) == sorted(out["GROUP BY"][2])
+    engine.dispose()
+    return out
+
+if __name__ == "__main__":
+    for giants in (5, 50, 200):
+        out = measure(giants)
+        print(f"{giants:4} gigantes: " + "  ".join(
+            f"{name}: {q} consultas {dt * 1e3:7.1f} ms" for name, (q, dt, _) in out.items()))
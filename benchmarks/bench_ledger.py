@@ -0,0 +1,70 @@
+"""Livro Caixa: página por OFFSET vs. keyset em (date, id), da primeira à última página.
+
+Uso: python -m benchmarks.bench_ledger [movimentações]
+Sai com código 1 se a página keyset mais funda custar muito mais que a primeira.
+"""
+import sys
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, User, Movement
+from migrations import run_migrations
+from snapshots import LedgerFilter, MovementRow, columns, fetch_ledger_page, _fetch
+
+PAGE = 50
+
+def _seed(engine, n: int):
+    d0 = date(2000, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "name": "bench", "password_hash": "x"}])
+        for i in range(0, n, 50_000):
+            conn.execute(insert(Movement.__table__), [
+                {"user_id": 1, "bucket_id": None, "kind": "Receita" if j % 3 else "Despesa",
+                 "amount": 10.0, "description": f"mov {j}", "date": d0 + timedelta(days=j // 20)}
+                for j in range(i, min(i + 50_000, n))
+            ])
+
+def _offset_page(db, page: int):
+    stmt = (select(*columns(Movement, MovementRow)).where(Movement.user_id == 1)
+            .order_by(Movement.date.desc(), Movement.id.desc()).offset(page * PAGE).limit(PAGE))
+    return _fetch(db, MovementRow, stmt)
+
+def _time(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(); best = min(best, time.perf_counter() - t0)
+    return best
+
+def measure(n: int):
+    engine = create_engine("sqlite://", future=True)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    _seed(engine, n)
+    Session = sessionmaker(bind=engine, future=True)
+    last = n // PAGE - 1
+    with Session() as db:
+        # Cursor da última página: (date, id) da linha logo antes dela na ordem decrescente
+        anchor = _offset_page(db, last - 1)[-1]
+        cursor = (anchor.date, anchor.id)
+        assert fetch_ledger_page(db, 1, LedgerFilter(), cursor, PAGE).rows == _offset_page(db, last)
+        out = {
+            "offset 1ª":   _time(lambda: _offset_page(db, 0)),
+            "offset últ.": _time(lambda: _offset_page(db, last)),
+            "keyset 1ª":   _time(lambda: fetch_ledger_page(db, 1, LedgerFilter(), None, PAGE)),
+            "keyset últ.": _time(lambda: fetch_ledger_page(db, 1, LedgerFilter(), cursor, PAGE)),
+        }
+    engine.dispose()
+    return last + 1, out
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    pages, out = measure(n)
+    print(f"{n} movimentações, {pages} páginas de {PAGE}")
+    for name, dt in out.items():
+        print(f"  {name:12} {dt * 1e3:8.2f} ms")
+    if out["keyset últ."] > 3 * out["keyset 1ª"] + 0.002:
+        print("ERRO: página keyset funda custa mais que a primeira")
+        sys.exit(1)
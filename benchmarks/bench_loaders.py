@@ -0,0 +1,73 @@
+"""Compara os loaders antigos (ORM + pickle do st.cache_data) com os snapshots.
+
+Uso: python -m benchmarks.bench_loaders [N ...]   (padrão: 10000 100000)
+"""
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, User, Movement
+from snapshots import fetch_movements
+
+def _seed(engine, n: int):
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "name": "bench", "password_hash": "x"}])
+        d0 = date(2020, 1, 1)
+        conn.execute(insert(Movement), [
+            {"user_id": 1, "bucket_id": None, "kind": "Receita" if i % 3 else "Despesa",
+             "amount": float(i % 997) + 0.5, "description": f"mov {i}", "date": d0 + timedelta(days=i % 2000)}
+            for i in range(n)
+        ])
+
+def _old_loader(Session, n):
+    with Session() as db:
+        return db.query(Movement).filter(Movement.user_id == 1).order_by(Movement.date.desc()).limit(n).all()
+
+def _new_loader(Session, n):
+    with Session() as db:
+        return fetch_movements(db, 1, n)
+
+def _best(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(); best = min(best, time.perf_counter() - t0)
+    return best
+
+def _retained(fn):
+    tracemalloc.start()
+    value = fn()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size
+
+def run(n: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", future=True)
+        Base.metadata.create_all(engine)
+        _seed(engine, n)
+        Session = sessionmaker(bind=engine, expire_on_commit=False, future=True)
+
+        old, old_mem = _retained(lambda: _old_loader(Session, n))
+        new, new_mem = _retained(lambda: _new_loader(Session, n))
+        old_blob = pickle.dumps(old, protocol=pickle.HIGHEST_PROTOCOL)
+        new_blob = pickle.dumps(new, protocol=pickle.HIGHEST_PROTOCOL)
+
+        print(f"\n== {n:,} movimentações ==")
+        print(f"{'':24}{'ORM (antigo)':>16}{'snapshot':>16}")
+        print(f"{'carga (ms)':24}{_best(lambda: _old_loader(Session, n)) * 1e3:16.1f}{_best(lambda: _new_loader(Session, n)) * 1e3:16.1f}")
+        # st.cache_data faz pickle na gravação e unpickle a cada hit; o UserCache devolve a referência
+        print(f"{'hit do cache (ms)':24}{_best(lambda: pickle.loads(old_blob)) * 1e3:16.1f}{0.0:16.1f}")
+        print(f"{'memória retida (MB)':24}{old_mem / 2**20:16.1f}{new_mem / 2**20:16.1f}")
+        print(f"{'pickle (MB)':24}{len(old_blob) / 2**20:16.1f}{len(new_blob) / 2**20:16.1f}")
+        engine.dispose()
+
+if __name__ == "__main__":
+    for n in (map(int, sys.argv[1:]) if len(sys.argv) > 1 else (10_000, 100_000)):
+        run(n)
@@ -0,0 +1,86 @@
+"""Latência de leitura conforme o WAL cresce, e depois do checkpoint(TRUNCATE) da manutenção.
+
+Uso: python -m benchmarks.bench_maintenance [movimentações] [atualizações]
+O autocheckpoint é desligado na conexão de escrita para simular o WAL que nunca encolhe.
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from aggregates import totals_by_day
+from db_helpers import init_db_pragmas
+from maintenance import Maintainer
+from models import Base, User, Movement
+from migrations import run_migrations
+from reader import make_read_engine
+from snapshots import LedgerFilter, fetch_ledger_page
+from writer import WriteQueue, make_write_engine
+
+LOTE = 500
+
+def _seed(url: str, n: int):
+    engine = create_engine(url, future=True)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    init_db_pragmas(engine)
+    d0 = date(2015, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "name": "bench", "password_hash": "x"}])
+        conn.execute(insert(Movement.__table__), [
+            {"user_id": 1, "bucket_id": None, "kind": "Receita" if i % 3 else "Despesa",
+             "amount": 10.0, "description": f"mov {i}", "date": d0 + timedelta(days=i // 40)}
+            for i in range(n)
+        ])
+    engine.dispose()
+
+def _read_ms(Session, repeat: int = 20) -> float:
+    """Mediana de uma tela (página do Livro Caixa + resumo diário de um ano), sessão nova a cada vez."""
+    tempos = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        with Session() as db:
+            fetch_ledger_page(db, 1, LedgerFilter(), None, 50)
+            totals_by_day(db, 1, date(2016, 3, 15), date(2017, 3, 14))
+        tempos.append(time.perf_counter() - t0)
+    tempos.sort()
+    return tempos[len(tempos) // 2] * 1000
+
+def measure(n: int, updates: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        url = f"sqlite:///{path}"
+        _seed(url, n)
+        write_engine = make_write_engine(url)
+        event.listen(write_engine, "connect", lambda c, _: c.execute("PRAGMA wal_autocheckpoint=0"))
+        wq = WriteQueue(write_engine)
+        m = Maintainer(wq, path)
+        m.tick(force=True)      # parte de um WAL vazio e banco analisado
+        reader = make_read_engine(url)
+        Session = sessionmaker(bind=reader, future=True)
+        out = [("WAL vazio", m.wal_size(), _read_ms(Session))]
+        marcos = {updates // 4, updates // 2, updates}
+        for i in range(1, updates + 1):
+            lo = (i * LOTE * 7) % n
+            wq.run(lambda db, lo=lo: db.execute(
+                text("UPDATE movements SET description = description || '.' WHERE id > :lo AND id <= :hi"),
+                {"lo": lo, "hi": lo + LOTE}))
+            if i in marcos:
+                out.append((f"{i} lotes", m.wal_size(), _read_ms(Session)))
+        run = m.tick(force=True)[-1]
+        out.append((f"checkpoint ({run.seconds * 1000:.0f} ms)", m.wal_size(), _read_ms(Session)))
+        reader.dispose()
+        wq.close()
+        write_engine.dispose()
+    return out
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    print(f"{n} movimentações; atualizações em lotes de {LOTE} linhas")
+    for nome, wal, ms in measure(n, updates):
+        print(f"  {nome:22} WAL {wal / 2**20:8.1f} MB   tela {ms:7.2f} ms")
@@ -0,0 +1,86 @@
+"""Custo da instrumentação (metrics.py): consultas com e sem os eventos de cursor, fases e contadores.
+
+Uso: python -m benchmarks.bench_metrics [consultas]
+Sai com código 1 se a execução medida não contar todas as consultas, se o tempo
+exclusivo das fases passar do tempo da página ou se o custo por consulta
+instrumentada passar de 50 µs.
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, select
+
+from metrics import MetricsStore, count, install, page_run, phase
+from models import Base, Bucket, User
+
+def _consultas(engine, n: int) -> float:
+    t0 = time.perf_counter()
+    with engine.connect() as conn:
+        for i in range(n):
+            conn.execute(select(Bucket.id, Bucket.balance).where(Bucket.user_id == i % 50)).all()
+    return time.perf_counter() - t0
+
+def _melhor(fn, repeat: int = 5) -> float:
+    return min(fn() for _ in range(repeat))
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    falhas = []
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'm.db')}", future=True)
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(User.__table__.insert(), [{"name": f"u{i}", "password_hash": "x"} for i in range(50)])
+            conn.execute(Bucket.__table__.insert(), [{"user_id": i % 50 + 1, "name": f"b{i}", "percent": 10.0,
+                                                      "balance": 0.0} for i in range(400)])
+
+        sem = _melhor(lambda: _consultas(engine, n))
+        store = MetricsStore()
+        install(engine, "bench", store)
+        fora = _melhor(lambda: _consultas(engine, n))
+
+        def pagina():
+            with page_run("bench", store):
+                return _consultas(engine, n)
+        dentro = _melhor(pagina)
+
+        with page_run("fases", store):
+            with phase("dataframe"):
+                _consultas(engine, 200)
+                with phase("chart"):
+                    time.sleep(.02)
+            for _ in range(1000):
+                count("cache_hits")
+
+        t_fase = []
+        with page_run("vazia", store):
+            for _ in range(20_000):
+                t0 = time.perf_counter()
+                with phase("format"):
+                    pass
+                t_fase.append(time.perf_counter() - t0)
+        engine.dispose()
+
+    runs = {r.page: r for r in store.runs()}
+    bench, fases = runs["bench"], runs["fases"]
+    por_consulta = (dentro - sem) / n * 1e6
+    print(f"{n:,} consultas".replace(",", "."))
+    print(f"  sem eventos                    {sem * 1000:8.1f} ms")
+    print(f"  com eventos, fora de página    {fora * 1000:8.1f} ms   (+{(fora - sem) / n * 1e6:.1f} µs/consulta)")
+    print(f"  com eventos, dentro de página  {dentro * 1000:8.1f} ms   (+{por_consulta:.1f} µs/consulta)")
+    print(f"  phase() vazia                  {statistics.median(t_fase) * 1e6:8.2f} µs")
+    print(f"  execução 'fases': {fases.seconds * 1000:.1f} ms, SQL {fases.sql_seconds * 1000:.1f} ms, "
+          + ", ".join(f"{k} {v * 1000:.1f} ms" for k, v in fases.phases) + f", {fases.cache_hits} acertos")
+
+    if bench.queries != n or fases.queries != 200 or fases.cache_hits != 1000:
+        falhas.append(f"contagem errada: {bench.queries} de {n} consultas, {fases.queries} de 200, {fases.cache_hits} acertos")
+    if fases.sql_seconds + sum(v for _, v in fases.phases) > fases.seconds:
+        falhas.append("fases + SQL maiores que a página (tempo contado duas vezes)")
+    if por_consulta > 50:
+        falhas.append(f"instrumentação custa {por_consulta:.1f} µs por consulta")
+    for f in falhas:
+        print(f"ERRO: {f}")
+    sys.exit(1 if falhas else 0)
@@ -0,0 +1,84 @@
+"""Simulação de quitação: laço Python por gigante/estratégia vs. payoff.simulate vetorizado.
+
+Uso: python -m benchmarks.bench_payoff [gigantes] [meses]
+Sai com código 1 se os resultados divergirem ou se a versão vetorizada passar de 50 ms.
+"""
+import random
+import sys
+import time
+
+import numpy as np
+
+from payoff import STRATEGIES, PayoffInput, _orders, simulate
+
+LIMITE_MS = 50.0
+
+def _giants(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    out = []
+    for i in range(1, n + 1):
+        saldo = rnd.uniform(500, 60_000)
+        rate = rnd.choice((0.0, 0.008, 0.015, 0.03, 0.06))
+        out.append(PayoffInput(i, f"g{i}", saldo, rate, max(saldo * rate * 1.2, saldo / 240), rnd.randint(1, 5)))
+    return out
+
+def reference(giants, extra: float, horizon: int):
+    """Mesmas regras de payoff.simulate, escalar: um gigante por vez, um mês por vez."""
+    orders = _orders(giants, STRATEGIES)
+    budget = sum(g.minimum for g in giants) + extra
+    out = []
+    for s, strategy in enumerate(STRATEGIES):
+        B = [g.balance for g in giants]
+        months = [-1] * len(giants)
+        paid = [0.0] * len(giants)
+        for t in range(horizon):
+            p = []
+            for i, g in enumerate(giants):
+                B[i] += B[i] * g.rate
+                p.append(min(B[i], g.minimum))
+                B[i] -= p[-1]
+                paid[i] += p[-1]
+            pool = budget - sum(p) if strategy != "minimo" else 0.0
+            for i in orders[s]:
+                x = min(pool, B[i])
+                B[i] -= x
+                paid[i] += x
+                pool -= x
+            for i in range(len(giants)):
+                if B[i] <= 0.005:
+                    B[i] = 0.0
+                    if months[i] < 0:
+                        months[i] = t + 1
+            if not any(B):
+                break
+        out.append((months, [pd - max(g.balance - b, 0.0) for pd, g, b in zip(paid, giants, B)]))
+    return out
+
+def _best(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(); best = min(best, time.perf_counter() - t0)
+    return best
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    horizon = int(sys.argv[2]) if len(sys.argv) > 2 else 360
+    giants = _giants(n)
+    extra = 1_500.0
+    r = simulate(giants, extra, horizon)
+    ref = reference(giants, extra, horizon)
+    for s, (months, interest) in enumerate(ref):
+        if list(r.months[s]) != months or not np.allclose(r.interest[s], interest, rtol=1e-9, atol=1e-6):
+            print(f"ERRO: divergência na estratégia {STRATEGIES[s]}")
+            sys.exit(1)
+    t_ref = _best(lambda: reference(giants, extra, horizon), repeat=1)
+    t_vec = _best(lambda: simulate(giants, extra, horizon))
+    print(f"{n} gigantes x {len(STRATEGIES)} estratégias, horizonte de {horizon} meses")
+    for s, name in enumerate(STRATEGIES):
+        fim = r.freedom_month(s)
+        print(f"  {name:10} quita tudo em {fim if fim > 0 else '—':>4} meses   juros {r.interest[s].sum():14,.2f}")
+    print(f"  laço Python  {t_ref * 1e3:8.2f} ms")
+    print(f"  vetorizado   {t_vec * 1e3:8.2f} ms")
+    if t_vec * 1e3 > LIMITE_MS:
+        print(f"ERRO: simulação vetorizada acima de {LIMITE_MS:.0f} ms")
+        sys.exit(1)
@@ -0,0 +1,101 @@
+"""Leituras concorrentes (loaders) com escritas em paralelo: engine compartilhado vs. pool só de leitura.
+
+Uso: python -m benchmarks.bench_readers [threads] [movimentações]
+As configurações se alternam por RODADAS e o resultado é a mediana (a medida é ruidosa).
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from aggregates import totals_by_day, totals_by_month
+from models import Base, User, Movement
+from migrations import run_migrations
+from reader import make_read_engine
+from snapshots import LedgerFilter, fetch_ledger_page
+from writer import WriteQueue, make_write_engine
+
+DURACAO = 3.0
+RODADAS = 3
+
+def _seed(url: str, n: int):
+    engine = create_engine(url, future=True)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    d0 = date(2015, 1, 1)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+        conn.execute(insert(User), [{"id": 1, "name": "bench", "password_hash": "x"}])
+        conn.execute(insert(Movement.__table__), [
+            {"user_id": 1, "bucket_id": None, "kind": "Receita" if i % 3 else "Despesa",
+             "amount": 10.0, "description": f"mov {i}", "date": d0 + timedelta(days=i // 40)}
+            for i in range(n)
+        ])
+    engine.dispose()
+
+def _shared_engine(url: str):
+    """Configuração antiga: um engine para tudo, com pre-ping e sem pragmas de leitura."""
+    return create_engine(url, pool_size=10, max_overflow=20, pool_pre_ping=True, future=True,
+                         connect_args={"check_same_thread": False})
+
+def _leituras(engine, threads: int) -> int:
+    Session = sessionmaker(bind=engine, future=True)
+    fim = time.perf_counter() + DURACAO
+    total = [0]
+    lock = threading.Lock()
+
+    def worker():
+        n = 0
+        while time.perf_counter() < fim:
+            with Session() as db:
+                fetch_ledger_page(db, 1, LedgerFilter(), None, 50)
+                totals_by_month(db, 1, date(2015, 1, 1), date(2018, 12, 31))
+                # Período quebrado: agrega direto de movements (trabalho no SQLite, fora do GIL)
+                totals_by_day(db, 1, date(2015, 3, 15), date(2016, 3, 14))
+            n += 1
+        with lock:
+            total[0] += n
+
+    ts = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return total[0]
+
+def _escritor(url: str, parar: threading.Event):
+    wq = WriteQueue(make_write_engine(url))
+    i = 0
+    while not parar.is_set():
+        wq.run(lambda db, i=i: db.add(Movement(user_id=1, kind="Receita", amount=1.0,
+                                               description=f"w{i}", date=date(2016, 1, 1))))
+        i += 1
+        time.sleep(0.005)
+    wq.close()
+    wq.engine.dispose()
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        _seed(url, n)
+        medidas = {"compartilhado": [], "só leitura": []}
+        for _ in range(RODADAS):
+            for nome, fabrica in (("compartilhado", _shared_engine), ("só leitura", make_read_engine)):
+                engine = fabrica(url)
+                parar = threading.Event()
+                w = threading.Thread(target=_escritor, args=(url, parar))
+                w.start()
+                medidas[nome].append(_leituras(engine, threads) / DURACAO)
+                parar.set(); w.join()
+                engine.dispose()
+        for nome, taxas in medidas.items():
+            print(f"{nome:14} {threads} threads: {statistics.median(taxas):8,.1f} telas/s "
+                  f"(mín. {min(taxas):.1f}, máx. {max(taxas):.1f}; página + resumo mensal + diário)")
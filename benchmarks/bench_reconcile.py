@@ -0,0 +1,101 @@
+"""Conciliação de saldos em escala: execução completa, correção e execução incremental.
+
+Uso: python -m benchmarks.bench_reconcile [usuários] [movimentações por balde]
+Sai com código 1 se a conciliação não achar exatamente os saldos corrompidos, se
+a correção não zerar as divergências ou se a execução incremental olhar
+usuários além dos que tiveram movimentações novas.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, insert, select
+
+from db_helpers import init_db_pragmas
+from migrations import run_migrations
+from models import Base, Bucket, Movement, User
+from reconcile import check, run
+
+BALDES = 4
+
+def _seed(engine, usuarios: int, por_balde: int, corrompidos: int, seed: int = 3):
+    rnd = random.Random(seed)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{"name": f"u{i}", "password_hash": "x"} for i in range(usuarios)])
+        uids = list(conn.execute(select(User.id)).scalars())
+        conn.execute(insert(Bucket.__table__), [{"user_id": u, "name": f"b{j}", "description": "", "percent": 25.0,
+                                                 "balance": 0.0, "type": "generic"} for u in uids for j in range(BALDES)])
+        baldes = conn.execute(select(Bucket.id, Bucket.user_id)).all()
+        saldos, lote = {}, []
+        for bid, uid in baldes:
+            s = 0
+            for _ in range(por_balde):
+                c = rnd.randint(100, 90_000)
+                kind = rnd.choice(("Receita", "Receita", "Despesa"))
+                s += c if kind == "Receita" else -c
+                lote.append({"user_id": uid, "bucket_id": bid, "kind": kind, "amount": c / 100,
+                             "description": "x", "date": date(2025, 1, 1) + timedelta(days=rnd.randrange(600))})
+            saldos[bid] = s
+            if len(lote) >= 20_000:
+                conn.execute(insert(Movement.__table__), lote); lote = []
+        if lote:
+            conn.execute(insert(Movement.__table__), lote)
+        ruins = set(rnd.sample(sorted(saldos), corrompidos))
+        for bid in ruins:
+            saldos[bid] += rnd.choice((-1, 1)) * rnd.randint(1, 50_000)
+        # Saldos gravados direto (sem histórico): é exatamente o que a conciliação deve achar
+        conn.exec_driver_sql("CREATE TEMP TABLE s (id INTEGER PRIMARY KEY, v INTEGER)")
+        conn.exec_driver_sql("INSERT INTO s VALUES " + ",".join(f"({b},{v})" for b, v in saldos.items()))
+        conn.exec_driver_sql("UPDATE buckets SET balance = (SELECT v FROM s WHERE s.id = buckets.id)")
+    return uids, ruins
+
+if __name__ == "__main__":
+    usuarios = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    por_balde = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    corrompidos = max(usuarios // 100, 1)
+    falhas = []
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'r.db')}", future=True)
+        Base.metadata.create_all(engine)
+        run_migrations(engine)
+        init_db_pragmas(engine)
+        t0 = time.perf_counter()
+        uids, ruins = _seed(engine, usuarios, por_balde, corrompidos)
+        print(f"{usuarios:,} usuários x {BALDES} baldes x {por_balde} movimentações em {time.perf_counter() - t0:.1f} s".replace(",", "."))
+
+        with engine.connect() as conn:
+            t0 = time.perf_counter()
+            amostra = uids[:500]
+            for u in amostra:
+                check(conn, [u])
+            t_um = (time.perf_counter() - t0) / len(amostra) * len(uids)
+
+        rel = run(engine, full=True)
+        print(f"  completa, uma consulta por usuário (estimada) {t_um:6.2f} s")
+        print(f"  completa, lotes de usuários                  {rel.seconds:6.2f} s   {len(rel.drift)} divergências")
+        if {d.bucket_id for d in rel.drift} != ruins:
+            falhas.append("divergências encontradas diferentes das corrompidas")
+
+        rel = run(engine, full=True, fix=True)
+        print(f"  completa com correção                        {rel.seconds:6.2f} s   {rel.repaired} corrigidas")
+        rel = run(engine, full=True)
+        if rel.drift:
+            falhas.append(f"{len(rel.drift)} divergências depois da correção")
+
+        # Noite seguinte: poucos usuários com movimentações novas (sem mexer no saldo)
+        tocados = random.Random(9).sample(uids, max(usuarios // 200, 1))
+        with engine.begin() as conn:
+            baldes = dict(conn.execute(select(Bucket.user_id, Bucket.id).where(Bucket.user_id.in_(tocados))).tuples().all())
+            conn.execute(insert(Movement.__table__), [{"user_id": u, "bucket_id": baldes[u], "kind": "Receita", "amount": 10.0,
+                                                       "description": "nova", "date": date(2026, 10, 1)} for u in tocados])
+        rel = run(engine)
+        print(f"  {f'incremental ({rel.users} usuários)':45}{rel.seconds:6.3f} s   {len(rel.drift)} divergências")
+        if rel.full or rel.users != len(tocados) or len(rel.drift) != len(tocados):
+            falhas.append("incremental olhou usuários errados")
+        engine.dispose()
+    for f in falhas:
+        print(f"ERRO: {f}")
+    sys.exit(1 if falhas else 0)
@@ -0,0 +1,49 @@
+"""Contas recorrentes: mês gerado sob demanda vs. materializar todas as ocorrências desde o início.
+
+Uso: python -m benchmarks.bench_recurrence [regras]
+Sai com código 1 se um mês daqui a 20 anos custar muito mais que o mês atual
+(o custo deve depender só das ocorrências da janela).
+"""
+import random
+import sys
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from recurrence import FREQS, iter_dates, iter_occurrences, month_window
+
+def _rules(n: int, seed: int = 3):
+    rnd = random.Random(seed)
+    return [SimpleNamespace(id=i, title=f"conta {i}", amount=100.0 + i, is_critical=i % 4 == 0,
+                            freq=rnd.choice(FREQS), interval=rnd.choice((1, 1, 2, 3)),
+                            start_date=date(2015, 1, 1) + timedelta(days=rnd.randint(0, 3000)),
+                            end_date=None, day=rnd.choice((None, 5, 10, 31)))
+            for i in range(1, n + 1)]
+
+def _materialize(rules, ate: date):
+    """O jeito caro: todas as ocorrências de cada regra, do início até `ate`."""
+    return sorted((d, r.id) for r in rules for d in iter_dates(r, r.start_date, ate))
+
+def _best(fn, repeat: int = 20) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(); best = min(best, time.perf_counter() - t0)
+    return best
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rules = _rules(n)
+    out = {}
+    for nome, (ano, mes) in (("mês atual", (2026, 10)), ("daqui a 20 anos", (2046, 10))):
+        ini, fim = month_window(ano, mes)
+        occ = list(iter_occurrences(rules, (), ini, fim))
+        assert [(o.due_date, o.id) for o in occ] == [x for x in _materialize(rules, fim) if x[0] >= ini]
+        out[nome] = (len(occ), _best(lambda: list(iter_occurrences(rules, (), ini, fim))))
+        total = len(_materialize(rules, fim))
+        t_mat = _best(lambda: _materialize(rules, fim), repeat=3)
+        print(f"{nome:16} {len(occ):4} ocorrências no mês: {out[nome][1] * 1e3:7.3f} ms   "
+              f"materializar {total:6} linhas: {t_mat * 1e3:8.2f} ms")
+    perto, longe = out["mês atual"], out["daqui a 20 anos"]
+    if longe[1] / max(longe[0], 1) > 3 * perto[1] / max(perto[0], 1) + 1e-4:
+        print("ERRO: custo do mês cresce com a idade das regras")
+        sys.exit(1)
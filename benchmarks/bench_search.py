@@ -0,0 +1,93 @@
+"""Busca FTS5: latência de consultas seletivas com 1M de movimentações.
+
+Uso: python -m benchmarks.bench_search [movimentações]
+Sai com código 1 se o p95 das consultas seletivas passar de 10 ms.
+"""
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from models import Base, User, Movement
+from migrations import run_migrations
+from search import search, drop as drop_search, install as install_search
+
+COMUNS = ("compra", "pix", "debito", "transferencia", "pagamento")
+LIMITE_P95 = 0.010
+
+def _palavras(rnd: random.Random, n: int):
+    """Pseudo-palavras (nomes de lojas/cidades): tokens numerados como 'loja1' seriam
+    prefixo de centenas de outros e distorceriam a busca por prefixo."""
+    vistas = set()
+    while len(vistas) < n:
+        vistas.add("".join(rnd.choice("abcdefghijlmnoprstuvz") for _ in range(rnd.randint(5, 10))))
+    return sorted(vistas)
+
+_rnd = random.Random(42)
+LOJAS = _palavras(_rnd, 20_000)
+CIDADES = _palavras(_rnd, 300)
+
+def _seed(engine, n: int):
+    rnd = random.Random(42)
+    d0 = date(2000, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "name": "bench", "password_hash": "x"},
+                                    {"id": 2, "name": "outro", "password_hash": "x"}])
+        # Índice criado depois da carga: bem mais rápido que trigger linha a linha
+        drop_search(conn)
+        for i in range(0, n, 50_000):
+            conn.execute(insert(Movement.__table__), [
+                {"user_id": 1 if j % 10 else 2, "bucket_id": None, "kind": "Despesa", "amount": 10.0,
+                 "description": f"{rnd.choice(COMUNS)} {rnd.choice(LOJAS)} {rnd.choice(CIDADES)}",
+                 "date": d0 + timedelta(days=j // 150)}
+                for j in range(i, min(i + 50_000, n))
+            ])
+        install_search(conn)
+
+def _percentil(amostras, p: float) -> float:
+    s = sorted(amostras)
+    return s[min(int(len(s) * p), len(s) - 1)]
+
+def measure(n: int, consultas: int = 300):
+    engine = create_engine("sqlite://", future=True)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    t0 = time.perf_counter()
+    _seed(engine, n)
+    carga = time.perf_counter() - t0
+    rnd = random.Random(7)
+    grupos = {
+        "loja":          lambda: rnd.choice(LOJAS),
+        "loja + cidade": lambda: f"{rnd.choice(LOJAS)} {rnd.choice(CIDADES)}",
+        "prefixo":       lambda: rnd.choice(LOJAS)[:4],   # ainda digitando
+        "página 3":      lambda: rnd.choice(LOJAS),
+    }
+    out = {}
+    with Session(engine) as db:
+        for nome, gerar in grupos.items():
+            offset = 40 if nome == "página 3" else 0
+            tempos = []
+            for _ in range(consultas):
+                termo = gerar()
+                t = time.perf_counter(); search(db, 1, termo, 20, offset); tempos.append(time.perf_counter() - t)
+            out[nome] = (_percentil(tempos, 0.50), _percentil(tempos, 0.95))
+        # Termo comum (centenas de milhares de ocorrências): informativo, fora do limite
+        t = time.perf_counter(); search(db, 1, "pix", 20); comum = time.perf_counter() - t
+    engine.dispose()
+    return carga, out, comum
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    carga, out, comum = measure(n)
+    print(f"{n} movimentações (carga + índice em {carga:.1f}s)")
+    pior = 0.0
+    for nome, (p50, p95) in out.items():
+        print(f"  {nome:14} p50 {p50 * 1e3:6.2f} ms   p95 {p95 * 1e3:6.2f} ms")
+        pior = max(pior, p95)
+    print(f"  termo comum    {comum * 1e3:6.1f} ms (informativo)")
+    if pior > LIMITE_P95:
+        print(f"ERRO: p95 {pior * 1e3:.2f} ms acima de {LIMITE_P95 * 1e3:.0f} ms")
+        sys.exit(1)
@@ -0,0 +1,89 @@
+"""Partida a frio do app.py: tempo até a tela de login e o que ela importou.
+
+Uso: python -m benchmarks.bench_startup [rodadas] [--json SAIDA.json]
+
+Cada rodada é um processo Python novo que roda o app.py no AppTest sem sessão
+(a tela de login) duas vezes. Por rodada saem:
+  processo        do fork até o fim do processo (interpretador, streamlit, app e saída);
+  primeira tela   o primeiro AppTest.run(): imports do app.py, bootstrap e render do login;
+  rerun           o segundo AppTest.run(), já quente (cada interação na tela de login);
+e os módulos pesados que estavam em sys.modules depois do login. A base é
+criada uma vez antes das rodadas (schema, migrações e usuário demo), para a
+primeira rodada não medir a criação. Sai com código 1 se pandas, matplotlib
+ou babel forem importados pela tela de login.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PESADOS = ("pandas", "numpy", "matplotlib", "matplotlib.pyplot", "babel", "pyarrow")
+PROIBIDOS = ("pandas", "matplotlib", "babel")     # não podem entrar pela tela de login
+
+_FILHO = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+t2 = time.perf_counter()
+ok = any(b.label == "Entrar" for b in at.button) and not at.exception
+at.run()
+t3 = time.perf_counter()
+print(json.dumps({"import_apptest": t1 - t0, "first_render": t2 - t1, "rerun": t3 - t2, "login_ok": ok,
+                  "modules": [m for m in sys.argv[2:] if m in sys.modules]}))
+"""
+
+def _rodada(url: str) -> Dict[str, object]:
+    env = dict(os.environ, DATABASE_URL=url)
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", _FILHO, os.path.join(RAIZ, "app.py"), *PESADOS],
+                          cwd=RAIZ, env=env, capture_output=True, text=True, timeout=600)
+    total = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "processo falhou")
+    r = json.loads(proc.stdout.strip().splitlines()[-1])
+    r["process"] = total
+    return r
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    rodadas = int(args[0]) if args else 5
+    falhas: List[str] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'startup.db')}"
+        _rodada(url)                                  # cria a base; não entra na medida
+        medidas = [_rodada(url) for _ in range(rodadas)]
+
+    def med(k: str) -> float:
+        return statistics.median(m[k] for m in medidas)
+
+    modulos = sorted({m for r in medidas for m in r["modules"]})
+    print(f"{rodadas} processos (mediana, ms):")
+    print(f"  processo              {med('process') * 1000:8.1f}")
+    print(f"  import do AppTest     {med('import_apptest') * 1000:8.1f}   (streamlit; fora do app)")
+    print(f"  primeira tela (login) {med('first_render') * 1000:8.1f}")
+    print(f"  rerun do login        {med('rerun') * 1000:8.1f}")
+    print(f"  módulos pesados após o login: {', '.join(modulos) or 'nenhum'}")
+
+    if not all(r["login_ok"] for r in medidas):
+        falhas.append("a tela de login não apareceu (ou o script levantou exceção)")
+    carregados = [m for m in PROIBIDOS if m in modulos]
+    if carregados:
+        falhas.append(f"a tela de login importou {', '.join(carregados)}")
+    if "--json" in sys.argv:
+        saida = sys.argv[sys.argv.index("--json") + 1]
+        with open(saida, "w", encoding="utf-8") as f:
+            json.dump({"generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "rounds": rodadas,
+                       "median_ms": {k: round(med(k) * 1000, 1)
+                                     for k in ("process", "import_apptest", "first_render", "rerun")},
+                       "modules": modulos, "runs": medidas}, f, ensure_ascii=False, indent=1)
+        print(f"resultado gravado em {saida}")
+    for f in falhas:
+        print(f"ERRO: {f}")
+    sys.exit(1 if falhas else 0)
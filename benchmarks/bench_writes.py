@@ -0,0 +1,106 @@
+"""Escritas concorrentes no SQLite: sessões diretas no pool vs. fila de escrita única.
+
+Uso: python -m benchmarks.bench_writes [threads] [escritas_por_thread]
+Sai com código 1 se a fila perder alguma escrita ou der "database is locked".
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, User, Movement
+from migrations import run_migrations
+from writer import WriteQueue, make_write_engine
+
+def _novo_banco(path: str):
+    url = f"sqlite:///{path}"
+    engine = create_engine(url, future=True)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+        conn.execute(User.__table__.insert(), [{"id": 1, "name": "bench", "password_hash": "x"}])
+    engine.dispose()
+    return url
+
+def _mov(i: int) -> Movement:
+    return Movement(user_id=1, kind="Receita", amount=1.0, description=f"m{i}", date=date(2024, 1, 1))
+
+def _contar(url: str) -> int:
+    engine = create_engine(url, future=True)
+    with engine.connect() as conn:
+        n = conn.execute(select(func.count()).select_from(Movement)).scalar()
+    engine.dispose()
+    return n
+
+def _concorrente(worker, threads: int):
+    ts = [threading.Thread(target=worker, args=(k,)) for k in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return time.perf_counter() - t0
+
+def direto(url: str, threads: int, n: int):
+    """Como o app fazia: cada escrita abre sessão no QueuePool e faz commit (timeout curto)."""
+    engine = create_engine(url, pool_size=10, max_overflow=20, future=True,
+                           connect_args={"check_same_thread": False, "timeout": 0.5})
+    Session = sessionmaker(bind=engine, future=True)
+    erros = [0]
+
+    def worker(k):
+        for i in range(n):
+            try:
+                with Session() as db:
+                    db.add(_mov(k * n + i)); db.commit()
+            except OperationalError:
+                erros[0] += 1
+
+    dt = _concorrente(worker, threads)
+    engine.dispose()
+    return dt, erros[0], None
+
+def fila(url: str, threads: int, n: int):
+    wq = WriteQueue(make_write_engine(url))
+    erros = [0]
+
+    def worker(k):
+        for i in range(n):
+            try:
+                wq.run(lambda db, m=_mov(k * n + i): db.add(m))
+            except OperationalError:
+                erros[0] += 1
+
+    dt = _concorrente(worker, threads)
+    stats = wq.stats()
+    wq.close()
+    wq.engine.dispose()
+    return dt, erros[0], stats
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    total = threads * n
+    falhou = False
+    with tempfile.TemporaryDirectory() as tmp:
+        for nome, fn in (("direto", direto), ("fila", fila)):
+            url = _novo_banco(os.path.join(tmp, f"{nome}.db"))
+            dt, erros, stats = fn(url, threads, n)
+            gravadas = _contar(url)
+            print(f"{nome:7} {threads} threads x {n}: {dt:6.2f}s  {total / dt:8,.0f} escritas/s  "
+                  f"gravadas {gravadas}/{total}  locked {erros}")
+            if stats:
+                print(f"        {stats['batches']} commits (média {stats['avg_batch']:.1f}/commit), "
+                      f"commit p95 {stats['commit_ms_p95']:.1f} ms, espera p95 {stats['wait_ms_p95']:.1f} ms, "
+                      f"fila máx. {stats['max_depth']}")
+                falhou = erros > 0 or gravadas != total
+    if falhou:
+        print("ERRO: a fila de escrita perdeu escritas")
+        sys.exit(1)
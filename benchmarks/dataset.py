@@ -0,0 +1,221 @@
+"""Base sintética reprodutível para medir as páginas em escala.
+
+Uso: python -m benchmarks.dataset ARQUIVO.db [--users N] [--movements N] [--seed S]
+
+Cria o schema de verdade (models.py + migrations.py) e grava usuários,
+perfis, baldes, gigantes com pagamentos, contas avulsas, contas recorrentes
+com ocorrências pagas e movimentações. Mesma semente e escala, mesma base:
+as datas terminam em FIM (fixo), não em hoje.
+
+As movimentações se distribuem entre os usuários como Zipf (o primeiro usuário
+é o mais pesado, com ~1/H(N) do total) e entram por executemany com as
+triggers de rollup e de busca desligadas; depois o rollup, os índices FTS e o
+histórico de saldos são recalculados de uma vez. O saldo de cada balde é a
+soma das movimentações dele, então conciliação e verificações saem limpas.
+"""
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, create_engine, func, insert, select
+from sqlalchemy.engine import Connection, Engine
+
+from balances import backfill as backfill_balances
+from db_helpers import init_db_pragmas
+from migrations import run_migrations
+from models import (
+    Base, Bill, BillOccurrence, BillRule, Bucket, Giant, GiantPayment, Movement, User, UserProfile
+)
+from rollups import drop_triggers as drop_rollup_triggers, install_triggers as install_rollup_triggers
+from rollups import rebuild as rebuild_rollups
+from search import TRIGGERS as SEARCH_TRIGGERS, install as install_search, installed as search_installed
+from utils import hash_password
+
+FIM = date(2026, 9, 30)     # último dia com movimentações
+SENHA = "bench"             # senha de todos os usuários (nomes user0001, user0002, ...)
+LOTE = 50_000
+
+BALDES = (("Essenciais", 50.0), ("Dívidas", 20.0), ("Reserva", 10.0), ("Lazer", 10.0),
+          ("Investimentos", 5.0), ("Educação", 5.0), ("Saúde", 0.0), ("Viagem", 0.0))
+DESCRICOES = ("Mercado", "Padaria", "Salário", "Aluguel", "Uber", "Farmácia", "Pix recebido", "Conta de luz",
+              "Água", "Internet", "Restaurante", "Posto", "Academia", "Cinema", "Freela", "Feira")
+LOCAIS = ("centro", "bairro", "shopping", "online", "app", "cartão", "débito", "pix")
+CONTAS = ("Cartão", "Condomínio", "IPTU", "IPVA", "Seguro", "Escola", "Plano de saúde", "Celular")
+
+class Scale(NamedTuple):
+    users: int = 20
+    movements: int = 100_000     # total, entre todos os usuários
+    buckets: int = 6             # por usuário (até len(BALDES))
+    giants: int = 4              # por usuário
+    payments: int = 24           # por gigante
+    bills: int = 30              # contas avulsas por usuário
+    rules: int = 5               # contas recorrentes por usuário
+    years: int = 5               # movimentações de FIM - years até FIM
+
+class Dataset(NamedTuple):
+    path: str
+    scale: Scale
+    seed: int
+    user_ids: Tuple[int, ...]
+    heavy_user: int              # usuário com mais movimentações
+    counts: Dict[str, int]
+    seconds: float               # tempo da geração (0 se a base já existia)
+
+def _share(scale: Scale) -> np.ndarray:
+    """Movimentações por usuário (Zipf s=1), somando exatamente scale.movements."""
+    w = 1.0 / np.arange(1, scale.users + 1)
+    n = np.floor(w / w.sum() * scale.movements).astype(np.int64)
+    n[0] += scale.movements - n.sum()
+    return n
+
+def _movements(conn: Connection, rng: np.random.Generator, uid: int, n: int, baldes: np.ndarray,
+               inicio: date, dias: int, saldos: Dict[int, int]):
+    """`n` movimentações do usuário em lotes; acumula o saldo de cada balde em `saldos` (centavos)."""
+    for k in range(0, n, LOTE):
+        m = min(LOTE, n - k)
+        despesa = rng.random(m) < .62
+        # Receitas maiores e mais raras que as despesas; centavos inteiros
+        cents = np.where(despesa, rng.lognormal(8.3, 1.0, m), rng.lognormal(10.2, .8, m)).astype(np.int64) + 1
+        sem_balde = rng.random(m) < .15
+        balde = baldes[rng.integers(0, len(baldes), m)] if len(baldes) else np.zeros(m, np.int64)
+        dia = rng.integers(0, dias, m)
+        desc = rng.integers(0, len(DESCRICOES), m)
+        local = rng.integers(0, len(LOCAIS), m)
+        rows = []
+        for i in range(m):
+            b = None if sem_balde[i] or not len(baldes) else int(balde[i])
+            c = int(cents[i])
+            if b is not None:
+                saldos[b] = saldos.get(b, 0) + (-c if despesa[i] else c)
+            rows.append({"user_id": uid, "bucket_id": b, "kind": "Despesa" if despesa[i] else "Receita",
+                         "amount": c / 100, "description": f"{DESCRICOES[desc[i]]} {LOCAIS[local[i]]}",
+                         "date": inicio + timedelta(days=int(dia[i]))})
+        conn.execute(insert(Movement.__table__), rows)
+
+def generate(engine: Engine, scale: Scale = Scale(), seed: int = 1, fim: date = FIM) -> Tuple[int, ...]:
+    """Preenche uma base vazia; retorna os ids dos usuários (o primeiro é o mais pesado)."""
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    rnd = random.Random(seed)
+    rng = np.random.default_rng(seed)
+    inicio = fim - timedelta(days=365 * scale.years)
+    dias = (fim - inicio).days + 1
+    senha = hash_password(SENHA)
+    with engine.begin() as conn:
+        if conn.scalar(select(func.count()).select_from(User)):
+            raise ValueError("A base já tem usuários; gere numa base vazia.")
+        # Triggers por linha custam mais que recalcular tudo no fim
+        drop_rollup_triggers(conn)
+        for name in SEARCH_TRIGGERS:
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+
+        conn.execute(insert(User.__table__), [{"name": f"user{i + 1:04d}", "password_hash": senha}
+                                              for i in range(scale.users)])
+        uids = tuple(conn.execute(select(User.id).order_by(User.id)).scalars())
+        conn.execute(insert(UserProfile.__table__), [
+            {"user_id": u, "monthly_income": round(rnd.uniform(2_000, 25_000), 2),
+             "monthly_expense": round(rnd.uniform(1_500, 20_000), 2)} for u in uids])
+
+        nb = min(scale.buckets, len(BALDES))
+        conn.execute(insert(Bucket.__table__), [
+            {"user_id": u, "name": nome, "description": "", "percent": pct, "balance": 0.0, "type": "generic"}
+            for u in uids for nome, pct in BALDES[:nb]])
+        baldes: Dict[int, list] = {u: [] for u in uids}
+        for bid, uid in conn.execute(select(Bucket.id, Bucket.user_id).order_by(Bucket.id)):
+            baldes[uid].append(bid)
+
+        conn.execute(insert(Giant.__table__), [
+            {"user_id": u, "name": f"Dívida {j + 1}", "total_to_pay": round(rnd.uniform(1_000, 60_000), 2),
+             "parcels": rnd.choice((0, 12, 24, 36, 48)), "priority": j + 1, "status": "active",
+             "weekly_goal": round(rnd.uniform(20, 400), 2), "interest_rate": round(rnd.uniform(0, 8), 2)}
+            for u in uids for j in range(scale.giants)])
+        pagamentos = []
+        for gid, uid, total in conn.execute(select(Giant.id, Giant.user_id, Giant.total_to_pay).order_by(Giant.id)):
+            parcela = total / max(scale.payments * 2, 1)
+            pagamentos.extend({"user_id": uid, "giant_id": gid, "amount": round(parcela * rnd.uniform(.5, 1.5), 2),
+                               "date": fim - timedelta(days=rnd.randrange(365 * 2)), "note": ""}
+                              for _ in range(scale.payments))
+        if pagamentos:
+            conn.execute(insert(GiantPayment.__table__), pagamentos)
+
+        contas = []
+        for u in uids:
+            for j in range(scale.bills):
+                venc = fim + timedelta(days=rnd.randint(-180, 180))
+                contas.append({"user_id": u, "title": f"{rnd.choice(CONTAS)} {j + 1}", "amount": round(rnd.uniform(30, 3_000), 2),
+                               "due_date": venc, "is_critical": rnd.random() < .2, "paid": venc < fim and rnd.random() < .9})
+        conn.execute(insert(Bill.__table__), contas)
+        conn.execute(insert(BillRule.__table__), [
+            {"user_id": u, "title": f"{CONTAS[j % len(CONTAS)]} mensal", "amount": round(rnd.uniform(50, 2_000), 2),
+             "is_critical": j == 0, "freq": "weekly" if j % 4 == 3 else "monthly", "interval": 1,
+             "start_date": inicio + timedelta(days=rnd.randrange(365)), "end_date": None, "day": rnd.randint(1, 28)}
+            for u in uids for j in range(scale.rules)])
+        # Últimos três meses das regras mensais pagos
+        conn.execute(insert(BillOccurrence.__table__), [
+            {"user_id": uid, "rule_id": rid, "date": _month_day(fim, -k, dia), "status": "paid"}
+            for rid, uid, dia in conn.execute(select(BillRule.id, BillRule.user_id, BillRule.day)
+                                              .where(BillRule.freq == "monthly").order_by(BillRule.id))
+            for k in range(1, 4)])
+
+        saldos: Dict[int, int] = {}
+        for uid, n in zip(uids, _share(scale)):
+            _movements(conn, rng, uid, int(n), np.array(baldes[uid], np.int64), inicio, dias, saldos)
+        if saldos:
+            conn.execute(Bucket.__table__.update().where(Bucket.id == bindparam("b")).values(balance=bindparam("v")),
+                         [{"b": b, "v": c / 100} for b, c in saldos.items()])
+
+        rebuild_rollups(conn)
+        install_rollup_triggers(conn)
+        if search_installed(conn):
+            install_search(conn)          # triggers de volta + rebuild dos índices
+        backfill_balances(conn, fim)
+        conn.exec_driver_sql("ANALYZE")
+    init_db_pragmas(engine)
+    return uids
+
+def _month_day(fim: date, meses: int, dia: Optional[int]) -> date:
+    n = fim.year * 12 + fim.month - 1 + meses
+    y, m = divmod(n, 12)
+    return date(y, m + 1, min(dia or 1, 28))
+
+def counts(engine: Engine) -> Dict[str, int]:
+    with engine.connect() as conn:
+        return {t.__tablename__: conn.scalar(select(func.count()).select_from(t))
+                for t in (User, Bucket, Giant, GiantPayment, Bill, BillRule, Movement)}
+
+def open_dataset(path: str, scale: Scale = Scale(), seed: int = 1) -> Tuple[Engine, Dataset]:
+    """Engine de `path`; gera a base se o arquivo ainda não existe (senão reaproveita)."""
+    novo = not os.path.exists(path)
+    engine = create_engine(f"sqlite:///{path}", future=True)
+    t0 = time.perf_counter()
+    if novo:
+        uids = generate(engine, scale, seed)
+    else:
+        run_migrations(engine)
+        with engine.connect() as conn:
+            uids = tuple(conn.execute(select(User.id).where(User.name.like("user%")).order_by(User.id)).scalars())
+    with engine.connect() as conn:
+        pesado = conn.scalar(select(Movement.user_id).group_by(Movement.user_id)
+                             .order_by(func.count().desc(), Movement.user_id).limit(1))
+    return engine, Dataset(path, scale, seed, uids, pesado or (uids[0] if uids else 0), counts(engine),
+                           time.perf_counter() - t0 if novo else 0.0)
+
+def _arg(flag: str, default: int) -> int:
+    return int(sys.argv[sys.argv.index(flag) + 1]) if flag in sys.argv else default
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1].startswith("--"):
+        print(__doc__.splitlines()[2]); sys.exit(2)
+    path = sys.argv[1]
+    if os.path.exists(path):
+        print(f"{path} já existe; apague para gerar de novo."); sys.exit(1)
+    padrao = Scale()
+    scale = padrao._replace(users=_arg("--users", padrao.users), movements=_arg("--movements", padrao.movements))
+    engine, ds = open_dataset(path, scale, _arg("--seed", 1))
+    print(f"{path}: " + ", ".join(f"{k} {v:,}".replace(",", ".") for k, v in ds.counts.items())
+          + f" em {ds.seconds:.1f} s (usuário mais pesado: {ds.heavy_user})")
+    engine.dispose()
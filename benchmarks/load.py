@@ -0,0 +1,357 @@
+"""Teste de carga: várias sessões simultâneas do app.py (AppTest) sobre um SQLite local.
+
+Uso: python -m benchmarks.load [--db BASE.db] [--sessions N] [--iterations K] [--scenario NOME]
+                               [--processes P] [--think MS] [--timeout S] [--json SAIDA.json]
+
+Cada sessão é uma thread com o seu AppTest, logada como um usuário da base
+sintética (benchmarks/dataset.py; gerada se --db não existir), repetindo um
+roteiro: navegar pelas páginas, registrar Entrada/Saída, criar conta. Como no
+servidor do Streamlit, as sessões de um processo dividem o mesmo runtime
+(engines, pool de leitura, fila de escrita, cache por usuário). Com
+--processes, P processos rodam N sessões cada na mesma base, como vários
+app.py atrás de um balanceador.
+
+A base de --db é copiada para um diretório temporário: as escritas do teste
+não ficam nela. Por cenário saem p50/p95/p99 de cada rerun (clique ou troca
+de página até o script terminar), a taxa de erros por tipo (exceção no
+script, "database is locked", timeout do pool, timeout do AppTest), a espera
+das escritas na fila e em lock do SQLite (writer.py) e o pico de conexões de
+leitura em uso contra o limite do pool.
+"""
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from benchmarks.dataset import SENHA, Scale, open_dataset
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+PAGINAS = ("Dashboard", "Livro Caixa", "Baldes", "Calendário", "Plano de Ataque")
+MISTO = (("navegar", .7), ("entradas", .2), ("contas", .1))
+
+class Sample(NamedTuple):
+    scenario: str
+    step: str
+    ms: float
+    error: Optional[str]     # None, "script", "lock", "pool_timeout", "apptest_timeout"
+    message: str = ""        # primeira linha da exceção, quando houve erro
+
+class ScenarioReport(NamedTuple):
+    scenario: str
+    sessions: int
+    reruns: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+    errors: Dict[str, int]
+    error_rate: float
+    error_examples: Dict[str, str]            # tipo -> primeira mensagem vista
+    steps: Dict[str, Dict[str, float]]        # passo -> p50/p95/n
+    writes: int
+    write_wait_ms_avg: float                  # espera na fila do escritor por operação
+    lock_wait_ms: float                       # tempo em "database is locked" (tentativas + backoff)
+    lock_retries: int
+    read_pool_peak: int
+    read_pool_limit: int
+    seconds: float
+
+# -----------------------------
+# AppTest em threads
+# -----------------------------
+def _share_runtime():
+    """Deixa vários AppTest rodarem ao mesmo tempo no processo.
+
+    Cada AppTest.run() instala um Runtime falso em `Runtime._instance` e o zera
+    no fim; com sessões em paralelo, a primeira que termina derruba as outras
+    ("Runtime hasn't been created!"). Aqui o Runtime nunca fica vazio: na falta
+    do da execução corrente vale um compartilhado. O mesmo vale para a opção
+    `global.appTest`, que cada run() liga e desliga trocando `config.get_option`:
+    desligada no meio de outro rerun, os valores dos widgets se perdem. E, como
+    no servidor, o bytecode do app.py fica num ScriptCache só: cada run() criava
+    o seu e compilava o script de novo, e compilações simultâneas em threads
+    falham no Python 3.11 ("AST constructor recursion depth mismatch").
+    """
+    from unittest.mock import MagicMock
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import local_script_runner
+
+    shared = MagicMock(spec=Runtime)
+    shared.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    shared.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: cls._instance if cls._instance is not None else shared)
+    Runtime.exists = classmethod(lambda cls: True)
+    config.set_option("global.appTest", True)
+    cache = ScriptCache()
+    local_script_runner.ScriptCache = lambda: cache
+
+def _classify(msg: str) -> str:
+    m = msg.lower()
+    if "locked" in m or "busy" in m:
+        return "lock"
+    if "queuepool limit" in m:
+        return "pool_timeout"
+    if "timed out" in m:
+        return "apptest_timeout"
+    return "script"
+
+class VirtualUser:
+    """Uma sessão do navegador: AppTest + usuário; cada passo mede um rerun."""
+
+    def __init__(self, user: str, timeout: float, samples: List[Sample], lock: threading.Lock):
+        from streamlit.testing.v1 import AppTest
+        self.at = AppTest.from_file(APP, default_timeout=timeout)
+        self.user = user
+        self.samples = samples
+        self.lock = lock
+        self.scenario = "login"
+
+    def step(self, name: str, action: Callable[[], object]) -> bool:
+        t0 = time.perf_counter()
+        erro, texto = None, ""
+        try:
+            action()
+            msgs = [e.message for e in self.at.exception] + [e.value for e in self.at.error]
+            if msgs:
+                texto = " ".join(str(m) for m in msgs)
+            elif not self.at.main.children:  # erro de compilação: não vira exceção, só uma página vazia
+                texto = "rerun sem saída"
+        except Exception as e:              # timeout do AppTest, widget que não apareceu
+            texto = str(e) or type(e).__name__
+        if texto:
+            erro = _classify(texto)
+        with self.lock:
+            self.samples.append(Sample(self.scenario, name, (time.perf_counter() - t0) * 1000, erro,
+                                       texto.strip().splitlines()[0][:200] if texto.strip() else ""))
+        return erro is None
+
+    def click(self, label: str):
+        next(b for b in self.at.button if b.label == label).click().run()
+
+    def login(self) -> bool:
+        if not self.step("abrir", self.at.run):
+            return False
+        self.at.text_input(key="login_user").input(self.user)
+        self.at.text_input(key="login_pwd").input(SENHA)
+        def entrar():
+            self.click("Entrar")
+            if not self.at.sidebar.radio:
+                raise RuntimeError("login sem menu: " + " ".join(str(e.value) for e in self.at.error))
+        return self.step("login", entrar)
+
+    def go(self, page: str) -> bool:
+        return self.step(page, lambda: self.at.sidebar.radio[0].set_value(page).run())
+
+# -----------------------------
+# Roteiros
+# -----------------------------
+def navegar(s: VirtualUser, rnd: random.Random):
+    for page in PAGINAS:
+        s.go(page)
+
+def entradas(s: VirtualUser, rnd: random.Random):
+    if not s.go("Entradas"):
+        return
+    s.at.text_input(key="entrada_valor__txt").input(f"{rnd.randint(100, 5_000)},00")
+    s.step("registrar entrada", lambda: s.click("Registrar Entrada"))
+    if not s.go("Entradas"):
+        return
+    s.at.text_input(key="saida_valor__txt").input(f"{rnd.randint(10, 500)},{rnd.randint(0, 99):02d}")
+    s.step("registrar saída", lambda: s.click("Registrar Saída"))
+
+def contas(s: VirtualUser, rnd: random.Random):
+    if not s.go("Calendário"):
+        return
+    s.at.text_input(key="conta_desc").input(f"Carga {rnd.randint(1, 10**6)}")
+    s.at.text_input(key="conta_val__txt").input(f"{rnd.randint(20, 900)},00")
+    s.step("criar conta", lambda: s.click("Adicionar"))
+
+SCENARIOS: Dict[str, Callable[[VirtualUser, random.Random], None]] = {
+    "navegar": navegar, "entradas": entradas, "contas": contas,
+}
+
+def _session(i: int, users: List[str], scenario: str, iterations: int, think: float, timeout: float,
+             seed: int, samples: List[Sample], lock: threading.Lock, start: threading.Barrier):
+    rnd = random.Random(seed * 1000 + i)
+    s = VirtualUser(users[i % len(users)], timeout, samples, lock)
+    start.wait()
+    if not s.login():
+        return
+    for _ in range(iterations):
+        nome = scenario
+        if scenario == "misto":
+            nome = rnd.choices([n for n, _ in MISTO], [w for _, w in MISTO])[0]
+        s.scenario = scenario
+        SCENARIOS[nome](s, rnd)
+        if think:
+            time.sleep(rnd.uniform(.5, 1.5) * think)
+
+def _app_runtime(timeout: float):
+    """O Runtime que o app.py recebe de bootstrap.get_runtime, pego num rerun sem sessão.
+
+    Fora de um rerun o st.cache_resource não cacheia, então chamar get_runtime
+    daqui criaria outro escritor e outro pool; o wrapper pega o do app.
+    """
+    import bootstrap
+    from streamlit.testing.v1 import AppTest
+    vistos = []
+    original = bootstrap.get_runtime
+
+    def get_runtime(*args, **kwargs):
+        vistos.append(original(*args, **kwargs))
+        return vistos[-1]
+    bootstrap.get_runtime = get_runtime
+    try:
+        AppTest.from_file(APP, default_timeout=timeout).run()
+    finally:
+        bootstrap.get_runtime = original
+    return vistos[-1]
+
+def run_scenario(scenario: str, sessions: int, iterations: int, users: List[str], think: float = 0.0,
+                 timeout: float = 300.0, seed: int = 1) -> Tuple[List[Sample], Dict[str, float]]:
+    """Roda `sessions` sessões em threads; retorna as amostras e as variações do escritor/pool."""
+    rt = _app_runtime(timeout)
+    antes = rt.writer.stats()
+    samples: List[Sample] = []
+    lock = threading.Lock()
+    start = threading.Barrier(sessions)
+    pico, parar = [0], threading.Event()
+
+    def vigia():
+        # Conexões de leitura em uso, amostradas a cada 5 ms
+        while not parar.wait(.005):
+            pico[0] = max(pico[0], rt.reader.pool.checkedout())
+
+    t0 = time.perf_counter()
+    monitor = threading.Thread(target=vigia, daemon=True)
+    monitor.start()
+    threads = [threading.Thread(target=_session, args=(i, users, scenario, iterations, think, timeout, seed,
+                                                       samples, lock, start), daemon=True)
+               for i in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    parar.set(); monitor.join()
+    depois = rt.writer.stats()
+    pool = rt.reader.pool
+    limite = pool.size() + getattr(pool, "_max_overflow", 0)
+    extra = {k: depois[k] - antes[k] for k in ("ops", "retries", "failed_ops", "wait_ms", "busy_ms")}
+    extra.update(read_pool_peak=pico[0], read_pool_limit=limite, seconds=time.perf_counter() - t0)
+    return samples, extra
+
+# -----------------------------
+# Relatório
+# -----------------------------
+def _pct(sorted_ms: List[float], q: float) -> float:
+    if not sorted_ms:
+        return 0.0
+    return sorted_ms[max(-(-len(sorted_ms) * q // 100) - 1, 0)]
+
+def report(scenario: str, sessions: int, samples: List[Sample], extra: Dict[str, float]) -> ScenarioReport:
+    tempos = sorted(s.ms for s in samples)
+    erros: Dict[str, int] = defaultdict(int)
+    exemplos: Dict[str, str] = {}
+    por_passo: Dict[str, List[float]] = defaultdict(list)
+    for s in samples:
+        por_passo[s.step].append(s.ms)
+        if s.error:
+            erros[s.error] += 1
+            exemplos.setdefault(s.error, f"{s.step}: {s.message}")
+    passos = {k: {"p50": round(_pct(sorted(v), 50), 1), "p95": round(_pct(sorted(v), 95), 1), "n": len(v)}
+              for k, v in por_passo.items()}
+    ops = int(extra["ops"])
+    return ScenarioReport(
+        scenario, sessions, len(tempos), round(_pct(tempos, 50), 1), round(_pct(tempos, 95), 1),
+        round(_pct(tempos, 99), 1), round(tempos[-1] if tempos else 0.0, 1), dict(erros),
+        round(sum(erros.values()) / len(tempos), 4) if tempos else 0.0, exemplos, passos, ops,
+        round(extra["wait_ms"] / ops, 2) if ops else 0.0, round(extra["busy_ms"], 1), int(extra["retries"]),
+        int(extra["read_pool_peak"]), int(extra["read_pool_limit"]), round(extra["seconds"], 2),
+    )
+
+def _print(r: ScenarioReport):
+    erros = ", ".join(f"{k} {v}" for k, v in sorted(r.errors.items())) or "nenhum"
+    print(f"\n== {r.scenario}: {r.sessions} sessões, {r.reruns} reruns em {r.seconds:.1f} s ==")
+    print(f"  rerun p50 {r.p50_ms:8.1f} ms   p95 {r.p95_ms:8.1f} ms   p99 {r.p99_ms:8.1f} ms   máx {r.max_ms:8.1f} ms")
+    print(f"  erros: {erros} (taxa {r.error_rate:.2%})")
+    for tipo, exemplo in sorted(r.error_examples.items()):
+        print(f"    {tipo}: {exemplo}")
+    print(f"  escritas {r.writes}: fila {r.write_wait_ms_avg:.1f} ms/op, lock {r.lock_wait_ms:.0f} ms "
+          f"em {r.lock_retries} novas tentativas; pool de leitura: pico {r.read_pool_peak} de {r.read_pool_limit}")
+    for passo, v in sorted(r.steps.items(), key=lambda kv: -kv[1]["p95"]):
+        print(f"    {passo:20} p50 {v['p50']:8.1f}   p95 {v['p95']:8.1f}   ({v['n']})")
+
+# -----------------------------
+# Processos
+# -----------------------------
+def _worker(args) -> Tuple[List[Sample], Dict[str, float]]:
+    path, scenario, sessions, iterations, users, think, timeout, seed = args
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    _share_runtime()
+    samples, extra = run_scenario(scenario, sessions, iterations, users, think, timeout, seed)
+    return [tuple(s) for s in samples], extra
+
+def run(path: str, scenario: str, sessions: int, iterations: int, users: List[str], processes: int = 1,
+        think: float = 0.0, timeout: float = 300.0, seed: int = 1) -> ScenarioReport:
+    tarefas = [(path, scenario, sessions, iterations, users[p::processes] or users, think, timeout, seed + p)
+               for p in range(processes)]
+    if processes == 1:
+        partes = [_worker(tarefas[0])]
+    else:
+        # spawn: cada processo sobe o seu app.py do zero, sem herdar threads do pai
+        with multiprocessing.get_context("spawn").Pool(processes) as pool:
+            partes = pool.map(_worker, tarefas)
+    samples = [Sample(*s) for parte, _ in partes for s in parte]
+    extra: Dict[str, float] = defaultdict(float)
+    for _, e in partes:
+        for k, v in e.items():
+            extra[k] = max(extra[k], v) if k in ("read_pool_peak", "read_pool_limit", "seconds") else extra[k] + v
+    return report(scenario, sessions * processes, samples, extra)
+
+def _arg(flag: str, default, cast=str):
+    return cast(sys.argv[sys.argv.index(flag) + 1]) if flag in sys.argv else default
+
+if __name__ == "__main__":
+    sessions = _arg("--sessions", 8, int)
+    iterations = _arg("--iterations", 3, int)
+    processes = _arg("--processes", 1, int)
+    escolhido = _arg("--scenario", "all")
+    cenarios = list(SCENARIOS) + ["misto"] if escolhido == "all" else [escolhido]
+    if any(c not in SCENARIOS and c != "misto" for c in cenarios):
+        print(f"cenário desconhecido: {escolhido} (use {', '.join(SCENARIOS)}, misto ou all)"); sys.exit(2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        origem = _arg("--db", os.path.join(tmp, "origem.db"))
+        engine, ds = open_dataset(origem, Scale(users=max(sessions * processes, 20), movements=_arg("--movements", 50_000, int)))
+        engine.dispose()
+        path = os.path.join(tmp, "carga.db")
+        shutil.copy(origem, path)
+        users = [f"user{u:04d}" for u in range(1, len(ds.user_ids) + 1)]
+        print("base: " + ", ".join(f"{k} {v:,}".replace(",", ".") for k, v in ds.counts.items()))
+        relatorios = []
+        for c in cenarios:
+            r = run(path, c, sessions, iterations, users, processes, _arg("--think", 0, float) / 1000,
+                    _arg("--timeout", 300, float), _arg("--seed", 1, int))
+            _print(r)
+            relatorios.append(r)
+
+    saida = _arg("--json", None)
+    if saida:
+        with open(saida, "w", encoding="utf-8") as f:
+            json.dump({"generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "sessions": sessions,
+                       "processes": processes, "iterations": iterations, "dataset": ds.counts,
+                       "scenarios": [r._asdict() for r in relatorios]}, f, ensure_ascii=False, indent=1)
+        print(f"\nresultado gravado em {saida}")
+    sys.exit(1 if any(r.errors for r in relatorios) else 0)
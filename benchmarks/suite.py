@@ -0,0 +1,249 @@
+"""Suíte de benchmarks na base sintética (benchmarks/dataset.py), com resultado em JSON.
+
+Uso: python -m benchmarks.suite [--db ARQUIVO.db] [--users N] [--movements N] [--seed S]
+                                [--only TEXTO] [--json SAIDA.json] [--compare BASE.json] [--threshold 1.3]
+
+Mede o que cada `load_*` do app.py faz por baixo do cache (mesmas funções,
+mesma sessão do pool de leitura), `distribute_by_buckets` (desfeito com
+rollback a cada execução), `giant_forecast_simple`, os DataFrames do
+Dashboard e do Livro Caixa (frames.py) e a série e o PNG do gráfico de
+evolução (charts.py), sempre no usuário mais pesado.
+
+Sem --db a base é gerada num diretório temporário; com --db ela é gerada na
+primeira vez e reaproveitada nas seguintes. Cada caso roda até ter pelo menos
+`--min-runs` execuções e `--min-time` segundos; o JSON guarda mediana, p95 e
+mínimo em ms, o ambiente e a escala da base. Com --compare, casos com mediana
+acima de `threshold` vezes a da base anterior saem como regressão (código 1).
+"""
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from sqlalchemy.orm import sessionmaker
+
+from aggregates import totals_by_day, totals_by_kind, totals_by_month
+from balances import balance_curve, balances_at
+from benchmarks.dataset import FIM, Dataset, Scale, open_dataset
+from db_helpers import distribute_by_buckets, giant_forecast_simple
+from charts import daily_chart_png, daily_series
+from frames import ledger_frame, monthly_frame, recent_frame
+from models import Giant
+from payoff import payoff_inputs, simulate
+from reader import make_read_engine
+from recurrence import iter_occurrences, month_window
+from search import search
+from snapshots import (
+    LedgerFilter, fetch_bill_occurrences, fetch_bill_rules, fetch_bills, fetch_buckets, fetch_giant_totals,
+    fetch_giants, fetch_ledger_page, fetch_movements, fetch_profile
+)
+
+class CaseResult(NamedTuple):
+    median_ms: float
+    p95_ms: float
+    min_ms: float
+    runs: int
+    rows: int            # tamanho do resultado (linhas, pontos, células ou bytes)
+
+def _rows(value) -> int:
+    if isinstance(value, pd.DataFrame):
+        return len(value)
+    if hasattr(value, "dates"):            # BalanceCurve
+        return len(value.dates)
+    if hasattr(value, "hits"):             # SearchPage
+        return len(value.hits)
+    if hasattr(value, "rows"):             # LedgerPage
+        return len(value.rows)
+    if hasattr(value, "months"):           # PayoffResult
+        return int(np.asarray(value.months).size)
+    try:
+        return len(value)
+    except TypeError:
+        return 1
+
+def measure(fn: Callable, min_runs: int = 5, min_time: float = 0.5, max_runs: int = 1000) -> CaseResult:
+    valor = fn()                          # aquecimento (planos, páginas do SQLite, imports)
+    tempos: List[float] = []
+    inicio = time.perf_counter()
+    while len(tempos) < max_runs and (len(tempos) < min_runs or time.perf_counter() - inicio < min_time):
+        t0 = time.perf_counter()
+        fn()
+        tempos.append((time.perf_counter() - t0) * 1000)
+    tempos.sort()
+    p95 = tempos[max(-(-len(tempos) * 95 // 100) - 1, 0)]
+    return CaseResult(round(statistics.median(tempos), 4), round(p95, 4), round(tempos[0], 4), len(tempos), _rows(valor))
+
+# -----------------------------
+# Casos
+# -----------------------------
+def cases(Session: sessionmaker, WriteSession: sessionmaker, uid: int, hoje: date = FIM) -> Dict[str, Callable]:
+    """nome -> função sem argumentos; os nomes seguem os loaders e as páginas do app."""
+    mes = (hoje.replace(day=1), hoje)
+    dias90 = (hoje - timedelta(days=89), hoje)
+    janela = month_window(hoje.year, hoje.month)
+
+    def ler(fn, *args):
+        def run():
+            with Session() as db:
+                return fn(db, uid, *args)
+        return run
+
+    def payoff():
+        with Session() as db:
+            return simulate(payoff_inputs(fetch_giants(db, uid), fetch_giant_totals(db, uid)), 200.0)
+
+    def occurrences():
+        with Session() as db:
+            return tuple(iter_occurrences(fetch_bill_rules(db, uid), fetch_bill_occurrences(db, uid, *janela), *janela))
+
+    with Session() as db:
+        baldes = fetch_buckets(db, uid)
+        nomes = {b.id: b.name for b in baldes}
+        diario_tudo = totals_by_day(db, uid)
+        diario_90 = totals_by_day(db, uid, *dias90)
+        mensal = totals_by_month(db, uid)
+        ultimas = fetch_movements(db, uid, 12)
+        pagina = fetch_ledger_page(db, uid, LedgerFilter(), None, 50).rows
+    serie_tudo = daily_series(diario_tudo, None, None, hoje)
+    serie_90 = daily_series(diario_90, *dias90, hoje)
+    with WriteSession() as db:
+        gigante = db.query(Giant).filter(Giant.user_id == uid).order_by(Giant.id).first()
+
+    def distribuir():
+        with WriteSession() as db:
+            try:
+                return distribute_by_buckets(db, uid, baldes, 1234.56, "Entrada", hoje, "bench")
+            finally:
+                db.rollback()
+
+    def previsao_gigante():
+        with WriteSession() as db:
+            return giant_forecast_simple(gigante, db)
+
+    return {
+        "load_profile":                 ler(fetch_profile),
+        "load_buckets":                 ler(fetch_buckets),
+        "load_balance_curve[tudo]":     ler(balance_curve, None, None, hoje),
+        "load_balance_curve[90d]":      ler(balance_curve, *dias90, hoje),
+        "load_balances_at":             ler(balances_at, hoje - timedelta(days=400)),
+        "load_giants":                  ler(fetch_giants),
+        "load_giant_totals":            ler(fetch_giant_totals),
+        "load_payoff":                  payoff,
+        "load_bills":                   ler(fetch_bills),
+        "load_bill_rules":              ler(fetch_bill_rules),
+        "load_occurrences[mes]":        occurrences,
+        "load_movements[300]":          ler(fetch_movements, 300),
+        "load_search[mercado]":         ler(search, "mercado", 20, 0),
+        "load_search[prefixo]":         ler(search, "mercado cen", 20, 0),
+        "load_ledger_page":             ler(fetch_ledger_page, LedgerFilter(), None, 50),
+        "load_ledger_page[filtro]":     ler(fetch_ledger_page, LedgerFilter(*dias90, "Despesa", baldes[0].id if baldes else None), None, 50),
+        "load_totals[tudo]":            ler(totals_by_kind),
+        "load_totals[mes]":             ler(totals_by_kind, *mes),
+        "load_monthly_totals":          ler(totals_by_month),
+        "load_daily_totals[tudo]":      ler(totals_by_day),
+        "load_daily_totals[90d]":       ler(totals_by_day, *dias90),
+        "distribute_by_buckets":        distribuir,
+        "giant_forecast_simple":        previsao_gigante,
+        "dashboard:daily_series[tudo]": lambda: daily_series(diario_tudo, None, None, hoje),
+        "dashboard:daily_series[90d]":  lambda: daily_series(diario_90, *dias90, hoje),
+        "dashboard:daily_chart[tudo]":  lambda: daily_chart_png(serie_tudo),
+        "dashboard:daily_chart[90d]":   lambda: daily_chart_png(serie_90),
+        "dashboard:recent_frame":       lambda: recent_frame(ultimas),
+        "livro_caixa:monthly_frame":    lambda: monthly_frame(mensal),
+        "livro_caixa:ledger_frame":     lambda: ledger_frame(pagina, nomes),
+    }
+
+# -----------------------------
+# Execução e comparação
+# -----------------------------
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def environment() -> Dict[str, object]:
+    return {
+        "commit": _git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+        "sqlite": sqlite3.sqlite_version, "sqlalchemy": sqlalchemy.__version__,
+        "pandas": pd.__version__, "numpy": np.__version__, "cpus": os.cpu_count(),
+    }
+
+def run_suite(ds: Dataset, engine, only: str = "", min_runs: int = 5, min_time: float = 0.5) -> Dict[str, object]:
+    reader = make_read_engine(f"sqlite:///{ds.path}") or engine
+    Session = sessionmaker(bind=reader, expire_on_commit=False, future=True)
+    WriteSession = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, future=True)
+    resultados: Dict[str, CaseResult] = {}
+    for nome, fn in cases(Session, WriteSession, ds.heavy_user).items():
+        if only and only not in nome:
+            continue
+        resultados[nome] = r = measure(fn, min_runs, min_time)
+        print(f"  {nome:32} {r.median_ms:10.3f} ms  p95 {r.p95_ms:10.3f}  ({r.runs} execuções, {r.rows} linhas)")
+    reader.dispose()
+    return {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "dataset": {"scale": ds.scale._asdict(), "seed": ds.seed, "counts": ds.counts, "heavy_user": ds.heavy_user,
+                    "generation_seconds": round(ds.seconds, 2)},
+        "results": {k: v._asdict() for k, v in resultados.items()},
+    }
+
+def compare(atual: Dict[str, object], base: Dict[str, object], threshold: float = 1.3) -> List[str]:
+    """Casos cuja mediana passou de `threshold` vezes a da base (só os presentes nas duas)."""
+    if base.get("dataset", {}).get("scale") != atual["dataset"]["scale"]:
+        print("AVISO: escalas diferentes entre as execuções; a comparação é só indicativa")
+    piores = []
+    for nome, r in atual["results"].items():
+        antes = base.get("results", {}).get(nome)
+        if not antes or antes["median_ms"] <= 0:
+            continue
+        razao = r["median_ms"] / antes["median_ms"]
+        marca = "  <-- regressão" if razao > threshold else ""
+        print(f"  {nome:32} {antes['median_ms']:10.3f} -> {r['median_ms']:10.3f} ms  x{razao:5.2f}{marca}")
+        if razao > threshold:
+            piores.append(nome)
+    return piores
+
+def _arg(flag: str, default, cast=str):
+    return cast(sys.argv[sys.argv.index(flag) + 1]) if flag in sys.argv else default
+
+if __name__ == "__main__":
+    padrao = Scale()
+    scale = padrao._replace(users=_arg("--users", padrao.users, int), movements=_arg("--movements", padrao.movements, int))
+    seed = _arg("--seed", 1, int)
+    tmp = None
+    path = _arg("--db", None)
+    if path is None:
+        tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp.name, "suite.db")
+    engine, ds = open_dataset(path, scale, seed)
+    print(f"base {ds.path}: " + ", ".join(f"{k} {v:,}".replace(",", ".") for k, v in ds.counts.items())
+          + (f" (gerada em {ds.seconds:.1f} s)" if ds.seconds else " (reaproveitada)"))
+    out = run_suite(ds, engine, _arg("--only", ""), _arg("--min-runs", 5, int), _arg("--min-time", 0.5, float))
+    engine.dispose()
+    if tmp is not None:
+        tmp.cleanup()
+
+    saida = _arg("--json", None)
+    if saida:
+        with open(saida, "w", encoding="utf-8") as f:
+            json.dump(out, f, ensure_ascii=False, indent=1)
+        print(f"resultado gravado em {saida}")
+    base = _arg("--compare", None)
+    if base:
+        with open(base, encoding="utf-8") as f:
+            piores = compare(out, json.load(f), _arg("--threshold", 1.3, float))
+        for nome in piores:
+            print(f"ERRO: regressão em {nome}")
+        sys.exit(1 if piores else 0)
@@ -0,0 +1,131 @@
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import streamlit as st
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from models import Base, User
+from db_helpers import init_db_pragmas
+from maintenance import Maintainer, start_maintenance
+from metrics import install as install_metrics
+from migrations import run_migrations
+from reader import make_read_engine
+from utils import hash_password
+from writer import WriteQueue, make_write_engine
+
+DB_URL   = os.getenv("DATABASE_URL", "sqlite:///sql_app.db")
+CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "styles.css")
+
+# Quantas vezes cada etapa rodou neste processo (e quanto tempo levou)
+_STATS: Dict[str, Dict[str, float]] = {}
+
+def _step(name: str, fn, *args):
+    t0 = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        s = _STATS.setdefault(name, {"runs": 0, "seconds": 0.0})
+        s["runs"] += 1
+        s["seconds"] += time.perf_counter() - t0
+
+def boot_stats() -> Dict[str, Dict[str, float]]:
+    """Cópia dos contadores de execução de cada etapa do bootstrap."""
+    return {k: dict(v) for k, v in _STATS.items()}
+
+@dataclass(frozen=True)
+class Runtime:
+    engine: Engine
+    SessionLocal: sessionmaker
+    css: str
+    seeded_demo: bool
+    writer: WriteQueue
+    reader: Engine                 # pool só de leitura dos loaders (ou o engine principal)
+    ReadSession: sessionmaker
+    maintenance: Optional[Maintainer]   # checkpoint/ANALYZE/vacuum em segundo plano (só SQLite em arquivo)
+
+# -----------------------------
+# Etapas
+# -----------------------------
+def _make_engine(db_url: str) -> Engine:
+    sqlite = db_url.startswith("sqlite")
+    return create_engine(
+        db_url,
+        poolclass=QueuePool,
+        pool_size=10,
+        max_overflow=20,
+        connect_args={'check_same_thread': False} if sqlite else {},
+        pool_timeout=30,
+        pool_recycle=1800,
+        pool_pre_ping=not sqlite,  # arquivo local: o ping só custaria uma ida a mais por checkout
+        future=True,
+    )
+
+def _make_sessionmaker(engine: Engine) -> sessionmaker:
+    return sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False, future=True)
+
+def _create_schema(engine: Engine):
+    with engine.begin() as conn:
+        # Banco novo já nasce com auto_vacuum=INCREMENTAL (vacuum da manutenção); num
+        # banco existente o pragma só valeria depois de um VACUUM completo (--convert)
+        if engine.dialect.name == "sqlite" and conn.exec_driver_sql("PRAGMA page_count").scalar() == 0:
+            conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        Base.metadata.create_all(bind=conn)
+
+def _seed_default_user(SessionLocal: sessionmaker) -> bool:
+    """Cria o usuário demo se o banco não tiver nenhum usuário."""
+    with SessionLocal() as db:
+        if db.query(User.id).first() is not None:
+            return False
+        db.add(User(name="demo", password_hash=hash_password("1234")))
+        db.commit()
+        return True
+
+def _make_reader(db_url: str, engine: Engine) -> Engine:
+    return make_read_engine(db_url) or engine
+
+def _make_writer(db_url: str) -> WriteQueue:
+    return WriteQueue(make_write_engine(db_url))
+
+def _start_maintenance(db_url: str, writer: WriteQueue) -> Optional[Maintainer]:
+    return start_maintenance(db_url, writer)
+
+def _instrument(engine: Engine, reader: Engine, writer: WriteQueue):
+    """Eventos de cursor nos três engines (metrics.py): consultas das páginas, do escritor e da manutenção."""
+    install_metrics(engine, "principal")
+    install_metrics(reader, "leitura")
+    install_metrics(writer.engine, "escrita")
+
+def _load_css(path: str) -> str:
+    if not os.path.exists(path):
+        return ""
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+# -----------------------------
+# Runtime único por processo
+# -----------------------------
+@st.cache_resource(show_spinner=False)
+def get_runtime(db_url: str = DB_URL) -> Runtime:
+    """Engine, sessões, schema, migrações, pragmas, seed, escritor, leitores, manutenção, métricas e CSS — uma vez por processo.
+
+    O estilo do matplotlib fica em charts.py, aplicado no primeiro gráfico.
+    """
+    engine       = _step("engine", _make_engine, db_url)
+    SessionLocal = _step("sessionmaker", _make_sessionmaker, engine)
+    _step("create_all", _create_schema, engine)
+    _step("migrations", run_migrations, engine)
+    _step("pragmas", init_db_pragmas, engine)
+    seeded = _step("seed", _seed_default_user, SessionLocal)
+    writer = _step("writer", _make_writer, db_url)
+    reader = _step("reader", _make_reader, db_url, engine)
+    maintenance = _step("maintenance", _start_maintenance, db_url, writer)
+    _step("metrics", _instrument, engine, reader, writer)
+    css    = _step("css", _load_css, CSS_PATH)
+    return Runtime(engine=engine, SessionLocal=SessionLocal, css=css, seeded_demo=seeded, writer=writer,
+                   reader=reader, ReadSession=_make_sessionmaker(reader), maintenance=maintenance)
@@ -0,0 +1,161 @@
+"""Gráficos matplotlib das páginas (Dashboard e previsão de caixa), sem `st`.
+
+O matplotlib só é importado e configurado no primeiro gráfico: a tela de login
+e as páginas sem gráfico não pagam esse custo. As figuras são `Figure` avulsas,
+fora do registro global do pyplot, então não se acumulam entre reruns nem
+disputam estado entre sessões.
+
+O gráfico de evolução do Dashboard sai como PNG (`daily_chart_png`): os totais
+diários do SQL viram uma série em datas de verdade, diária ou semanal conforme
+o período, reduzida com LTTB quando passa de `MAX_PONTOS`. O app guarda os
+bytes no user_cache, pela versão das movimentações do usuário.
+"""
+import io
+import threading
+from datetime import date
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from aggregates import PeriodTotalsRow
+
+DIARIO_ATE = 120        # dias no eixo; acima disso a série é semanal
+MAX_PONTOS = 200        # pontos por linha depois do LTTB
+MARCADORES_ATE = 45     # com poucos pontos, cada um ganha marcador
+DPI = 120               # 1200 px de largura: mais que a coluna do layout "wide"
+
+ESTILO = {
+    'figure.facecolor': '#FFFFFF',
+    'axes.facecolor':   '#FFFFFF',
+    'axes.grid': True,
+    'grid.alpha': 0.30,
+    'grid.color': '#E5E7EB',
+    'axes.labelcolor': '#111827',
+    'xtick.color': '#6B7280',
+    'ytick.color': '#6B7280',
+    'figure.autolayout': True,
+    'font.size': 10
+}
+
+_lock = threading.Lock()
+_pronto = False
+
+def _setup():
+    """Importa o matplotlib e aplica o estilo uma vez por processo."""
+    global _pronto
+    with _lock:
+        if _pronto:
+            return
+        import matplotlib
+        import matplotlib.style
+        matplotlib.style.use('default')
+        matplotlib.rcParams.update(ESTILO)
+        _pronto = True
+
+def figure(width: float, height: float):
+    """(Figure, Axes) sem bordas de cima e da direita."""
+    if not _pronto:
+        _setup()
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(width, height))
+    ax = fig.subplots()
+    ax.spines['top'].set_visible(False); ax.spines['right'].set_visible(False)
+    return fig, ax
+
+# -----------------------------
+# Séries do Dashboard
+# -----------------------------
+class DailySeries(NamedTuple):
+    dates: np.ndarray       # datetime64[D]: o dia, ou a segunda-feira da semana
+    receitas: np.ndarray
+    despesas: np.ndarray
+    weekly: bool
+
+def daily_series(rows: Sequence[PeriodTotalsRow], inicio: Optional[date] = None, fim: Optional[date] = None,
+                 hoje: Optional[date] = None) -> DailySeries:
+    """Totais por dia (aggregates.totals_by_day) num eixo contínuo, com zero nos dias sem movimentação.
+
+    O eixo vai de `inicio` (ou do primeiro dia com dados) até `fim`, sem passar
+    de hoje a não ser que haja lançamento futuro. Acima de DIARIO_ATE dias os
+    valores são somados por semana (segunda a domingo).
+    """
+    if not rows:
+        vazio = np.array([], dtype="datetime64[D]")
+        return DailySeries(vazio, np.zeros(0), np.zeros(0), False)
+    dias = np.array([r.period for r in rows], dtype="datetime64[D]")
+    receitas = np.fromiter((r.receitas for r in rows), float, len(rows))
+    despesas = np.fromiter((r.despesas for r in rows), float, len(rows))
+    ultimo = dias.max()
+    ini = np.datetime64(inicio, "D") if inicio else dias.min()
+    fim_ = min(np.datetime64(fim, "D") if fim else ultimo, np.datetime64(hoje or date.today(), "D"))
+    fim_ = max(fim_, ultimo)
+    dentro = (dias >= ini) & (dias <= fim_)
+    dias, receitas, despesas = dias[dentro], receitas[dentro], despesas[dentro]
+
+    semanal = int((fim_ - ini).astype(int)) + 1 > DIARIO_ATE
+    if semanal:
+        # 1970-01-01 foi quinta: +3 dias alinha as semanas na segunda-feira
+        ini = ini - ((ini.astype(int) + 3) % 7)
+        idx = (dias - ini).astype(int) // 7
+        n = int((fim_ - ini).astype(int)) // 7 + 1
+        eixo = ini + np.arange(n) * 7
+    else:
+        idx = (dias - ini).astype(int)
+        n = int((fim_ - ini).astype(int)) + 1
+        eixo = ini + np.arange(n)
+    return DailySeries(eixo.astype("datetime64[D]"), np.bincount(idx, receitas, n), np.bincount(idx, despesas, n),
+                       semanal)
+
+def lttb(x: np.ndarray, y: np.ndarray, pontos: int):
+    """Largest-Triangle-Three-Buckets: `pontos` pontos de (x, y) que preservam a forma da linha.
+
+    Mantém o primeiro e o último; de cada balde do meio fica o ponto que forma
+    o maior triângulo com o escolhido antes e a média do balde seguinte.
+    """
+    n = len(y)
+    if pontos >= n or pontos < 3:
+        return x, y
+    xf = x.astype("datetime64[D]").astype(float) if np.issubdtype(x.dtype, np.datetime64) else x.astype(float)
+    limites = np.linspace(1, n - 1, pontos - 1).astype(int)      # pontos-2 baldes entre o primeiro e o último
+    escolhidos = np.empty(pontos, dtype=int)
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+    a = 0
+    for i in range(pontos - 2):
+        ini, fim = limites[i], limites[i + 1]
+        prox_ini, prox_fim = limites[i + 1], (limites[i + 2] if i + 2 < len(limites) else n)
+        mx, my = xf[prox_ini:prox_fim].mean(), y[prox_ini:prox_fim].mean()
+        area = np.abs((xf[a] - mx) * (y[ini:fim] - y[a]) - (xf[a] - xf[ini:fim]) * (my - y[a]))
+        a = ini + int(area.argmax())
+        escolhidos[i + 1] = a
+    return x[escolhidos], y[escolhidos]
+
+def daily_chart_png(serie: DailySeries) -> bytes:
+    """Receitas e despesas no tempo, em PNG; cada linha com no máximo MAX_PONTOS pontos."""
+    import matplotlib.dates as mdates
+    fig, ax = figure(10, 4)
+    marcador = "o" if len(serie.dates) <= MARCADORES_ATE else None
+    for valores, cor, nome in ((serie.receitas, "green", "Receitas"), (serie.despesas, "red", "Despesas")):
+        x, y = lttb(serie.dates, valores, MAX_PONTOS)
+        ax.plot(x, y, color=cor, marker=marcador, markersize=4, label=nome)
+    locator = mdates.AutoDateLocator()
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+    ax.set_ylabel("por semana" if serie.weekly else "por dia")
+    ax.legend(); ax.grid(True, alpha=.3)
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=DPI, bbox_inches="tight")
+    return buf.getvalue()
+
+# -----------------------------
+# Previsão de caixa
+# -----------------------------
+def forecast_figure(serie: Sequence[Sequence[float]], weeks: int, mediana: int):
+    """Faixas 5–95% e 25–75% e a mediana de `serie` (percentis × semanas)."""
+    fig, ax = figure(10, 3.5)
+    x = list(range(weeks))
+    ax.fill_between(x, serie[0], serie[-1], color="#93C5FD", alpha=.35, label="5%–95%")
+    ax.fill_between(x, serie[1], serie[-2], color="#3B82F6", alpha=.35, label="25%–75%")
+    ax.plot(x, serie[mediana], color="#1D4ED8", label="Mediana")
+    ax.axhline(0, color="#DC2626", linewidth=.8)
+    ax.set_xlabel("Semanas"); ax.legend(loc="best")
+    return fig
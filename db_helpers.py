@@ -1,20 +1,11 @@
-from contextlib import contextmanager
 from typing import Optional
-import streamlit as st
-from sqlalchemy import delete
+from sqlalchemy import delete, select
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
 
-from models import Giant, GiantPayment, Movement, Bucket
-
-@contextmanager
-def tx(db: Session):
-    try:
-        yield
-        db.commit()
-    except Exception:
-        db.rollback()
-        raise
+from models import Giant, GiantPayment
+from allocation import Allocation, Entry, allocate_entries
+from snapshots import fetch_giant_totals
 
 def init_db_pragmas(engine: Engine):
     """SQLite pragmas para performance e integridade."""
@@ -26,64 +17,41 @@ def init_db_pragmas(engine: Engine):
     except Exception:
         pass
 
-def delete_giant_safe(db: Session, user_id: int, giant_id: int) -> bool:
-    """Exclui gigante + pagamentos; sem warnings '0 rows matched'."""
-    stmt_pay = delete(GiantPayment).where(GiantPayment.giant_id == giant_id)
-    stmt_g   = delete(Giant).where(Giant.id == giant_id, Giant.user_id == user_id)
-    try:
-        with db.begin():
-            db.execute(stmt_pay)
-            res = db.execute(stmt_g)
-        if res.rowcount == 0:
-            st.info("Nada foi excluído (já não existia).")
-            return False
-        st.toast("🗑️ Excluído!")
-        return True
-    except Exception as e:
-        st.error(f"Erro ao excluir: {e}")
-        return False
+def delete_giant(db: Session, user_id: int, giant_id: int) -> int:
+    """Apaga pagamentos + gigante do usuário; retorna gigantes apagados. Não faz commit."""
+    owned = select(Giant.id).where(Giant.id == giant_id, Giant.user_id == user_id)
+    db.execute(delete(GiantPayment).where(GiantPayment.giant_id.in_(owned)))
+    return db.execute(delete(Giant).where(Giant.id == giant_id, Giant.user_id == user_id)).rowcount
 
 def distribute_by_buckets(db: Session, user_id: int, buckets: list, valor: float,
                           tipo: str, data_mov, desc: str, auto: bool = True,
-                          bucket_id: Optional[int] = None) -> bool:
-    """Divide entrada/saída por percentuais ou aplica em um balde específico."""
+                          bucket_id: Optional[int] = None) -> Allocation:
+    """Divide entrada/saída por percentuais ou aplica em um balde específico.
+
+    Grava as movimentações e ajusta o saldo dos baldes (ver allocation.py) e
+    retorna o rateio. Não faz commit nem usa `st`: roda como operação da fila de
+    escrita (writer.py); dados inválidos levantam ValueError.
+    """
     if valor <= 0:
-        st.error("Informe um valor maior que zero.")
-        return False
+        raise ValueError("Informe um valor maior que zero.")
 
     if auto or not bucket_id:
-        total_percent = sum(max(b.percent, 0) for b in buckets)
-        if total_percent <= 0:
-            st.error("Configure percentuais dos baldes.")
-            return False
-        for b in buckets:
-            part = round(valor * (b.percent / total_percent), 2)
-            db.add(Movement(
-                user_id=user_id, bucket_id=b.id,
-                kind=("Receita" if tipo == "Entrada" else "Despesa"),
-                amount=part, description=f"{desc} (auto {b.percent:.1f}%)",
-                date=data_mov
-            ))
-            if tipo == "Entrada": b.balance += part
-            else: b.balance -= part
-    else:
-        b = next((x for x in buckets if x.id == bucket_id), None)
-        if not b:
-            st.error("Balde inválido.")
-            return False
-        db.add(Movement(
-            user_id=user_id, bucket_id=b.id,
-            kind=("Receita" if tipo == "Entrada" else "Despesa"),
-            amount=valor, description=desc, date=data_mov
-        ))
-        if tipo == "Entrada": b.balance += valor
-        else: b.balance -= valor
-    return True
+        if sum(max(b.percent, 0) for b in buckets) <= 0:
+            raise ValueError("Configure percentuais dos baldes.")
+        return allocate_entries(db, user_id, buckets, [Entry(valor, tipo, data_mov, desc)])
 
-def giant_forecast_simple(giant: Giant, db: Session):
-    """Retorna (restante, diária, dias) baseado em weekly_goal."""
-    pago = sum(p.amount for p in db.query(GiantPayment).filter_by(giant_id=giant.id))
-    restante = max((giant.total_to_pay or 0.0) - pago, 0.0)
+    if not any(x.id == bucket_id for x in buckets):
+        raise ValueError("Balde inválido.")
+    return allocate_entries(db, user_id, buckets, [Entry(valor, tipo, data_mov, desc)], bucket_id=bucket_id)
+
+def forecast_from_paid(giant, pago: float):
+    """(restante, diária, dias) de um gigante dado o total já pago."""
+    restante = max((giant.total_to_pay or 0.0) - (pago or 0.0), 0.0)
     diaria   = (giant.weekly_goal or 0.0) / 7.0
     dias     = (restante / diaria) if diaria > 0 else None
     return restante, diaria, dias
+
+def giant_forecast_simple(giant: Giant, db: Session):
+    """Retorna (restante, diária, dias) baseado em weekly_goal."""
+    totals = fetch_giant_totals(db, giant.user_id, giant.id)
+    return forecast_from_paid(giant, totals[0].paid if totals else 0.0)
@@ -0,0 +1,179 @@
+"""Previsão de fluxo de caixa por Monte Carlo: saldo dos baldes semana a semana e risco das contas.
+
+A renda e o gasto semanais vêm do perfil (mensal x 12/52) com ruído lognormal
+(média preservada, coeficiente de variação `income_cv`/`expense_cv`). Cada
+caminho soma renda - gasto - contas em aberto no vencimento; tudo é uma matriz
+(caminhos x semanas).
+
+Os baldes seguem a regra de `distribute_by_buckets` (entrada e saída rateadas
+pelos percentuais, allocation.split_cents). O rateio é linear: o saldo de um
+balde é o saldo inicial mais uma fração fixa do fluxo acumulado, e percentis
+comutam com essa conta. Por isso o rateio é aplicado às faixas do total (Q x
+semanas linhas) em vez de a cada caminho, com o mesmo resultado a menos de
+centavos de arredondamento.
+
+Resultados ficam num LRU pelo hash das entradas; o gerador aleatório também é
+semeado pelo hash, então as mesmas entradas dão a mesma previsão.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Optional, Sequence, Tuple, NamedTuple
+
+import numpy as np
+
+from allocation import split_cents
+from money import to_cents
+
+PERCENTILES = (5, 25, 50, 75, 95)
+WEEKS = 52
+PATHS = 10_000
+INCOME_CV = 0.10
+EXPENSE_CV = 0.25
+
+class ForecastInputs(NamedTuple):
+    start: date
+    weekly_income: float
+    weekly_expense: float
+    income_cv: float
+    expense_cv: float
+    buckets: Tuple[Tuple[int, str, float, float], ...]        # (id, nome, percentual, saldo)
+    bills: Tuple[Tuple[int, str, date, float, bool], ...]     # (id, título, vencimento, valor, crítica) em aberto
+    weeks: int = WEEKS
+    paths: int = PATHS
+
+class BillRisk(NamedTuple):
+    id: int
+    title: str
+    due_date: date
+    amount: float
+    critical: bool
+    week: int            # semana do vencimento (1 = esta semana)
+    p_unpaid: float      # fração dos caminhos sem saldo para pagar a conta
+
+class Forecast(NamedTuple):
+    key: str
+    weeks: Tuple[date, ...]          # fim de cada semana; índice 0 = hoje
+    percentiles: Tuple[int, ...]
+    bucket_ids: Tuple[int, ...]
+    bucket_names: Tuple[str, ...]
+    bands: np.ndarray                # (Q, W+1, B) saldo de cada balde por percentil e semana
+    total: np.ndarray                # (Q, W+1) saldo somado dos baldes
+    bills: Tuple[BillRisk, ...]
+    seconds: float
+
+def forecast_inputs(profile, buckets: Sequence, bills: Sequence, start: Optional[date] = None,
+                    weeks: int = WEEKS, paths: int = PATHS,
+                    income_cv: float = INCOME_CV, expense_cv: float = EXPENSE_CV) -> ForecastInputs:
+    """ProfileRow + BucketRow + BillRow (snapshots.py) -> entradas imutáveis e hasheáveis."""
+    start = start or date.today()
+    fim = start + timedelta(weeks=weeks)
+    por_mes = 12 / 52
+    return ForecastInputs(
+        start,
+        round((profile.monthly_income or 0.0) * por_mes, 2) if profile else 0.0,
+        round((profile.monthly_expense or 0.0) * por_mes, 2) if profile else 0.0,
+        income_cv, expense_cv,
+        tuple((b.id, b.name, float(b.percent or 0.0), float(b.balance or 0.0)) for b in buckets),
+        tuple(sorted(((c.id, c.title, c.due_date, float(c.amount or 0.0), bool(c.is_critical))
+                      for c in bills if not c.paid and c.due_date < fim),
+                     key=lambda c: (c[2], not c[4], c[0]))),
+        weeks, paths,
+    )
+
+def input_key(inp: ForecastInputs) -> str:
+    return hashlib.sha1(repr(inp).encode("utf-8")).hexdigest()
+
+# -----------------------------
+# Simulação
+# -----------------------------
+def _lognormal(rng: np.random.Generator, mean: float, cv: float, shape) -> np.ndarray:
+    """Amostras com a média `mean` e coeficiente de variação `cv` (0 = constante)."""
+    if mean <= 0:
+        return np.zeros(shape)
+    if cv <= 0:
+        return np.full(shape, mean)
+    s2 = np.log1p(cv * cv)
+    return np.exp(rng.standard_normal(shape) * np.sqrt(s2) + (np.log(mean) - s2 / 2))
+
+def _quantiles(sorted_paths: np.ndarray, qs: Sequence[int]) -> np.ndarray:
+    """Percentis (interpolação linear, como np.percentile) de colunas já ordenadas."""
+    n = sorted_paths.shape[0]
+    pos = np.asarray(qs, dtype=np.float64) / 100 * (n - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, n - 1)
+    frac = (pos - lo)[:, None]
+    return sorted_paths[lo] * (1 - frac) + sorted_paths[hi] * frac
+
+def run_forecast(inp: ForecastInputs, key: Optional[str] = None) -> Forecast:
+    t0 = time.perf_counter()
+    key = key or input_key(inp)
+    rng = np.random.default_rng(int(key[:16], 16))
+    P, W = inp.paths, inp.weeks
+
+    # Contas: valor devido em cada semana (vencidas entram na primeira)
+    week_of = [min(max((b[2] - inp.start).days // 7 + 1, 1), W) for b in inp.bills]
+    due = np.zeros(W)
+    np.add.at(due, np.asarray(week_of, dtype=np.int64) - 1, [b[3] for b in inp.bills])
+
+    net = _lognormal(rng, inp.weekly_income, inp.income_cv, (P, W))
+    net -= _lognormal(rng, inp.weekly_expense, inp.expense_cv, (P, W))
+    fluxo = np.cumsum(net, axis=1)           # renda - gasto acumulados, sem as contas
+
+    saldo0 = sum(b[3] for b in inp.buckets)
+    # Risco: depois de pagar a conta k (e as anteriores, em ordem), o saldo ficou negativo?
+    pagas = np.cumsum([b[3] for b in inp.bills])
+    riscos = []
+    if inp.bills:
+        cols = np.asarray(week_of, dtype=np.int64) - 1
+        falta = (saldo0 + fluxo[:, cols] - pagas[None, :]) < 0
+        p_unpaid = falta.mean(axis=0)
+        riscos = [BillRisk(b[0], b[1], b[2], b[3], b[4], w, float(p))
+                  for b, w, p in zip(inp.bills, week_of, p_unpaid)]
+
+    fluxo -= np.cumsum(due)[None, :]
+    fluxo.sort(axis=0)
+    q_fluxo = _quantiles(fluxo, PERCENTILES)                          # (Q, W)
+    q_fluxo = np.concatenate([np.zeros((len(PERCENTILES), 1)), q_fluxo], axis=1)
+
+    # Rateio pela mesma regra das entradas/saídas automáticas
+    pesos = [max(b[2], 0.0) for b in inp.buckets]
+    saldos = np.array([to_cents(b[3]) for b in inp.buckets], dtype=np.int64)
+    if sum(pesos) > 0:
+        partes = split_cents(np.rint(q_fluxo.ravel() * 100).astype(np.int64), pesos)
+        bands = (saldos[None, None, :] + partes.reshape(len(PERCENTILES), W + 1, -1)) / 100
+    else:
+        bands = np.broadcast_to(saldos / 100, (len(PERCENTILES), W + 1, len(saldos))).copy()
+    total = saldo0 + q_fluxo
+
+    for a in (bands, total):
+        a.flags.writeable = False
+    return Forecast(
+        key, tuple(inp.start + timedelta(weeks=w) for w in range(W + 1)), PERCENTILES,
+        tuple(b[0] for b in inp.buckets), tuple(b[1] for b in inp.buckets),
+        bands, total, tuple(riscos), time.perf_counter() - t0,
+    )
+
+# -----------------------------
+# Cache pelo hash das entradas
+# -----------------------------
+_CACHE: "OrderedDict[str, Forecast]" = OrderedDict()
+_CACHE_MAX = 32
+_LOCK = threading.Lock()
+
+def forecast(inp: ForecastInputs) -> Forecast:
+    """run_forecast com LRU por hash das entradas: repetir a visão não recalcula."""
+    key = input_key(inp)
+    with _LOCK:
+        hit = _CACHE.get(key)
+        if hit is not None:
+            _CACHE.move_to_end(key)
+            return hit
+    out = run_forecast(inp, key)
+    with _LOCK:
+        _CACHE[key] = out
+        while len(_CACHE) > _CACHE_MAX:
+            _CACHE.popitem(last=False)
+    return out
@@ -0,0 +1,66 @@
+"""DataFrames das páginas (Dashboard e Livro Caixa), montados a partir dos snapshots.
+
+Funções puras, sem `st`: o app mostra o resultado e benchmarks/suite.py mede
+as mesmas funções na base sintética. O pandas é importado na primeira chamada,
+não no import do módulo: a tela de login não monta DataFrame.
+"""
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Sequence
+
+from aggregates import PeriodTotalsRow
+from metrics import instrument
+from snapshots import MovementRow
+from utils import money_br
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+money_br = instrument(money_br, "format")   # como em app.py: conta na fase "format"
+
+def date_br(dt):
+    if isinstance(dt, str):
+        try:
+            import pandas as pd
+            dt = pd.to_datetime(dt)
+        except Exception:
+            return dt
+    if isinstance(dt, (date, datetime)):          # pd.Timestamp é subclasse de datetime
+        return dt.strftime('%d/%m/%y')
+    return str(dt)
+
+def signed_br(m) -> str:
+    """Valor com sinal: despesas negativas."""
+    return money_br(m.amount if m.kind == "Receita" else -m.amount)
+
+# -----------------------------
+# Dashboard
+# -----------------------------
+def recent_frame(movements: Iterable[MovementRow]) -> "pd.DataFrame":
+    import pandas as pd
+    return pd.DataFrame([{
+        "Data": date_br(m.date), "Tipo": m.kind, "Valor": signed_br(m), "Descrição": m.description
+    } for m in movements])
+
+# -----------------------------
+# Livro Caixa
+# -----------------------------
+def monthly_frame(rows: Sequence[PeriodTotalsRow]) -> "pd.DataFrame":
+    """Resumo mensal, do mês mais recente para o mais antigo."""
+    import pandas as pd
+    return pd.DataFrame([{
+        "Mês": f"{r.period[5:7]}/{r.period[:4]}",
+        "Receitas": money_br(r.receitas), "Despesas": money_br(r.despesas),
+        "Saldo": money_br(r.receitas - r.despesas), "Lançamentos": r.count,
+    } for r in reversed(rows)])
+
+def ledger_frame(rows: Sequence[MovementRow], nomes: Optional[Dict[int, str]] = None) -> "pd.DataFrame":
+    import pandas as pd
+    nomes = nomes or {}
+    return pd.DataFrame({
+        "ID":        [m.id for m in rows],
+        "Data":      [date_br(m.date) for m in rows],
+        "Descrição": [m.description for m in rows],
+        "Balde":     [nomes.get(m.bucket_id, "—") for m in rows],
+        "Tipo":      [m.kind for m in rows],
+        "Valor":     [signed_br(m) for m in rows],
+    })
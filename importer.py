@@ -0,0 +1,324 @@
+"""Importação de extratos bancários (CSV/OFX) direto para movements, em streaming.
+
+Uso: python importer.py --user demo extrato.csv [--batch 1000] [--encoding utf-8]
+
+O arquivo é lido linha a linha por geradores e gravado em lotes de tamanho fixo,
+cada lote na sua transação; em memória ficam só o lote, os contadores de
+ocorrência dos dias mais recentes e as primeiras linhas com erro.
+Reimportar o mesmo extrato não duplica nada (hash de conteúdo único por usuário).
+"""
+import argparse
+import csv
+import hashlib
+import io
+import os
+import re
+import sys
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import date, datetime
+from itertools import chain
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+from sqlalchemy.engine import Engine
+
+from models import Movement
+from money import to_cents
+from utils import _to_float_br
+
+BATCH_SIZE = 1000
+ERROR_SAMPLES = 5      # linhas com erro guardadas para o relatório; as demais só contam
+HASH_WINDOW_DAYS = 31  # dias com contador de ocorrências em memória (ver _Hasher)
+
+# -----------------------------
+# Linhas do extrato
+# -----------------------------
+class StatementRow(NamedTuple):
+    data: date
+    valor: float         # com sinal: positivo = crédito, negativo = débito
+    desc: str
+    fitid: str = ""      # id da transação no OFX (vazio no CSV)
+
+class ParseError(NamedTuple):
+    line: int
+    message: str
+
+class ParseErrors:
+    """Erros de leitura: conta todos e guarda só os `limit` primeiros."""
+
+    def __init__(self, limit: int = ERROR_SAMPLES):
+        self.limit = limit
+        self.count = 0
+        self.samples: List[ParseError] = []
+
+    def append(self, err: ParseError) -> None:
+        self.count += 1
+        if len(self.samples) < self.limit:
+            self.samples.append(err)
+
+class ImportReport(NamedTuple):
+    read: int
+    inserted: int
+    duplicates: int
+    errors: int
+    seconds: float
+    error_samples: tuple = ()
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.read / self.seconds if self.seconds > 0 else 0.0
+
+def _norm(texto: str) -> str:
+    """Minúsculas, sem acentos e com espaços colapsados (cabeçalhos e descrições)."""
+    s = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode("ascii")
+    return " ".join(s.lower().split())
+
+def parse_valor(texto: str) -> float:
+    """Valor BR/US com sinal: '-1.234,56', '1.234,56-', '(1.234,56)' e '-1234.56'.
+
+    `_to_float_br` descarta o sinal, então ele é detectado à parte.
+    """
+    s = (texto or "").strip()
+    negativo = s.startswith("-") or s.endswith("-") or (s.startswith("(") and s.endswith(")"))
+    if not re.search(r"\d", s):
+        raise ValueError(f"valor inválido: {texto!r}")
+    v = _to_float_br(s)
+    return -v if negativo else v
+
+_DATE_FORMATS = ("%d/%m/%Y", "%d/%m/%y", "%Y-%m-%d", "%d-%m-%Y", "%d.%m.%Y")
+
+def parse_data(texto: str) -> date:
+    s = (texto or "").strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"data inválida: {texto!r}")
+
+# -----------------------------
+# CSV
+# -----------------------------
+_CSV_COLUMNS = {
+    "data":  ("data", "date", "dt", "data lancamento", "data do lancamento", "data movimento"),
+    "valor": ("valor", "amount", "value", "valor (r$)", "valor r$", "quantia"),
+    "desc":  ("descricao", "historico", "description", "memo", "lancamento", "detalhes"),
+}
+
+def _csv_layout(header: List[str]) -> Dict[str, int]:
+    cols = {_norm(h): i for i, h in enumerate(header)}
+    layout = {}
+    for campo, nomes in _CSV_COLUMNS.items():
+        for nome in nomes:
+            if nome in cols:
+                layout[campo] = cols[nome]
+                break
+    if "data" not in layout or "valor" not in layout:
+        raise ValueError("Cabeçalho do CSV sem colunas de data e valor.")
+    return layout
+
+def iter_csv(lines: Iterable[str], errors: Optional[ParseErrors] = None) -> Iterator[StatementRow]:
+    """Linhas do CSV (separador ; , ou tab, detectado pelo cabeçalho)."""
+    it = iter(lines)
+    first = next(it, "")
+    try:
+        dialect = csv.Sniffer().sniff(first, delimiters=";,\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(chain([first], it), dialect)
+    layout = _csv_layout(next(reader, []))
+    for n, rec in enumerate(reader, start=2):
+        if not any(c.strip() for c in rec):
+            continue
+        try:
+            desc = rec[layout["desc"]].strip() if "desc" in layout and layout["desc"] < len(rec) else ""
+            yield StatementRow(parse_data(rec[layout["data"]]), parse_valor(rec[layout["valor"]]), desc)
+        except (ValueError, IndexError) as e:
+            if errors is not None:
+                errors.append(ParseError(n, str(e)))
+
+# -----------------------------
+# OFX (SGML ou XML, sem carregar o arquivo inteiro)
+# -----------------------------
+_OFX_TAG = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+def iter_ofx(lines: Iterable[str], errors: Optional[ParseErrors] = None) -> Iterator[StatementRow]:
+    """Transações <STMTTRN> do OFX; só os campos da transação atual ficam em memória."""
+    atual: Optional[Dict[str, str]] = None
+    inicio = 0
+    for n, line in enumerate(lines, start=1):
+        upper = line.upper()
+        if "<STMTTRN>" in upper:
+            atual, inicio = {}, n
+        if atual is not None:
+            for tag, valor in _OFX_TAG.findall(line):
+                if valor.strip():
+                    atual[tag.upper()] = valor.strip()
+        if "</STMTTRN>" in upper and atual is not None:
+            try:
+                dt = datetime.strptime(atual.get("DTPOSTED", "")[:8], "%Y%m%d").date()
+                desc = atual.get("MEMO") or atual.get("NAME", "")
+                yield StatementRow(dt, parse_valor(atual.get("TRNAMT", "")), desc, atual.get("FITID", ""))
+            except ValueError as e:
+                if errors is not None:
+                    errors.append(ParseError(inicio, str(e)))
+            atual = None
+
+def iter_statement(stream: TextIO, filename: str = "",
+                   errors: Optional[ParseErrors] = None) -> Iterator[StatementRow]:
+    """Escolhe o parser pela extensão (ou pelo conteúdo, se a extensão não disser)."""
+    if filename.lower().endswith((".ofx", ".qfx")):
+        return iter_ofx(stream, errors)
+    if filename.lower().endswith((".csv", ".txt")):
+        return iter_csv(stream, errors)
+    first = next(iter(stream), "")
+    rest = chain([first], stream)
+    if "OFX" in first.upper() or first.lstrip().startswith("<"):
+        return iter_ofx(rest, errors)
+    return iter_csv(rest, errors)
+
+# -----------------------------
+# Deduplicação e gravação em lotes
+# -----------------------------
+class _Hasher:
+    """Hash de conteúdo; a ocorrência distingue lançamentos iguais no mesmo dia.
+
+    Supõe o extrato agrupado por data (crescente ou decrescente, como os bancos
+    exportam): só os contadores dos últimos `window` dias ficam em memória. Uma
+    linha que volte a um dia já fora da janela recomeça a contagem daquele dia
+    e pode ser tomada por duplicata.
+    """
+
+    def __init__(self, user_id: int, window: int = HASH_WINDOW_DAYS):
+        self.user_id = user_id
+        self.window = window
+        self.days: "OrderedDict[date, Dict[Tuple[int, str], int]]" = OrderedDict()
+
+    def __call__(self, row: StatementRow, cents: int) -> str:
+        if row.fitid:
+            chave = f"{self.user_id}|fitid|{row.fitid}"
+        else:
+            vistos = self.days.get(row.data)
+            if vistos is None:
+                vistos = self.days[row.data] = {}
+                if len(self.days) > self.window:
+                    self.days.popitem(last=False)
+            else:
+                self.days.move_to_end(row.data)
+            conteudo = (cents, _norm(row.desc))
+            ocorrencia = vistos.get(conteudo, 0)
+            vistos[conteudo] = ocorrencia + 1
+            chave = f"{self.user_id}|{row.data.isoformat()}|{cents}|{conteudo[1]}|{ocorrencia}"
+        return hashlib.sha1(chave.encode("utf-8")).hexdigest()
+
+def _insert_ignore(dialect: str):
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise ValueError(f"Importação não suportada para o banco '{dialect}'.")
+    return insert(Movement.__table__).on_conflict_do_nothing(index_elements=["user_id", "import_hash"])
+
+def import_rows(engine: Engine, user_id: int, rows: Iterable[StatementRow], batch_size: int = BATCH_SIZE,
+                on_batch: Optional[Callable[[ImportReport], None]] = None,
+                errors: Optional[ParseErrors] = None, writer=None) -> ImportReport:
+    """Grava as linhas em lotes de `batch_size`, um commit por lote; duplicadas são ignoradas pelo banco.
+
+    Com `writer` (writer.WriteQueue) cada lote vira uma operação da fila de escrita
+    do processo, em vez de abrir transação própria no `engine`.
+    """
+    stmt = _insert_ignore(engine.dialect.name)
+    h = _Hasher(user_id)
+    t0 = time.perf_counter()
+    lido = inserido = 0
+    lote: List[dict] = []
+
+    def relatorio() -> ImportReport:
+        n_err = errors.count if errors is not None else 0
+        amostra = tuple(f"linha {e.line}: {e.message}" for e in (errors.samples if errors is not None else ()))
+        return ImportReport(lido, inserido, lido - inserido - len(lote), n_err, time.perf_counter() - t0, amostra)
+
+    def gravar():
+        nonlocal inserido
+        if writer is not None:
+            inserido += writer.run(lambda db: db.execute(stmt, lote).rowcount)
+        else:
+            with engine.begin() as conn:
+                inserido += conn.execute(stmt, lote).rowcount
+        lote.clear()
+        if on_batch:
+            on_batch(relatorio())
+
+    for row in rows:
+        cents = to_cents(row.valor)
+        if cents == 0:
+            continue
+        lido += 1
+        lote.append({
+            "user_id": user_id, "bucket_id": None,
+            "kind": "Receita" if cents > 0 else "Despesa",
+            "amount": abs(cents) / 100,
+            "description": (row.desc or "Importado")[:200],
+            "date": row.data,
+            "import_hash": h(row, cents),
+        })
+        if len(lote) >= batch_size:
+            gravar()
+    if lote:
+        gravar()
+    return relatorio()
+
+def import_file(engine: Engine, user_id: int, stream: TextIO, filename: str = "",
+                batch_size: int = BATCH_SIZE,
+                on_batch: Optional[Callable[[ImportReport], None]] = None, writer=None) -> ImportReport:
+    errors = ParseErrors()
+    return import_rows(engine, user_id, iter_statement(stream, filename, errors), batch_size, on_batch, errors, writer)
+
+def text_stream(binary, encoding: str = "utf-8") -> TextIO:
+    """Texto linha a linha sobre um arquivo binário (upload do Streamlit ou open(..., 'rb'))."""
+    if encoding.lower().replace("-", "") == "utf8":
+        encoding = "utf-8-sig"  # ignora BOM de exportações do Excel
+    return io.TextIOWrapper(binary, encoding=encoding, errors="replace", newline="")
+
+# -----------------------------
+# Linha de comando
+# -----------------------------
+def main(argv: Optional[List[str]] = None) -> int:
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.orm import Session
+    from models import Base, User
+    from migrations import run_migrations
+
+    p = argparse.ArgumentParser(description="Importa extrato CSV/OFX em movements.")
+    p.add_argument("arquivo")
+    p.add_argument("--user", required=True, help="nome do usuário")
+    p.add_argument("--batch", type=int, default=BATCH_SIZE)
+    p.add_argument("--encoding", default="utf-8")
+    args = p.parse_args(argv)
+
+    engine = create_engine(os.getenv("DATABASE_URL", "sqlite:///sql_app.db"), future=True)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    with Session(engine) as db:
+        user_id = db.execute(select(User.id).where(User.name == args.user)).scalar()
+    if user_id is None:
+        print(f"usuário não encontrado: {args.user}", file=sys.stderr)
+        return 2
+
+    def progresso(r: ImportReport):
+        print(f"\r{r.read} linhas, {r.inserted} inseridas ({r.rows_per_sec:,.0f} linhas/s)", end="", file=sys.stderr)
+
+    with open(args.arquivo, "rb") as f:
+        rep = import_file(engine, user_id, text_stream(f, args.encoding), args.arquivo, args.batch, progresso)
+    print(file=sys.stderr)
+    print(f"lidas={rep.read} inseridas={rep.inserted} duplicadas={rep.duplicates} "
+          f"erros={rep.errors} tempo={rep.seconds:.2f}s taxa={rep.rows_per_sec:,.0f} linhas/s")
+    for msg in rep.error_samples:
+        print(f"  {msg}")
+    engine.dispose()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
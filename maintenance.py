@@ -0,0 +1,239 @@
+"""Manutenção do SQLite em segundo plano: checkpoint do WAL, estatísticas e vacuum incremental.
+
+Uso: python maintenance.py            uma passada com os limites normais em DATABASE_URL
+     python maintenance.py --all      força checkpoint, ANALYZE e vacuum agora
+     python maintenance.py --convert  converte o banco para auto_vacuum=INCREMENTAL (VACUUM completo)
+
+Uma thread por processo (iniciada no bootstrap) acorda a cada `interval` segundos:
+- wal_checkpoint(TRUNCATE) quando o -wal passa de `wal_limit` bytes: o
+  autocheckpoint do SQLite é PASSIVE e nunca encolhe o arquivo;
+- ANALYZE com analysis_limit a cada `analyze_every` segundos (já na primeira
+  passada se o banco nunca foi analisado), seguido de PRAGMA optimize;
+- incremental_vacuum em janelas ociosas (nenhuma escrita há `idle_after` segundos).
+  Só funciona com auto_vacuum=INCREMENTAL, que o bootstrap liga nos bancos novos;
+  bancos antigos (auto_vacuum=NONE) ficam sem vacuum até rodar `--convert` com o
+  app parado, porque o VACUUM completo reescreve o arquivo inteiro e seguraria a
+  fila de escrita. O pulo fica registrado no histórico e em `stats()`.
+Tudo roda pela fila de escrita (`WriteQueue.run_direct`), então a manutenção
+nunca disputa o lock com as escritas do app.
+"""
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.engine import make_url
+
+from writer import WriteQueue
+
+AUTO_VACUUM = {0: "NONE", 1: "FULL", 2: "INCREMENTAL"}
+NOT_CONVERTED = "pulado: banco sem auto_vacuum=INCREMENTAL (python maintenance.py --convert)"
+WAL_LIMIT = 4 * 1024 * 1024     # ~ o autocheckpoint padrão (1000 páginas de 4 KiB)
+ANALYSIS_LIMIT = 1000           # linhas amostradas por índice no ANALYZE
+
+class MaintenanceRun(NamedTuple):
+    task: str            # checkpoint / analyze / vacuum / convert
+    at: float            # time.time() do início
+    seconds: float
+    reclaimed: int       # bytes devolvidos ao sistema (WAL truncado ou páginas livres)
+    detail: str = ""
+    error: str = ""
+
+def db_path(db_url: str) -> Optional[str]:
+    """Arquivo do banco SQLite; None para banco em memória ou outro SGBD."""
+    url = make_url(db_url)
+    if not url.drivername.startswith("sqlite"):
+        return None
+    db = url.database or ""
+    if db in ("", ":memory:") or db.startswith("file:"):
+        return None
+    return db
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+# -----------------------------
+# Tarefas (rodam na conexão crua do escritor, fora de transação)
+# -----------------------------
+def _checkpoint(conn) -> Tuple[str, int]:
+    # Bytes devolvidos são medidos pelo tamanho do -wal (no TRUNCATE o pragma reporta 0/0)
+    busy = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()[0]
+    return "leitores ativos: WAL não truncado" if busy else "", 0
+
+def _analyze(conn) -> Tuple[str, int]:
+    conn.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA optimize")
+    return f"analysis_limit={ANALYSIS_LIMIT}", 0
+
+def _auto_vacuum(conn) -> int:
+    return conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+
+def _vacuum(pages: int, min_free: int) -> Callable[[Any], Optional[Tuple[str, int]]]:
+    def run(conn) -> Optional[Tuple[str, int]]:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if free < min_free:
+            return None
+        # execute() só dá um passo (= uma página); executescript roda até o fim
+        conn.executescript(f"PRAGMA incremental_vacuum({pages});")
+        freed = free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return f"{freed} de {free} páginas livres", freed * page_size
+    return run
+
+def _convert(conn) -> Tuple[str, int]:
+    """auto_vacuum=INCREMENTAL com VACUUM completo; nunca roda pela thread."""
+    if _auto_vacuum(conn) == 2:
+        return "já está em auto_vacuum=INCREMENTAL", 0
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+    return "auto_vacuum=INCREMENTAL (VACUUM completo)", free * page_size
+
+# -----------------------------
+# Agendador
+# -----------------------------
+class Maintainer:
+    """Thread de manutenção de um banco SQLite em arquivo."""
+
+    def __init__(self, writer: WriteQueue, path: str, wal_limit: int = WAL_LIMIT,
+                 interval: float = 30.0, analyze_every: float = 6 * 3600, idle_after: float = 60.0,
+                 vacuum_pages: int = 512, min_free_pages: int = 64, history: int = 200):
+        self.writer = writer
+        self.path = path
+        self.wal_limit = wal_limit
+        self.interval = interval
+        self.analyze_every = analyze_every
+        self.idle_after = idle_after
+        self.vacuum_pages = vacuum_pages
+        self.min_free_pages = min_free_pages
+        self._runs: deque = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._last_analyze: Optional[float] = None
+        self.auto_vacuum: Optional[int] = None     # lido na última janela ociosa
+        self._skip_recorded = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="sqlite-maintenance", daemon=True)
+
+    # -------- API --------
+    def start(self) -> "Maintainer":
+        self._thread.start()
+        return self
+
+    def close(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def wal_size(self) -> int:
+        return _size(self.path + "-wal")
+
+    def tick(self, force: bool = False) -> List[MaintenanceRun]:
+        """Uma passada: roda só o que estiver vencido (ou tudo, com `force`)."""
+        runs: List[Optional[MaintenanceRun]] = []
+        if force or self._analyze_due():
+            runs.append(self._run("analyze", _analyze))
+            self._last_analyze = time.monotonic()
+        if force or self.writer.idle_seconds() >= self.idle_after:
+            self.auto_vacuum = self.writer.run_direct(_auto_vacuum)
+            if self.auto_vacuum == 2:
+                runs.append(self._run("vacuum", _vacuum(self.vacuum_pages, self.min_free_pages)))
+            elif not self._skip_recorded:
+                # Uma vez por processo, para não encher o histórico a cada passada
+                runs.append(self._run("vacuum", lambda conn: (NOT_CONVERTED, 0)))
+                self._skip_recorded = True
+        # Por último: VACUUM/incremental_vacuum escrevem no WAL
+        if force or self.wal_size() > self.wal_limit:
+            runs.append(self._run("checkpoint", _checkpoint))
+        return [r for r in runs if r is not None]
+
+    def history(self) -> List[MaintenanceRun]:
+        with self._lock:
+            return list(self._runs)
+
+    def stats(self) -> Dict[str, Any]:
+        runs = self.history()
+        by_task: Dict[str, int] = {}
+        for r in runs:
+            by_task[r.task] = by_task.get(r.task, 0) + 1
+        return {
+            "runs": len(runs),
+            "by_task": by_task,
+            "errors": sum(1 for r in runs if r.error),
+            "reclaimed": sum(r.reclaimed for r in runs),
+            "seconds": sum(r.seconds for r in runs),
+            "wal_bytes": self.wal_size(),
+            "db_bytes": _size(self.path),
+            "auto_vacuum": AUTO_VACUUM.get(self.auto_vacuum) if self.auto_vacuum is not None else None,
+            "last": runs[-1] if runs else None,
+        }
+
+    # -------- internos --------
+    def _analyze_due(self) -> bool:
+        if self._last_analyze is None:
+            # Primeira passada do processo: só analisa se o banco nunca foi analisado
+            self._last_analyze = time.monotonic()
+            return self.writer.run_direct(lambda conn: conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone() is None)
+        return time.monotonic() - self._last_analyze >= self.analyze_every
+
+    def _run(self, task: str, fn: Callable[[Any], Optional[Tuple[str, int]]]) -> Optional[MaintenanceRun]:
+        at, t0 = time.time(), time.perf_counter()
+        wal_before = self.wal_size()
+        try:
+            out = self.writer.run_direct(fn)
+            if out is None:
+                return None
+            detail, reclaimed = out
+            error = ""
+        except Exception as e:
+            detail, reclaimed, error = "", 0, str(e)
+        if task == "checkpoint":
+            reclaimed = max(wal_before - self.wal_size(), 0)
+        run = MaintenanceRun(task, at, time.perf_counter() - t0, reclaimed, detail, error)
+        with self._lock:
+            self._runs.append(run)
+        return run
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.tick()
+            except Exception:
+                pass  # próxima passada tenta de novo; falhas das tarefas ficam no histórico
+
+def start_maintenance(db_url: str, writer: WriteQueue, **kwargs) -> Optional[Maintainer]:
+    """Inicia a thread de manutenção; None se o banco não for um arquivo SQLite."""
+    path = db_path(db_url)
+    if path is None:
+        return None
+    return Maintainer(writer, path, **kwargs).start()
+
+# -----------------------------
+# Linha de comando
+# -----------------------------
+if __name__ == "__main__":
+    from writer import make_write_engine
+
+    url = os.getenv("DATABASE_URL", "sqlite:///sql_app.db")
+    path = db_path(url)
+    if path is None:
+        print(f"manutenção só se aplica a SQLite em arquivo: {url}", file=sys.stderr)
+        sys.exit(2)
+    wq = WriteQueue(make_write_engine(url))
+    m = Maintainer(wq, path, idle_after=0)
+    before = _size(path) + m.wal_size()
+    if "--convert" in sys.argv[1:]:
+        runs = [m._run("convert", _convert), m._run("checkpoint", _checkpoint)]
+    else:
+        runs = m.tick(force="--all" in sys.argv[1:])
+    for r in runs:
+        print(f"{r.task:12} {r.seconds * 1000:8.1f} ms  {r.reclaimed:>10,} bytes  {r.error or r.detail}")
+    print(f"banco + WAL: {before:,} -> {_size(path) + m.wal_size():,} bytes")
+    wq.close()
@@ -0,0 +1,329 @@
+"""Instrumentação dos caminhos quentes: consultas, tempo de SQL e fases de cada página.
+
+Cada execução de página (um rerun do Streamlit) abre um registro numa
+ContextVar da thread do script. Os eventos before/after_cursor_execute dos
+engines somam consultas e tempo de SQL na execução corrente; `phase("dataframe")`,
+`phase("chart")` e `instrument(fn, "format")` medem trechos do código da página;
+o cache por usuário conta acertos e faltas (`count`). As fases são exclusivas:
+o SQL e as fases aninhadas não entram na fase de fora, então o tempo da página
+é SQL + fases + resto (widgets, lógica).
+
+As execuções terminadas ficam num buffer circular em processo (STORE), resumido
+na página de diagnóstico. Com METRICS_EXPORT definido, o resumo também vai para
+esse arquivo (texto do Prometheus se terminar em .prom, senão JSON), no máximo
+a cada METRICS_EXPORT_EVERY segundos.
+"""
+import functools
+import json
+import math
+import os
+import threading
+import time
+import weakref
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PHASES = ("dataframe", "chart", "format", "write")
+SLOW_QUERY = 0.05        # segundos; consultas acima disso entram na amostra de lentas
+
+class PageRun(NamedTuple):
+    page: str
+    at: float                                # time.time() do início
+    seconds: float
+    queries: int
+    sql_seconds: float
+    phases: Tuple[Tuple[str, float], ...]    # tempo exclusivo de cada fase
+    cache_hits: int
+    cache_misses: int
+    status: str                              # ok / rerun / stop / erro
+
+    def phase(self, name: str) -> float:
+        return dict(self.phases).get(name, 0.0)
+
+class PageSummary(NamedTuple):
+    page: str
+    runs: int
+    p50: float
+    p95: float
+    max: float
+    queries: float                           # média por execução
+    sql_seconds: float                       # média por execução
+    phases: Tuple[Tuple[str, float], ...]    # média por execução
+    cache_hit_rate: float
+    errors: int
+
+class SlowQuery(NamedTuple):
+    seconds: float
+    page: str
+    engine: str
+    statement: str
+
+class _Run:
+    """Execução em andamento (só a thread do script mexe nela)."""
+    __slots__ = ("page", "at", "t0", "queries", "sql", "phases", "counters", "stack")
+
+    def __init__(self, page: str):
+        self.page = page
+        self.at = time.time()
+        self.t0 = time.perf_counter()
+        self.queries = 0
+        self.sql = 0.0
+        self.phases: Dict[str, float] = defaultdict(float)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.stack: List[list] = []          # [nome, início, tempo dos filhos]
+
+    def finish(self, status: str) -> PageRun:
+        return PageRun(self.page, self.at, time.perf_counter() - self.t0, self.queries, self.sql,
+                       tuple(sorted(self.phases.items())), self.counters["cache_hits"],
+                       self.counters["cache_misses"], status)
+
+_CURRENT: ContextVar[Optional[_Run]] = ContextVar("metrics_run", default=None)
+_INSTALLED: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+def _quantile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Posto mais próximo: p50 de [a, b] é a, p95 de 20 valores é o 19º
+    return sorted_values[max(math.ceil(q * len(sorted_values)) - 1, 0)]
+
+# -----------------------------
+# Armazenamento em processo
+# -----------------------------
+class MetricsStore:
+    """Últimas `maxlen` execuções de página + totais acumulados (monotônicos) por página e engine."""
+
+    def __init__(self, maxlen: int = 1000, export_path: Optional[str] = None, export_every: float = 60.0):
+        self.export_path = export_path
+        self.export_every = export_every
+        self._lock = threading.Lock()
+        self._runs: deque = deque(maxlen=maxlen)
+        self._totals: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._engines: Dict[str, Dict[str, float]] = defaultdict(lambda: {"queries": 0, "seconds": 0.0})
+        self._slow: deque = deque(maxlen=50)
+        self._last_export = 0.0
+
+    def add(self, run: PageRun):
+        with self._lock:
+            self._runs.append(run)
+            t = self._totals[run.page]
+            t["runs"] += 1
+            t["seconds"] += run.seconds
+            t["queries"] += run.queries
+            t["sql_seconds"] += run.sql_seconds
+            t["cache_hits"] += run.cache_hits
+            t["cache_misses"] += run.cache_misses
+            t["errors"] += run.status == "erro"
+            for name, s in run.phases:
+                t[f"phase:{name}"] += s
+        self.maybe_export()
+
+    def query(self, engine: str, seconds: float, page: str, statement: str):
+        with self._lock:
+            e = self._engines[engine]
+            e["queries"] += 1
+            e["seconds"] += seconds
+            if seconds >= SLOW_QUERY:
+                self._slow.append(SlowQuery(seconds, page, engine, " ".join(statement.split())[:300]))
+
+    def runs(self) -> Tuple[PageRun, ...]:
+        with self._lock:
+            return tuple(self._runs)
+
+    def engines(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._engines.items()}
+
+    def slow_queries(self) -> Tuple[SlowQuery, ...]:
+        with self._lock:
+            return tuple(sorted(self._slow, reverse=True))
+
+    def totals(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._totals.items()}
+
+    def summary(self) -> List[PageSummary]:
+        """Resumo por página das execuções no buffer (a janela, não o acumulado)."""
+        por_pagina: Dict[str, List[PageRun]] = defaultdict(list)
+        for r in self.runs():
+            por_pagina[r.page].append(r)
+        out = []
+        for page, runs in sorted(por_pagina.items()):
+            n = len(runs)
+            tempos = sorted(r.seconds for r in runs)
+            fases: Dict[str, float] = defaultdict(float)
+            for r in runs:
+                for name, s in r.phases:
+                    fases[name] += s / n
+            hits, misses = sum(r.cache_hits for r in runs), sum(r.cache_misses for r in runs)
+            out.append(PageSummary(
+                page, n, _quantile(tempos, .5), _quantile(tempos, .95), tempos[-1],
+                sum(r.queries for r in runs) / n, sum(r.sql_seconds for r in runs) / n,
+                tuple(sorted(fases.items())), hits / (hits + misses) if hits + misses else 0.0,
+                sum(r.status == "erro" for r in runs),
+            ))
+        return out
+
+    # -----------------------------
+    # Exportação
+    # -----------------------------
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "generated_at": time.time(),
+            "pages": [s._asdict() | {"phases": dict(s.phases)} for s in self.summary()],
+            "totals": self.totals(),
+            "engines": self.engines(),
+            "slow_queries": [q._asdict() for q in self.slow_queries()],
+        }
+
+    def to_prometheus(self) -> str:
+        linhas: List[str] = []
+
+        def metric(name: str, kind: str, help_: str, samples: List[Tuple[Dict[str, str], float]]):
+            linhas.append(f"# HELP {name} {help_}")
+            linhas.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lbl = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                linhas.append(f"{name}{{{lbl}}} {value:.6g}" if lbl else f"{name} {value:.6g}")
+
+        por_pagina = sorted(self.totals().items())
+        janela = self.summary()
+        # Quantis da janela em memória; _sum e _count acumulados desde o início do processo
+        metric("davi_page_seconds", "summary", "Tempo de execução da página.",
+               [({"page": s.page, "quantile": q}, v) for s in janela for q, v in (("0.5", s.p50), ("0.95", s.p95))])
+        linhas.extend(f'davi_page_seconds_sum{{page="{_escape(p)}"}} {t["seconds"]:.6g}' for p, t in por_pagina)
+        linhas.extend(f'davi_page_seconds_count{{page="{_escape(p)}"}} {t["runs"]:.0f}' for p, t in por_pagina)
+        metric("davi_page_queries_total", "counter", "Consultas SQL feitas pela página.",
+               [({"page": p}, t["queries"]) for p, t in por_pagina])
+        metric("davi_page_sql_seconds_total", "counter", "Tempo em SQL durante a página.",
+               [({"page": p}, t["sql_seconds"]) for p, t in por_pagina])
+        metric("davi_page_phase_seconds_total", "counter", "Tempo exclusivo por fase (dataframe, chart, format, write).",
+               [({"page": p, "phase": k[6:]}, v) for p, t in por_pagina for k, v in sorted(t.items()) if k.startswith("phase:")])
+        metric("davi_page_cache_hits_total", "counter", "Acertos do cache por usuário durante a página.",
+               [({"page": p}, t["cache_hits"]) for p, t in por_pagina])
+        metric("davi_page_cache_misses_total", "counter", "Faltas do cache por usuário durante a página.",
+               [({"page": p}, t["cache_misses"]) for p, t in por_pagina])
+        metric("davi_page_errors_total", "counter", "Execuções de página que terminaram em exceção.",
+               [({"page": p}, t["errors"]) for p, t in por_pagina])
+        eng = self.engines()
+        metric("davi_engine_queries_total", "counter", "Consultas SQL por engine (inclui escritor e manutenção).",
+               [({"engine": k}, v["queries"]) for k, v in sorted(eng.items())])
+        metric("davi_engine_sql_seconds_total", "counter", "Tempo em SQL por engine.",
+               [({"engine": k}, v["seconds"]) for k, v in sorted(eng.items())])
+        return "\n".join(linhas) + "\n"
+
+    def export(self, path: Optional[str] = None) -> Optional[str]:
+        """Grava o resumo em `path` (troca atômica do arquivo); retorna o caminho gravado."""
+        path = path or self.export_path
+        if not path:
+            return None
+        body = self.to_prometheus() if path.endswith(".prom") else json.dumps(self.to_json(), ensure_ascii=False, indent=1)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(body)
+        os.replace(tmp, path)
+        self._last_export = time.monotonic()
+        return path
+
+    def maybe_export(self):
+        if self.export_path and time.monotonic() - self._last_export >= self.export_every:
+            try:
+                self.export()
+            except OSError:
+                pass          # diagnóstico não pode derrubar a página
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+STORE = MetricsStore(export_path=os.getenv("METRICS_EXPORT") or None,
+                     export_every=float(os.getenv("METRICS_EXPORT_EVERY", "60")))
+
+# -----------------------------
+# Medição
+# -----------------------------
+@contextmanager
+def page_run(page: str, store: Optional[MetricsStore] = None) -> Iterator[Optional[_Run]]:
+    """Mede uma execução de página; st.rerun/st.stop (exceções de controle) também são registrados."""
+    run = _Run(page)
+    token = _CURRENT.set(run)
+    status = "ok"
+    try:
+        yield run
+    except BaseException as e:
+        nome = type(e).__name__
+        status = "rerun" if nome == "RerunException" else "stop" if nome == "StopException" else "erro"
+        raise
+    finally:
+        _CURRENT.reset(token)
+        (store or STORE).add(run.finish(status))
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Soma o tempo do bloco (menos SQL e fases aninhadas) na fase `name` da execução corrente."""
+    run = _CURRENT.get()
+    if run is None:
+        yield
+        return
+    frame = [name, time.perf_counter(), 0.0]
+    run.stack.append(frame)
+    try:
+        yield
+    finally:
+        run.stack.pop()
+        elapsed = time.perf_counter() - frame[1]
+        run.phases[name] += elapsed - frame[2]
+        if run.stack:
+            run.stack[-1][2] += elapsed
+
+def instrument(fn: Callable, name: str) -> Callable:
+    """`fn` medido na fase `name` quando chamado dentro de uma página (fora dela, custo de uma leitura)."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _CURRENT.get() is None:
+            return fn(*args, **kwargs)
+        with phase(name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+def count(name: str, n: int = 1):
+    run = _CURRENT.get()
+    if run is not None:
+        run.counters[name] += n
+
+def install(engine: Engine, label: str, store: Optional[MetricsStore] = None) -> bool:
+    """Liga os eventos de cursor no engine (uma vez); retorna False se já estavam ligados."""
+    store = store or STORE
+    if engine in _INSTALLED:
+        return False
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_t0", []).append(time.perf_counter())
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        inicio = conn.info.get("metrics_t0")
+        if not inicio:
+            return
+        elapsed = time.perf_counter() - inicio.pop()
+        run = _CURRENT.get()
+        if run is not None:
+            run.queries += 1
+            run.sql += elapsed
+            if run.stack:
+                run.stack[-1][2] += elapsed
+        store.query(label, elapsed, run.page if run else "", statement)
+
+    def error(ctx):
+        # Consulta que falhou não chega no after: descarta o início empilhado
+        inicio = ctx.connection.info.get("metrics_t0") if ctx.connection is not None else None
+        if inicio:
+            inicio.pop()
+
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
+    event.listen(engine, "handle_error", error)
+    _INSTALLED.add(engine)
+    return True
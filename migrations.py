@@ -0,0 +1,302 @@
+"""Migrações incrementais de schema para bancos já existentes.
+
+Uso: python migrations.py            aplica as migrações pendentes em DATABASE_URL
+     python migrations.py --plans    mostra o EXPLAIN QUERY PLAN dos loaders num
+                                     schema em memória e sai com código 1 se algum
+                                     fizer full scan
+"""
+import os
+import sys
+from datetime import date, datetime
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine, insert, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateTable
+
+from balances import backfill as backfill_balances, balances_at_stmt, deltas_stmt
+from models import Base, Bucket, Cents
+from rollups import install_triggers, drop_triggers, rebuild as rebuild_rollups
+from search import fts5_available, install as install_search
+from snapshots import (
+    profile_stmt, buckets_stmt, giants_stmt, giant_totals_stmt, bills_stmt, movements_stmt, ledger_stmt,
+    bill_rules_stmt, bill_occurrences_stmt,
+)
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("version",    Integer, primary_key=True),
+    Column("name",       String(100), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# (versão, nome, função) — aplicadas em ordem, cada uma na sua transação
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = []
+
+def migration(version: int, name: str):
+    def deco(fn):
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return deco
+
+def _create_indexes(conn: Connection, *names: str):
+    """Cria (se faltarem) os índices declarados em models.py com esses nomes."""
+    wanted = set(names)
+    for table in Base.metadata.sorted_tables:
+        for ix in table.indexes:
+            if ix.name in wanted:
+                ix.create(conn, checkfirst=True)
+                wanted.discard(ix.name)
+    if wanted:
+        raise ValueError(f"Índices não declarados em models.py: {sorted(wanted)}")
+
+def _sqlite_column_types(conn: Connection, table: str) -> Dict[str, str]:
+    return {r[1]: (r[2] or "").upper() for r in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+
+def _rebuild_sqlite_table(conn: Connection, table: Table, select_exprs: Dict[str, str]):
+    """Recria a tabela com o DDL atual do model (procedimento de 12 passos do SQLite).
+
+    `select_exprs` mapeia coluna -> expressão sobre a tabela antiga; colunas novas
+    ficam com o default. Roda dentro da transação da migração, com foreign_keys
+    desligado pelo runner.
+    """
+    tmp = f"{table.name}__rebuild"
+    ddl = str(CreateTable(table).compile(dialect=conn.dialect)).strip()
+    ddl = ddl.replace(f"CREATE TABLE {table.name} (", f"CREATE TABLE {tmp} (", 1)
+    cols = ", ".join(select_exprs)
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {tmp}")
+    conn.exec_driver_sql(ddl)
+    conn.exec_driver_sql(f"INSERT INTO {tmp} ({cols}) SELECT {', '.join(select_exprs.values())} FROM {table.name}")
+    conn.exec_driver_sql(f"DROP TABLE {table.name}")
+    conn.exec_driver_sql(f"ALTER TABLE {tmp} RENAME TO {table.name}")
+    for ix in table.indexes:
+        ix.create(conn, checkfirst=True)
+
+# -----------------------------
+# Migrações
+# -----------------------------
+@migration(1, "indices por usuario e data")
+def _m001_indexes(conn: Connection):
+    _create_indexes(
+        conn,
+        "ix_buckets_user_id", "ix_giants_user_id", "ix_giant_payments_giant_date",
+        "ix_movements_user_date", "ix_movements_bucket_id", "ix_bills_user_due",
+    )
+
+@migration(2, "rollup mensal de movements")
+def _m002_rollups(conn: Connection):
+    # Triggers específicas do SQLite; em outros bancos aggregates.py lê direto de movements
+    if conn.dialect.name != "sqlite":
+        return
+    install_triggers(conn)
+    rebuild_rollups(conn)
+
+@migration(3, "dinheiro em centavos inteiros")
+def _m003_cents(conn: Connection):
+    # Bancos fora do SQLite: converter as colunas manualmente (ALTER COLUMN ... TYPE)
+    if conn.dialect.name != "sqlite":
+        return
+    drop_triggers(conn)
+    for table in Base.metadata.sorted_tables:
+        money = {c.name for c in table.columns if isinstance(c.type, Cents)}
+        if not money:
+            continue
+        tipos = _sqlite_column_types(conn, table.name)
+        # Só converte colunas ainda declaradas como REAL/FLOAT (bancos novos já nascem INTEGER)
+        converter = {c for c in money if tipos.get(c) in ("FLOAT", "REAL", "DOUBLE")}
+        if not converter:
+            continue
+        _rebuild_sqlite_table(conn, table, {
+            c.name: f"CAST(ROUND({c.name} * 100) AS INTEGER)" if c.name in converter else c.name
+            for c in table.columns if c.name in tipos
+        })
+    install_triggers(conn)
+    rebuild_rollups(conn)  # derivado de movements: recalcula já em centavos
+
+@migration(4, "hash de importacao em movements")
+def _m004_import_hash(conn: Connection):
+    if conn.dialect.name == "sqlite" and "import_hash" not in _sqlite_column_types(conn, "movements"):
+        conn.exec_driver_sql("ALTER TABLE movements ADD COLUMN import_hash VARCHAR(40)")
+    _create_indexes(conn, "ux_movements_user_import_hash")
+
+@migration(5, "busca textual fts5")
+def _m005_search(conn: Connection):
+    # Sem FTS5 (ou fora do SQLite) search.py usa LIKE
+    if fts5_available(conn):
+        install_search(conn)
+
+@migration(6, "contas recorrentes")
+def _m006_bill_rules(conn: Connection):
+    for name in ("bill_rules", "bill_occurrences"):
+        Base.metadata.tables[name].create(conn, checkfirst=True)
+    _create_indexes(conn, "ix_bill_rules_user_id", "ix_bill_occurrences_user_date")
+
+@migration(7, "historico de saldo dos baldes")
+def _m007_bucket_history(conn: Connection):
+    for name in ("bucket_deltas", "bucket_checkpoints"):
+        Base.metadata.tables[name].create(conn, checkfirst=True)
+    _create_indexes(conn, "ix_bucket_deltas_bucket_date", "ix_bucket_deltas_user_date", "ix_bucket_checkpoints_user_date")
+    # Só as movimentações com balde explicam o saldo; o resto entra como ajuste de hoje
+    backfill_balances(conn)
+
+@migration(8, "conciliacao de saldos")
+def _m008_reconcile_runs(conn: Connection):
+    Base.metadata.tables["reconcile_runs"].create(conn, checkfirst=True)
+
+@migration(9, "remove lancamento pai do rateio")
+def _m009_drop_split_parents(conn: Connection):
+    # Entradas e Saídas gravavam, além das linhas por balde do rateio, uma linha
+    # sem balde com o valor cheio ("Entrada (rateada)" / "Saída (<balde>)"), e os
+    # totais contavam o valor duas vezes. Só sai a linha pai que tem o rateio
+    # correspondente no mesmo dia: para Entradas, as "Entrada diária" do dia somam
+    # as linhas pai do dia (até 1 centavo de arredondamento por linha); para Saídas,
+    # a "Saída do balde <balde>" com o mesmo valor.
+    conn.exec_driver_sql("""
+        DELETE FROM movements
+        WHERE bucket_id IS NULL AND import_hash IS NULL
+          AND ((kind = 'Receita' AND description = 'Entrada (rateada)'
+                AND EXISTS (SELECT COUNT(*) FROM movements m
+                            WHERE m.user_id = movements.user_id AND m.date = movements.date
+                              AND m.kind = 'Receita' AND m.bucket_id IS NOT NULL
+                              AND m.description LIKE 'Entrada diária%'
+                            HAVING abs(SUM(m.amount) - (SELECT SUM(p.amount) FROM movements p
+                                                        WHERE p.user_id = movements.user_id
+                                                          AND p.date = movements.date AND p.kind = 'Receita'
+                                                          AND p.bucket_id IS NULL
+                                                          AND p.description = 'Entrada (rateada)'))
+                                   <= COUNT(*)))
+            OR (kind = 'Despesa' AND description LIKE 'Saída (%)'
+                AND EXISTS (SELECT 1 FROM movements m
+                            WHERE m.user_id = movements.user_id AND m.date = movements.date
+                              AND m.kind = 'Despesa' AND m.bucket_id IS NOT NULL
+                              AND m.amount = movements.amount
+                              AND m.description = 'Saída do balde '
+                                  || substr(movements.description, 8, length(movements.description) - 8))))
+    """)
+    rebuild_rollups(conn)
+
+@migration(10, "ajuste de saldo so no log de variacoes")
+def _m010_drop_adjustment_movements(conn: Connection):
+    # A carga inicial (migração 7) gravava a diferença saldo - movimentações como
+    # "ajuste", e a conciliação passou a aceitar todo "ajuste" como legítimo. Ajuste
+    # de verdade (set_balance) tinha a movimentação "Ajuste manual de saldo" no mesmo
+    # dia; os demais são a diferença da carga e viram "historico_gap"
+    conn.exec_driver_sql("""
+        UPDATE bucket_deltas SET source = 'historico_gap'
+        WHERE source = 'ajuste'
+          AND NOT EXISTS (SELECT 1 FROM movements m
+                          WHERE m.bucket_id = bucket_deltas.bucket_id AND m.date = bucket_deltas.date
+                            AND m.description = 'Ajuste manual de saldo' AND m.import_hash IS NULL)
+    """)
+    # set_balance gravava o ajuste também como Receita/Despesa do balde; agora ele
+    # fica só em bucket_deltas (source "ajuste"), que a conciliação já soma
+    conn.exec_driver_sql("""
+        DELETE FROM movements
+        WHERE description = 'Ajuste manual de saldo' AND bucket_id IS NOT NULL AND import_hash IS NULL
+          AND EXISTS (SELECT 1 FROM bucket_deltas d
+                      WHERE d.bucket_id = movements.bucket_id AND d.date = movements.date
+                        AND d.source = 'ajuste')
+    """)
+    rebuild_rollups(conn)
+
+# -----------------------------
+# Execução
+# -----------------------------
+def _apply(engine: Engine, version: int, name: str, fn: Callable[[Connection], None]):
+    with engine.connect() as conn:
+        sqlite = conn.dialect.name == "sqlite"
+        if sqlite:
+            # foreign_keys só muda fora de transação; o pysqlite não abre transação
+            # antes de DDL, então o BEGIN explícito deixa a migração toda atômica.
+            fk = conn.exec_driver_sql("PRAGMA foreign_keys").scalar()
+            conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            conn.exec_driver_sql("BEGIN")
+        try:
+            fn(conn)
+            conn.execute(insert(schema_migrations).values(version=version, name=name, applied_at=datetime.utcnow()))
+            if sqlite:
+                broken = conn.exec_driver_sql("PRAGMA foreign_key_check").fetchall()
+                if broken:
+                    raise RuntimeError(f"Migração {version} quebrou chaves estrangeiras: {broken[:5]}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            if sqlite:
+                conn.exec_driver_sql(f"PRAGMA foreign_keys={'ON' if fk else 'OFF'}")
+                conn.commit()
+
+def run_migrations(engine: Engine) -> List[str]:
+    """Aplica as migrações pendentes; retorna os nomes aplicadas nesta chamada."""
+    _meta.create_all(engine)
+    with engine.connect() as conn:
+        done = set(conn.execute(select(schema_migrations.c.version)).scalars())
+    applied = []
+    for version, name, fn in MIGRATIONS:
+        if version in done:
+            continue
+        _apply(engine, version, name, fn)
+        applied.append(name)
+    return applied
+
+# -----------------------------
+# EXPLAIN QUERY PLAN dos loaders
+# -----------------------------
+def loader_statements(uid: int = 1) -> Dict[str, object]:
+    return {
+        "load_profile":   profile_stmt(uid),
+        "load_buckets":   buckets_stmt(uid),
+        "load_giants":    giants_stmt(uid),
+        "load_bills":     bills_stmt(uid),
+        "load_movements": movements_stmt(uid, 500),
+        "load_giant_totals": giant_totals_stmt(uid),
+        "load_ledger_page": ledger_stmt(uid, after=(date(2000, 1, 1), 1)),
+        "load_bill_rules": bill_rules_stmt(uid),
+        "load_bill_occurrences": bill_occurrences_stmt(uid, date(2000, 1, 1), date(2000, 1, 31)),
+        "load_balances_at": balances_at_stmt(date(2000, 1, 15)).where(Bucket.user_id == uid),
+        "load_balance_deltas": deltas_stmt(uid, date(2000, 1, 1), date(2000, 3, 31)),
+    }
+
+def explain_plans(engine: Engine, statements: Dict[str, object]) -> Dict[str, List[str]]:
+    """Detalhes do EXPLAIN QUERY PLAN (SQLite) de cada consulta."""
+    plans = {}
+    with engine.connect() as conn:
+        for name, stmt in statements.items():
+            sql = str(stmt.compile(engine, compile_kwargs={"literal_binds": True}))
+            plans[name] = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+    return plans
+
+def check_plans() -> Dict[str, List[str]]:
+    """Planos dos loaders num schema SQLite vazio em memória (sem estatísticas, só índices)."""
+    engine = create_engine("sqlite://", future=True)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    plans = explain_plans(engine, loader_statements())
+    engine.dispose()
+    return plans
+
+def full_scans(plans: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Consultas que varrem a tabela inteira ou ordenam numa B-tree temporária."""
+    bad = {}
+    for name, details in plans.items():
+        hits = [d for d in details if d.startswith("SCAN ") or "TEMP B-TREE" in d]
+        if hits:
+            bad[name] = hits
+    return bad
+
+if __name__ == "__main__":
+    engine = create_engine(os.getenv("DATABASE_URL", "sqlite:///sql_app.db"), future=True)
+    Base.metadata.create_all(engine)
+    for name in run_migrations(engine):
+        print(f"aplicada: {name}")
+    if "--plans" in sys.argv:
+        plans = check_plans()
+        for name, details in plans.items():
+            print(f"{name}: {' | '.join(details)}")
+        bad = full_scans(plans)
+        if bad:
+            print(f"FULL SCAN: {bad}")
+            sys.exit(1)
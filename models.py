@@ -1,8 +1,22 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, Date, Text
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, Float, Date, DateTime, Text, UniqueConstraint
 from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.types import TypeDecorator
+
+from money import to_cents, from_cents
 
 Base = declarative_base()
 
+class Cents(TypeDecorator):
+    """Dinheiro gravado como INTEGER em centavos; no Python continua em reais (float)."""
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_cents(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else from_cents(value)
+
 class User(Base):
     __tablename__ = "users"
     id            = Column(Integer, primary_key=True, index=True)
@@ -14,14 +28,15 @@ class User(Base):
     giants         = relationship("Giant",       back_populates="user", cascade="all, delete-orphan")
     movements      = relationship("Movement",    back_populates="user", cascade="all, delete-orphan")
     bills          = relationship("Bill",        back_populates="user", cascade="all, delete-orphan")
+    bill_rules     = relationship("BillRule",    back_populates="user", cascade="all, delete-orphan")
     giant_payments = relationship("GiantPayment",back_populates="user", cascade="all, delete-orphan")
 
 class UserProfile(Base):
     __tablename__ = "user_profiles"
     id               = Column(Integer, primary_key=True, index=True)
     user_id          = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, unique=True)
-    monthly_income   = Column(Float, default=0.0)
-    monthly_expense  = Column(Float, default=0.0)
+    monthly_income   = Column(Cents, default=0.0)
+    monthly_expense  = Column(Cents, default=0.0)
     last_allocation_date = Column(Date, nullable=True)
 
     user             = relationship("User", back_populates="profile")
@@ -33,22 +48,24 @@ class Bucket(Base):
     name        = Column(String(50),  nullable=False)
     description = Column(String(200), default="")
     percent     = Column(Float,       nullable=False)
-    balance     = Column(Float,       default=0.0)
+    balance     = Column(Cents,       default=0.0)
     type        = Column(String(20),  default="generic")
 
     user     = relationship("User", back_populates="buckets")
     movements = relationship("Movement", back_populates="bucket")
 
+    __table_args__ = (Index("ix_buckets_user_id", "user_id"),)
+
 class Giant(Base):
     __tablename__ = "giants"
     id               = Column(Integer, primary_key=True, index=True)
     user_id          = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     name             = Column(String(50),  nullable=False)
-    total_to_pay     = Column(Float,       nullable=False)
+    total_to_pay     = Column(Cents,       nullable=False)
     parcels          = Column(Integer,     default=0)
     priority         = Column(Integer,     default=1)
     status           = Column(String(20),  default="active")
-    weekly_goal      = Column(Float,       default=0.0)
+    weekly_goal      = Column(Cents,       default=0.0)
     interest_rate    = Column(Float,       default=0.0)
     payoff_efficiency= Column(Float,       default=0.0)
     progress         = Column(Float,       default=0.0)
@@ -56,39 +73,136 @@ class Giant(Base):
     user     = relationship("User", back_populates="giants")
     payments = relationship("GiantPayment", back_populates="giant", cascade="all, delete-orphan")
 
+    __table_args__ = (Index("ix_giants_user_id", "user_id"),)
+
 class GiantPayment(Base):
     __tablename__ = "giant_payments"
     id       = Column(Integer, primary_key=True, index=True)
     user_id  = Column(Integer, ForeignKey("users.id",   ondelete="CASCADE"), nullable=False)
     giant_id = Column(Integer, ForeignKey("giants.id",  ondelete="CASCADE"), nullable=False)
-    amount   = Column(Float,  nullable=False)
+    amount   = Column(Cents,  nullable=False)
     date     = Column(Date,   nullable=False)
     note     = Column(Text,   default="")
 
     user  = relationship("User",  back_populates="giant_payments")
     giant = relationship("Giant", back_populates="payments")
 
+    __table_args__ = (Index("ix_giant_payments_giant_date", "giant_id", "date"),)
+
 class Movement(Base):
     __tablename__ = "movements"
     id        = Column(Integer, primary_key=True, index=True)
     user_id   = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     bucket_id = Column(Integer, ForeignKey("buckets.id", ondelete="SET NULL"))
     kind      = Column(String(20),  nullable=False)  # Receita / Despesa
-    amount    = Column(Float,       nullable=False)
+    amount    = Column(Cents,       nullable=False)
     description = Column(String(200), default="")
     date      = Column(Date,         nullable=False)
+    import_hash = Column(String(40), nullable=True)  # hash de conteúdo de extratos importados (dedup)
 
     user   = relationship("User",   back_populates="movements")
     bucket = relationship("Bucket", back_populates="movements")
 
+    __table_args__ = (
+        Index("ix_movements_user_date", "user_id", "date"),
+        Index("ix_movements_bucket_id", "bucket_id"),
+        Index("ux_movements_user_import_hash", "user_id", "import_hash", unique=True),
+    )
+
 class Bill(Base):
     __tablename__ = "bills"
     id         = Column(Integer, primary_key=True, index=True)
     user_id    = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     title      = Column(String(100), nullable=False)
-    amount     = Column(Float,       nullable=False)
+    amount     = Column(Cents,       nullable=False)
     due_date   = Column(Date,        nullable=False)
     is_critical= Column(Boolean,     default=False)
     paid       = Column(Boolean,     default=False)
 
     user = relationship("User", back_populates="bills")
+
+    __table_args__ = (Index("ix_bills_user_due", "user_id", "due_date"),)
+
+class BillRule(Base):
+    """Conta recorrente: a regra fica gravada uma vez; as ocorrências são geradas sob demanda (recurrence.py)."""
+    __tablename__ = "bill_rules"
+    id          = Column(Integer, primary_key=True, index=True)
+    user_id     = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    title       = Column(String(100), nullable=False)
+    amount      = Column(Cents,       nullable=False)
+    is_critical = Column(Boolean,     default=False)
+    freq        = Column(String(20),  nullable=False)   # monthly / weekly / days / last_business_day
+    interval    = Column(Integer,     nullable=False, default=1)  # a cada N meses/semanas/dias
+    start_date  = Column(Date,        nullable=False)
+    end_date    = Column(Date,        nullable=True)
+    day         = Column(Integer,     nullable=True)    # dia do mês (monthly); None = dia de start_date
+
+    user        = relationship("User", back_populates="bill_rules")
+    occurrences = relationship("BillOccurrence", back_populates="rule", cascade="all, delete-orphan")
+
+    __table_args__ = (Index("ix_bill_rules_user_id", "user_id"),)
+
+class BillOccurrence(Base):
+    """Exceção de uma ocorrência (paga ou pulada); ocorrências em aberto não têm linha."""
+    __tablename__ = "bill_occurrences"
+    id      = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    rule_id = Column(Integer, ForeignKey("bill_rules.id", ondelete="CASCADE"), nullable=False)
+    date    = Column(Date,       nullable=False)
+    status  = Column(String(10), nullable=False)        # paid / skipped
+
+    rule = relationship("BillRule", back_populates="occurrences")
+
+    __table_args__ = (
+        UniqueConstraint("rule_id", "date", name="ux_bill_occurrences_rule_date"),
+        Index("ix_bill_occurrences_user_date", "user_id", "date"),
+    )
+
+class MovementRollup(Base):
+    """Totais mensais de movements por (usuário, balde, mês, tipo); mantidos por triggers (rollups.py)."""
+    __tablename__ = "movement_rollups"
+    user_id    = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    bucket_id  = Column(Integer,     primary_key=True, default=0)  # 0 = sem balde
+    year_month = Column(String(7),   primary_key=True)             # 'AAAA-MM'
+    kind       = Column(String(20),  primary_key=True)
+    total      = Column(Cents,       nullable=False, default=0.0)
+    count      = Column(Integer,     nullable=False, default=0)
+
+class BucketDelta(Base):
+    """Log de variações de saldo dos baldes, por dia de efeito (balances.py)."""
+    __tablename__ = "bucket_deltas"
+    id        = Column(Integer, primary_key=True, index=True)
+    user_id   = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    bucket_id = Column(Integer, ForeignKey("buckets.id", ondelete="CASCADE"), nullable=False)
+    date      = Column(Date,       nullable=False)
+    delta     = Column(Cents,      nullable=False)
+    source    = Column(String(20), nullable=False, default="rateio")   # rateio / ajuste / historico / historico_gap / conciliacao
+
+    __table_args__ = (
+        Index("ix_bucket_deltas_bucket_date", "bucket_id", "date"),
+        Index("ix_bucket_deltas_user_date", "user_id", "date"),
+    )
+
+class BucketCheckpoint(Base):
+    """Saldo do balde no último dia de cada mês que teve variação (soma dos deltas até `date`)."""
+    __tablename__ = "bucket_checkpoints"
+    bucket_id = Column(Integer, ForeignKey("buckets.id", ondelete="CASCADE"), primary_key=True)
+    date      = Column(Date,  primary_key=True)
+    user_id   = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    balance   = Column(Cents, nullable=False, default=0.0)
+
+    __table_args__ = (Index("ix_bucket_checkpoints_user_date", "user_id", "date"),)
+
+class ReconcileRun(Base):
+    """Execuções da conciliação de saldos (reconcile.py); as marcas d'água tornam a próxima incremental."""
+    __tablename__ = "reconcile_runs"
+    id               = Column(Integer, primary_key=True, index=True)
+    started_at       = Column(DateTime, nullable=False)
+    seconds          = Column(Float,    nullable=False, default=0.0)
+    full             = Column(Boolean,  nullable=False, default=False)
+    users            = Column(Integer,  nullable=False, default=0)
+    buckets          = Column(Integer,  nullable=False, default=0)
+    drifted          = Column(Integer,  nullable=False, default=0)
+    repaired         = Column(Integer,  nullable=False, default=0)
+    last_movement_id = Column(Integer,  nullable=False, default=0)   # maior movements.id visto
+    last_delta_id    = Column(Integer,  nullable=False, default=0)   # maior bucket_deltas.id visto
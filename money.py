@@ -0,0 +1,35 @@
+import math
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Iterable, List
+
+def to_cents(valor) -> int:
+    """Reais (float/str/Decimal) -> centavos inteiros, arredondando meio centavo para cima."""
+    if isinstance(valor, float):
+        c = valor * 100
+        frac = c - math.floor(c)
+        # Longe do meio centavo o arredondamento direto é exato; perto dele, Decimal decide
+        if abs(frac - 0.5) > 1e-6:
+            return int(math.floor(c + 0.5))
+    return int((Decimal(str(valor)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def from_cents(cents: int) -> float:
+    return cents / 100
+
+def allocate_cents(total: int, weights: Iterable[float]) -> List[int]:
+    """Rateio pelo maior resto: partes inteiras proporcionais aos pesos que somam exatamente `total`.
+
+    Pesos negativos contam como zero; os centavos que sobram vão para as maiores
+    frações (empate: ordem original).
+    """
+    w = [max(float(x), 0.0) for x in weights]
+    soma = sum(w)
+    if soma <= 0:
+        raise ValueError("A soma dos pesos deve ser maior que zero.")
+    sinal, total = (-1, -total) if total < 0 else (1, total)
+    exatas = [total * x / soma for x in w]
+    partes = [int(e) for e in exatas]
+    sobra = total - sum(partes)
+    ordem = sorted(range(len(w)), key=lambda i: partes[i] - exatas[i])
+    for i in ordem[:sobra]:
+        partes[i] += 1
+    return [sinal * p for p in partes]
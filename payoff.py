@@ -0,0 +1,183 @@
+"""Simulação de quitação dos gigantes mês a mês, com juros compostos (NumPy).
+
+Todas as estratégias e todos os gigantes andam juntos: o estado é uma matriz
+(estratégias x gigantes) e cada mês é um punhado de operações vetorizadas. O
+laço fica só no tempo (o saldo de um mês depende do anterior) e termina assim
+que tudo é quitado.
+
+Regras de cada mês, em cada estratégia:
+1. o saldo rende juros (`interest_rate` é % ao mês);
+2. cada gigante recebe o pagamento mínimo: a parcela, se `parcels` > 0, senão a
+   meta semanal convertida para o mês;
+3. o resto do orçamento (extra + mínimos de gigantes já quitados) desce em
+   cascata pelos gigantes, na ordem da estratégia.
+"minimo" é a referência: só os pagamentos mínimos, sem cascata.
+"""
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from models import Giant
+
+STRATEGIES = ("avalanche", "snowball", "custom", "minimo")
+STRATEGY_LABELS = {
+    "avalanche": "Avalanche (maior juro primeiro)",
+    "snowball":  "Bola de neve (menor saldo primeiro)",
+    "custom":    "Prioridade do gigante",
+    "minimo":    "Só pagamentos mínimos",
+}
+HORIZON_MONTHS = 360
+WEEKS_PER_MONTH = 52 / 12
+_EPS = 0.005   # meio centavo: abaixo disso o gigante está quitado
+
+class PayoffInput(NamedTuple):
+    id: int
+    name: str
+    balance: float       # restante hoje
+    rate: float          # juros ao mês, fração (1% -> 0.01)
+    minimum: float       # pagamento mínimo mensal
+    priority: int
+
+class PayoffResult(NamedTuple):
+    strategies: Tuple[str, ...]
+    giant_ids: Tuple[int, ...]
+    budget: float          # desembolso mensal: mínimos + extra
+    months: np.ndarray     # (S, G) mês da quitação (1 = este mês); -1 = não quita no horizonte
+    interest: np.ndarray   # (S, G) juros pagos no horizonte (pago - principal abatido)
+    paid: np.ndarray       # (S, G) total pago
+    remaining: np.ndarray  # (S, T+1) saldo total no início de cada mês (T = horizonte)
+
+    def freedom_month(self, s: int) -> int:
+        """Mês em que o último gigante é quitado na estratégia `s` (-1 se algum não quita)."""
+        m = self.months[s]
+        return -1 if (m < 0).any() else int(m.max(initial=0))
+
+def monthly_minimum(balance: float, rate: float, parcels: int, weekly_goal: float) -> float:
+    """Parcela fixa (Price) se houver parcelas; senão a meta semanal em base mensal."""
+    if parcels and parcels > 0 and balance > 0:
+        if rate > 0:
+            return balance * rate / (1 - (1 + rate) ** -parcels)
+        return balance / parcels
+    return max(weekly_goal or 0.0, 0.0) * WEEKS_PER_MONTH
+
+def payoff_inputs(giants: Sequence, totals: Sequence) -> Tuple[PayoffInput, ...]:
+    """GiantRow + GiantTotalsRow (snapshots.py) -> entradas da simulação; ignora quitados e inativos."""
+    restante = {t.giant_id: t.remaining for t in totals}
+    out = []
+    for g in giants:
+        saldo = restante.get(g.id, g.total_to_pay or 0.0)
+        if saldo <= 0 or (g.status or "active") != "active":
+            continue
+        rate = max(g.interest_rate or 0.0, 0.0) / 100
+        out.append(PayoffInput(g.id, g.name, saldo, rate,
+                               monthly_minimum(saldo, rate, g.parcels or 0, g.weekly_goal or 0.0),
+                               g.priority if g.priority is not None else 1))
+    return tuple(out)
+
+def _orders(giants: Sequence[PayoffInput], strategies: Sequence[str]) -> np.ndarray:
+    """(S, G) índices dos gigantes na ordem de ataque de cada estratégia (desempate por id)."""
+    ids = np.array([g.id for g in giants])
+    bal = np.array([g.balance for g in giants])
+    rate = np.array([g.rate for g in giants])
+    prio = np.array([g.priority for g in giants])
+    keys = {
+        "avalanche": (ids, bal, -rate),
+        "snowball":  (ids, -rate, bal),
+        "custom":    (ids, prio),
+        "minimo":    (ids,),
+    }
+    try:
+        return np.stack([np.lexsort(keys[s]) for s in strategies])
+    except KeyError as e:
+        raise ValueError(f"Estratégia desconhecida: {e.args[0]}") from None
+
+def simulate(giants: Sequence[PayoffInput], extra: float = 0.0, horizon: int = HORIZON_MONTHS,
+             strategies: Sequence[str] = STRATEGIES) -> PayoffResult:
+    """Projeta todos os gigantes em todas as estratégias por até `horizon` meses."""
+    strategies = tuple(strategies)
+    S, G = len(strategies), len(giants)
+    months = np.full((S, G), -1, dtype=np.int64)
+    paid = np.zeros((S, G))
+    remaining = np.zeros((S, horizon + 1))
+    if G == 0:
+        return _frozen(PayoffResult(strategies, (), 0.0, months, paid.copy(), paid, remaining))
+
+    # Estado no layout de cada estratégia (coluna 0 = primeiro da fila): a cascata
+    # vira um cumsum direto, sem reordenar a cada mês
+    order = _orders(giants, strategies)
+    rate = np.array([g.rate for g in giants])[order]
+    minimum = np.array([g.minimum for g in giants])[order]
+    B0 = np.array([g.balance for g in giants], dtype=np.float64)[order]
+    B = B0.copy()
+    budget = float(minimum[0].sum() + max(extra, 0.0))
+    cascade = np.array([s != "minimo" for s in strategies], dtype=np.float64)
+
+    hist = np.zeros((horizon, S, G))
+    remaining[:, 0] = B.sum(axis=1)
+    for t in range(horizon):
+        B += B * rate
+        p = np.minimum(B, minimum)
+        B -= p
+        paid += p
+        # Cascata: o que sobra do orçamento quita os gigantes na ordem da fila
+        pool = cascade * (budget - p.sum(axis=1))
+        c = np.clip(pool[:, None] - (np.cumsum(B, axis=1) - B), 0.0, B)
+        B -= c
+        paid += c
+        B[B <= _EPS] = 0.0
+        hist[t] = B
+        if not B.any():
+            break
+    # Quitado fica quitado: o mês é o primeiro com saldo zero
+    zerado = hist == 0.0
+    months = np.where(zerado.any(axis=0), zerado.argmax(axis=0) + 1, -1)
+    remaining[:, 1:] = hist.sum(axis=2).T
+    # Juros acumulados podem explodir quando o mínimo não cobre os juros; pagos, não
+    interest = paid - np.maximum(B0 - B, 0.0)
+    return _frozen(PayoffResult(strategies, tuple(g.id for g in giants), budget,
+                                _unsort(months, order), _unsort(interest, order),
+                                _unsort(paid, order), remaining))
+
+def _unsort(sorted_vals: np.ndarray, order: np.ndarray) -> np.ndarray:
+    out = np.empty_like(sorted_vals)
+    np.put_along_axis(out, order, sorted_vals, axis=1)
+    return out
+
+def _frozen(r: PayoffResult) -> PayoffResult:
+    """Arrays só leitura: o resultado vai para o cache compartilhado (user_cache.py)."""
+    for a in (r.months, r.interest, r.paid, r.remaining):
+        a.flags.writeable = False
+    return r
+
+# -----------------------------
+# Gravação no plano
+# -----------------------------
+def plan_updates(giants: Sequence, totals: Sequence, result: PayoffResult, strategy: str) -> List[Dict]:
+    """progress = % do total já pago; payoff_efficiency = % do que será pago que abate principal."""
+    s = result.strategies.index(strategy)
+    col = {gid: i for i, gid in enumerate(result.giant_ids)}
+    pagos = {t.giant_id: t.paid for t in totals}
+    out = []
+    for g in giants:
+        total = g.total_to_pay or 0.0
+        progress = min(pagos.get(g.id, 0.0) / total, 1.0) * 100 if total > 0 else 0.0
+        i = col.get(g.id)
+        if i is None:   # quitado ou inativo: nada a simular
+            eff = 100.0 if progress >= 100 else 0.0
+        else:
+            pago = float(result.paid[s, i])
+            eff = (pago - float(result.interest[s, i])) / pago * 100 if pago > 0 else 0.0
+        out.append({"id": g.id, "progress": round(progress, 2), "payoff_efficiency": round(eff, 2)})
+    return out
+
+def save_plan(db: Session, user_id: int, updates: List[Dict]) -> int:
+    """Um executemany de UPDATE por id, restrito ao usuário. Não faz commit (operação da fila de escrita)."""
+    if not updates:
+        return 0
+    t = Giant.__table__
+    stmt = (update(t).where(t.c.id == bindparam("gid"), t.c.user_id == user_id)
+            .values(progress=bindparam("progress"), payoff_efficiency=bindparam("eff")))
+    return db.execute(stmt, [{"gid": u["id"], "progress": u["progress"], "eff": u["payoff_efficiency"]}
+                             for u in updates]).rowcount
@@ -0,0 +1,60 @@
+"""Pool de leitura separado para os loaders (leitores WAL do SQLite).
+
+As conexões abrem o arquivo em modo somente leitura (`mode=ro`, com `query_only`
+como segunda trava) e recebem pragmas de leitura no evento `connect`: cache de
+páginas próprio, mmap e tabelas temporárias em memória. Em WAL, leitores não
+bloqueiam o escritor (writer.py) nem uns aos outros.
+"""
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+
+# Por conexão: cache_size negativo é em KiB
+READ_PRAGMAS = (
+    "PRAGMA query_only=ON",
+    "PRAGMA cache_size=-8000",       # ~8 MB de páginas por conexão (até 30 conexões no pool)
+    "PRAGMA mmap_size=268435456",    # 256 MB mapeados: leitura sem cópia para o cache
+    "PRAGMA temp_store=MEMORY",      # ORDER BY/GROUP BY temporários fora do disco
+    "PRAGMA busy_timeout=2000",
+)
+
+def _readonly_url(db_url: str):
+    """sqlite:///arquivo.db -> URI `file:arquivo.db?mode=ro`; None se for banco em memória."""
+    url = make_url(db_url)
+    if not url.drivername.startswith("sqlite"):
+        return None
+    db = url.database or ""
+    if db in ("", ":memory:") or db.startswith("file:"):
+        return None
+    return url.set(database=f"file:{db}", query={**url.query, "mode": "ro", "uri": "true"})
+
+def make_read_engine(db_url: str, pool_size: int = 10, max_overflow: int = 20) -> Optional[Engine]:
+    """Engine só de leitura para SQLite em arquivo; None nos outros casos (usar o engine principal).
+
+    Sem pre-ping: a "conexão" é um arquivo local, o ping só somaria uma ida ao
+    banco a cada checkout.
+    """
+    ro = _readonly_url(db_url)
+    if ro is None:
+        return None
+    engine = create_engine(
+        ro,
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=30,
+        pool_pre_ping=False,
+        connect_args={"check_same_thread": False},
+        future=True,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_conn, _):
+        cur = dbapi_conn.cursor()
+        for pragma in READ_PRAGMAS:
+            cur.execute(pragma)
+        cur.close()
+
+    return engine
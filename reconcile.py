@@ -0,0 +1,160 @@
+"""Conciliação de saldos: `Bucket.balance` recalculado a partir das movimentações de cada balde.
+
+Uso: python reconcile.py             usuários com movimentações (ou variações de saldo) desde a última execução limpa
+     python reconcile.py --full      todos os usuários
+     python reconcile.py --repair    corrige as divergências encontradas
+
+Feito para rodar toda noite (cron). Os usuários vão em lotes de `CHUNK`: um
+GROUP BY por lote dá o saldo esperado de cada balde (receitas - despesas com
+aquele balde, mais os ajustes manuais do log de variações), e a correção é um
+UPDATE ... CASE por lote. A correção é aplicada como variação (saldo +
+diferença), então uma escrita do app no meio do caminho não é desfeita, e entra
+no histórico de saldos (balances.py).
+
+Cada execução grava em reconcile_runs os maiores ids de movements e
+bucket_deltas que viu; a próxima execução incremental só olha os usuários com
+linhas novas depois da última execução sem divergência pendente.
+"""
+import os
+import sys
+import time
+from datetime import date, datetime
+from itertools import groupby
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, case, create_engine, func, insert, select, type_coerce, union, update
+from sqlalchemy.engine import Engine
+
+from balances import record_deltas, signed_amount
+from models import Base, Bucket, BucketDelta, Cents, Movement, ReconcileRun
+from money import to_cents
+
+CHUNK = 500
+
+class BucketDrift(NamedTuple):
+    user_id: int
+    bucket_id: int
+    name: str
+    balance: float       # buckets.balance
+    expected: float      # soma das movimentações do balde + ajustes manuais
+
+    @property
+    def diff(self) -> float:
+        return round(self.expected - self.balance, 2)
+
+class ReconcileReport(NamedTuple):
+    full: bool
+    users: int
+    buckets: int
+    drift: Tuple[BucketDrift, ...]
+    repaired: int
+    seconds: float
+    last_movement_id: int
+    last_delta_id: int
+
+def expected_stmt(user_ids: Sequence[int]):
+    """Saldo gravado e saldo esperado de cada balde dos usuários (baldes sem movimentação esperam 0)."""
+    # Saldo editado à mão (balances.set_balance) só existe no log, com source "ajuste";
+    # a diferença da carga inicial ("historico_gap") não conta: é divergência
+    ajustes = (select(func.coalesce(func.sum(BucketDelta.delta), 0))
+               .where(BucketDelta.bucket_id == Bucket.id, BucketDelta.source == "ajuste").scalar_subquery())
+    esperado = type_coerce(func.coalesce(func.sum(signed_amount()), 0) + ajustes, Cents)
+    return (select(Bucket.user_id, Bucket.id, Bucket.name, Bucket.balance, esperado)
+            .outerjoin(Movement, and_(Movement.bucket_id == Bucket.id, Movement.user_id == Bucket.user_id))
+            .where(Bucket.user_id.in_(list(user_ids)))
+            .group_by(Bucket.user_id, Bucket.id, Bucket.name, Bucket.balance)
+            .order_by(Bucket.user_id, Bucket.id))
+
+def _drift(rows, tol: float = 0.005) -> List[BucketDrift]:
+    return [BucketDrift(uid, bid, nome, saldo or 0.0, esperado)
+            for uid, bid, nome, saldo, esperado in rows if abs((saldo or 0.0) - esperado) > tol]
+
+def check(db, user_ids: Sequence[int]) -> List[BucketDrift]:
+    """Baldes cujo saldo não bate com as movimentações e ajustes."""
+    return _drift(db.execute(expected_stmt(user_ids)).tuples())
+
+def repair(db, drift: Sequence[BucketDrift], quando: Optional[date] = None) -> int:
+    """Corrige os saldos num único UPDATE ... CASE; retorna os baldes corrigidos. Não faz commit."""
+    quando = quando or date.today()
+    ajustes = {d.bucket_id: to_cents(d.expected) - to_cents(d.balance) for d in drift}
+    ajustes = {b: c for b, c in ajustes.items() if c}
+    if not ajustes:
+        return 0
+    # Centavos crus no CASE, como no rateio (allocation.py)
+    db.execute(
+        update(Bucket)
+        .where(Bucket.id.in_(list(ajustes)))
+        .values(balance=func.coalesce(Bucket.balance, 0) + case(ajustes, value=Bucket.id, else_=0))
+        .execution_options(synchronize_session=False)
+    )
+    # O histórico recebe a diferença para o saldo novo, não a correção: a divergência
+    # pode ter vindo de uma escrita que nunca passou pelo log
+    no_log = select(func.coalesce(func.sum(BucketDelta.delta), 0)).where(BucketDelta.bucket_id == Bucket.id).scalar_subquery()
+    falta = db.execute(
+        select(Bucket.user_id, Bucket.id, type_coerce(func.coalesce(Bucket.balance, 0) - no_log, Cents))
+        .where(Bucket.id.in_(list(ajustes))).order_by(Bucket.user_id)
+    ).tuples().all()
+    for uid, grupo in groupby(falta, key=lambda r: r[0]):
+        record_deltas(db, uid, [(bid, quando, to_cents(v)) for _, bid, v in grupo], "conciliacao")
+    return len(ajustes)
+
+def changed_users(conn, after_movement: int, after_delta: int) -> List[int]:
+    """Usuários com movimentações ou variações de saldo depois das marcas d'água."""
+    stmt = union(select(Movement.user_id).where(Movement.id > after_movement),
+                 select(BucketDelta.user_id).where(BucketDelta.id > after_delta))
+    return sorted(conn.execute(stmt).scalars())
+
+def _last_clean_run(conn) -> Optional[Tuple[int, int]]:
+    """Marcas d'água da última execução sem divergência pendente."""
+    return conn.execute(
+        select(ReconcileRun.last_movement_id, ReconcileRun.last_delta_id)
+        .where(ReconcileRun.drifted == ReconcileRun.repaired)
+        .order_by(ReconcileRun.id.desc()).limit(1)
+    ).first()
+
+def run(engine: Engine, full: bool = False, fix: bool = False, chunk: int = CHUNK) -> ReconcileReport:
+    """Confere (e com `fix`, corrige) os saldos; cada lote de usuários na sua transação."""
+    t0 = time.perf_counter()
+    inicio = datetime.utcnow()
+    with engine.connect() as conn:
+        # Marcas lidas antes de conferir: o que entrar durante a execução fica para a próxima
+        ult_mov = conn.scalar(select(func.coalesce(func.max(Movement.id), 0)))
+        ult_delta = conn.scalar(select(func.coalesce(func.max(BucketDelta.id), 0)))
+        marcas = None if full else _last_clean_run(conn)
+        if marcas is None:
+            full = True
+            users = sorted(conn.execute(select(Bucket.user_id).distinct()).scalars())
+        else:
+            users = changed_users(conn, *marcas)
+
+    drift: List[BucketDrift] = []
+    baldes = corrigidos = 0
+    for k in range(0, len(users), chunk):
+        lote = users[k:k + chunk]
+        with engine.begin() as conn:
+            rows = conn.execute(expected_stmt(lote)).tuples().all()
+            baldes += len(rows)
+            achados = _drift(rows)
+            if fix and achados:
+                corrigidos += repair(conn, achados)
+        drift.extend(achados)
+
+    rep = ReconcileReport(full, len(users), baldes, tuple(drift), corrigidos,
+                          time.perf_counter() - t0, ult_mov, ult_delta)
+    with engine.begin() as conn:
+        conn.execute(insert(ReconcileRun.__table__).values(
+            started_at=inicio, seconds=rep.seconds, full=full, users=rep.users, buckets=rep.buckets,
+            drifted=len(drift), repaired=corrigidos, last_movement_id=ult_mov, last_delta_id=ult_delta,
+        ))
+    return rep
+
+if __name__ == "__main__":
+    engine: Engine = create_engine(os.getenv("DATABASE_URL", "sqlite:///sql_app.db"), future=True)
+    Base.metadata.create_all(engine)
+    rep = run(engine, full="--full" in sys.argv, fix="--repair" in sys.argv)
+    for d in rep.drift:
+        print(f"divergência: usuário {d.user_id} balde {d.bucket_id} ({d.name}): "
+              f"saldo {d.balance:.2f}, esperado {d.expected:.2f}, diferença {d.diff:+.2f}")
+    print(f"{'completa' if rep.full else 'incremental'}: {rep.users} usuários, {rep.buckets} baldes, "
+          f"{len(rep.drift)} divergências, {rep.repaired} corrigidas em {rep.seconds:.2f} s")
+    sys.exit(1 if len(rep.drift) > rep.repaired else 0)
@@ -0,0 +1,121 @@
+"""Contas recorrentes: regras gravadas uma vez, ocorrências geradas só dentro da janela vista.
+
+Cada regra vira um gerador que salta direto para a primeira ocorrência da
+janela (aritmética de datas, sem percorrer o passado) e para no fim dela; os
+geradores são mesclados por data com heapq.merge. Montar um mês custa
+O(ocorrências no mês), não importa há quanto tempo a regra existe.
+
+Ocorrências em aberto não são gravadas; só as exceções (pagas ou puladas)
+ficam em bill_occurrences, uma linha por (regra, data).
+"""
+import heapq
+from calendar import monthrange
+from datetime import date, timedelta
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import Session
+
+from models import BillOccurrence, BillRule
+
+FREQS = ("monthly", "weekly", "days", "last_business_day")
+FREQ_LABELS = {
+    "monthly": "Mensal",
+    "weekly": "Semanal",
+    "days": "A cada N dias",
+    "last_business_day": "Último dia útil do mês",
+}
+STATUSES = ("open", "paid", "skipped")
+
+class Occurrence(NamedTuple):
+    id: int              # id da regra
+    title: str
+    amount: float
+    due_date: date
+    is_critical: bool
+    status: str = "open"
+
+    @property
+    def paid(self) -> bool:
+        """Paga ou pulada: não pesa no caixa (mesma leitura de Bill.paid)."""
+        return self.status != "open"
+
+def _month_index(d: date) -> int:
+    return d.year * 12 + d.month - 1
+
+def _month_day(idx: int, day: int) -> date:
+    y, m = divmod(idx, 12)
+    return date(y, m + 1, min(day, monthrange(y, m + 1)[1]))
+
+def _last_business_day(idx: int) -> date:
+    d = _month_day(idx, 31)
+    while d.weekday() >= 5:   # sábado/domingo (sem calendário de feriados)
+        d -= timedelta(days=1)
+    return d
+
+def iter_dates(rule, start: date, end: date) -> Iterator[date]:
+    """Datas da regra em [start, end], em ordem, começando direto na primeira da janela."""
+    n = max(rule.interval or 1, 1)
+    lo = max(start, rule.start_date)
+    hi = min(end, rule.end_date) if rule.end_date else end
+    if lo > hi:
+        return
+    if rule.freq in ("days", "weekly"):
+        step = n * (7 if rule.freq == "weekly" else 1)
+        k = -(-(lo - rule.start_date).days // step)     # ceil: primeiro passo >= lo
+        d = rule.start_date + timedelta(days=k * step)
+        while d <= hi:
+            yield d
+            d += timedelta(days=step)
+        return
+    if rule.freq not in ("monthly", "last_business_day"):
+        raise ValueError(f"Frequência desconhecida: {rule.freq}")
+    base = _month_index(rule.start_date)
+    k = max(-(-(_month_index(lo) - base) // n), 0)
+    dia = rule.day or rule.start_date.day
+    while True:
+        idx = base + k * n
+        d = _last_business_day(idx) if rule.freq == "last_business_day" else _month_day(idx, dia)
+        if d > hi:
+            return
+        if d >= lo:
+            yield d
+        k += 1
+
+def iter_occurrences(rules: Iterable, overrides: Iterable, start: date, end: date) -> Iterator[Occurrence]:
+    """Ocorrências de todas as regras em [start, end], por data; `overrides` são BillOccurrenceRow da janela."""
+    status: Dict[Tuple[int, date], str] = {(o.rule_id, o.date): o.status for o in overrides}
+
+    def gen(r) -> Iterator[Occurrence]:
+        for d in iter_dates(r, start, end):
+            yield Occurrence(r.id, r.title, r.amount, d, bool(r.is_critical), status.get((r.id, d), "open"))
+
+    return heapq.merge(*(gen(r) for r in rules), key=lambda o: (o.due_date, o.id))
+
+def month_window(ano: int, mes: int) -> Tuple[date, date]:
+    return date(ano, mes, 1), date(ano, mes, monthrange(ano, mes)[1])
+
+def shift_month(d: date, meses: int) -> date:
+    """Primeiro dia do mês `meses` à frente (ou atrás) de `d`."""
+    return _month_day(_month_index(d) + meses, 1)
+
+# -----------------------------
+# Gravação (operações da fila de escrita: sem commit)
+# -----------------------------
+def set_status(db: Session, user_id: int, rule_id: int, quando: date, status: str) -> Optional[str]:
+    """Marca uma ocorrência como paga/pulada; "open" apaga a exceção e volta ao padrão da regra."""
+    if status not in STATUSES:
+        raise ValueError(f"Situação inválida: {status}")
+    dono = db.get(BillRule, rule_id)
+    if dono is None or dono.user_id != user_id:
+        raise ValueError("Conta recorrente não encontrada.")
+    db.execute(delete(BillOccurrence).where(BillOccurrence.rule_id == rule_id, BillOccurrence.date == quando))
+    if status != "open":
+        db.execute(insert(BillOccurrence), [{"user_id": user_id, "rule_id": rule_id, "date": quando, "status": status}])
+    return status
+
+def delete_rule(db: Session, user_id: int, rule_id: int) -> int:
+    """Apaga a regra e as exceções dela; retorna regras apagadas."""
+    owned = BillRule.id == rule_id, BillRule.user_id == user_id
+    db.execute(delete(BillOccurrence).where(BillOccurrence.rule_id == rule_id, BillOccurrence.user_id == user_id))
+    return db.execute(delete(BillRule).where(*owned)).rowcount
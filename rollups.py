@@ -0,0 +1,104 @@
+"""Rollup mensal de movements (movement_rollups), mantido por triggers do SQLite.
+
+Uso: python rollups.py --verify     compara o rollup com movements e lista divergências
+     python rollups.py --rebuild    recalcula o rollup do zero (todos os usuários)
+"""
+import os
+import sys
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import create_engine, delete, func, insert, select
+from sqlalchemy.engine import Connection, Engine
+
+from models import Base, Movement, MovementRollup
+
+# Chave do rollup: (user_id, COALESCE(bucket_id, 0), 'AAAA-MM', kind)
+_ADD = """
+    INSERT INTO movement_rollups (user_id, bucket_id, year_month, kind, total, count)
+    VALUES (NEW.user_id, COALESCE(NEW.bucket_id, 0), substr(NEW.date, 1, 7), NEW.kind, NEW.amount, 1)
+    ON CONFLICT (user_id, bucket_id, year_month, kind)
+    DO UPDATE SET total = total + excluded.total, count = count + 1;
+"""
+_SUB = """
+    UPDATE movement_rollups SET total = total - OLD.amount, count = count - 1
+     WHERE user_id = OLD.user_id AND bucket_id = COALESCE(OLD.bucket_id, 0)
+       AND year_month = substr(OLD.date, 1, 7) AND kind = OLD.kind;
+    DELETE FROM movement_rollups
+     WHERE user_id = OLD.user_id AND bucket_id = COALESCE(OLD.bucket_id, 0)
+       AND year_month = substr(OLD.date, 1, 7) AND kind = OLD.kind AND count <= 0;
+"""
+TRIGGERS = {
+    "trg_movements_rollup_ins": f"AFTER INSERT ON movements BEGIN {_ADD} END",
+    "trg_movements_rollup_del": f"AFTER DELETE ON movements BEGIN {_SUB} END",
+    "trg_movements_rollup_upd": (
+        "AFTER UPDATE OF user_id, bucket_id, kind, amount, date ON movements "
+        f"BEGIN {_SUB} {_ADD} END"
+    ),
+}
+
+def install_triggers(conn: Connection):
+    for name, body in TRIGGERS.items():
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+def drop_triggers(conn: Connection):
+    for name in TRIGGERS:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+
+def _expected_stmt(user_id: Optional[int] = None):
+    """Rollup recalculado a partir de movements (mesma chave das triggers)."""
+    bucket = func.coalesce(Movement.bucket_id, 0)
+    ym = func.substr(Movement.date, 1, 7)
+    stmt = (select(Movement.user_id, bucket, ym, Movement.kind, func.sum(Movement.amount), func.count())
+            .group_by(Movement.user_id, bucket, ym, Movement.kind))
+    if user_id is not None:
+        stmt = stmt.where(Movement.user_id == user_id)
+    return stmt
+
+def rebuild(conn: Connection, user_id: Optional[int] = None) -> int:
+    """Apaga e recalcula o rollup (de um usuário ou de todos); retorna as linhas gravadas."""
+    stmt = delete(MovementRollup)
+    if user_id is not None:
+        stmt = stmt.where(MovementRollup.user_id == user_id)
+    conn.execute(stmt)
+    cols = ["user_id", "bucket_id", "year_month", "kind", "total", "count"]
+    res = conn.execute(insert(MovementRollup).from_select(cols, _expected_stmt(user_id)))
+    return res.rowcount
+
+class Drift(NamedTuple):
+    user_id: int
+    bucket_id: int
+    year_month: str
+    kind: str
+    expected_total: float
+    rollup_total: float
+    expected_count: int
+    rollup_count: int
+
+def verify(conn: Connection, user_id: Optional[int] = None, tol: float = 0.005) -> List[Drift]:
+    """Linhas em que o rollup diverge de movements (inclui chaves faltando dos dois lados)."""
+    expected = {tuple(r[:4]): (r[4] or 0.0, r[5]) for r in conn.execute(_expected_stmt(user_id))}
+    stmt = select(MovementRollup.user_id, MovementRollup.bucket_id, MovementRollup.year_month,
+                  MovementRollup.kind, MovementRollup.total, MovementRollup.count)
+    if user_id is not None:
+        stmt = stmt.where(MovementRollup.user_id == user_id)
+    actual = {tuple(r[:4]): (r[4], r[5]) for r in conn.execute(stmt)}
+    drift = []
+    for key in sorted(set(expected) | set(actual), key=str):
+        et, ec = expected.get(key, (0.0, 0))
+        at, ac = actual.get(key, (0.0, 0))
+        if ec != ac or abs(et - at) > tol:
+            drift.append(Drift(*key, et, at, ec, ac))
+    return drift
+
+if __name__ == "__main__":
+    engine: Engine = create_engine(os.getenv("DATABASE_URL", "sqlite:///sql_app.db"), future=True)
+    Base.metadata.create_all(engine)
+    if "--rebuild" in sys.argv:
+        with engine.begin() as conn:
+            print(f"rollup recalculado: {rebuild(conn)} linhas")
+    with engine.connect() as conn:
+        drift = verify(conn)
+    for d in drift:
+        print(f"divergência: {d}")
+    print(f"{len(drift)} divergências")
+    sys.exit(1 if drift else 0)
@@ -0,0 +1,202 @@
+"""Busca textual em movements.description e bills.title (FTS5 do SQLite, mantido por triggers).
+
+Uso: python search.py --user demo "mercado"    busca no banco de DATABASE_URL
+     python search.py --rebuild                recria os índices FTS a partir das tabelas
+
+Os índices são tabelas FTS5 de conteúdo externo (só o índice invertido, o texto
+fica nas tabelas originais). O filtro por usuário é feito na junção com a tabela:
+indexar `user_id` como token obrigaria o FTS5 a cruzar a lista enorme do usuário
+com a do termo (~50 ms com 1M de linhas). Sem FTS5 (ou fora do SQLite) a busca
+cai para LIKE, ordenada por data.
+"""
+import os
+import re
+import sys
+import weakref
+from datetime import date
+from itertools import chain, zip_longest
+from typing import List, NamedTuple, Tuple
+
+from sqlalchemy import column, literal, literal_column, select, table
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from models import Bill, Movement
+
+# (tabela FTS, tabela de conteúdo, coluna de texto)
+INDEXES = (
+    ("movements_fts", "movements", "description"),
+    ("bills_fts", "bills", "title"),
+)
+
+def _ddl(fts: str, content: str, col: str) -> str:
+    return (f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{col}, user_id UNINDEXED, content='{content}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+
+def _triggers(fts: str, content: str, col: str) -> dict:
+    add = f"INSERT INTO {fts}(rowid, {col}, user_id) VALUES (NEW.id, NEW.{col}, NEW.user_id);"
+    sub = f"INSERT INTO {fts}({fts}, rowid, {col}, user_id) VALUES ('delete', OLD.id, OLD.{col}, OLD.user_id);"
+    return {
+        f"trg_{fts}_ins": f"AFTER INSERT ON {content} BEGIN {add} END",
+        f"trg_{fts}_del": f"AFTER DELETE ON {content} BEGIN {sub} END",
+        f"trg_{fts}_upd": f"AFTER UPDATE OF {col}, user_id ON {content} BEGIN {sub} {add} END",
+    }
+
+TRIGGERS = {name: body for idx in INDEXES for name, body in _triggers(*idx).items()}
+
+# installed() por engine, para a busca não consultar o sqlite_master a cada tecla;
+# install() e drop() descartam o valor guardado
+_INSTALLED: "weakref.WeakKeyDictionary[Engine, bool]" = weakref.WeakKeyDictionary()
+
+def fts5_available(conn: Connection) -> bool:
+    """O SQLite em uso foi compilado com FTS5?"""
+    if conn.dialect.name != "sqlite":
+        return False
+    try:
+        conn.exec_driver_sql("CREATE VIRTUAL TABLE temp.__fts5_probe USING fts5(x)")
+        conn.exec_driver_sql("DROP TABLE temp.__fts5_probe")
+        return True
+    except Exception:
+        return False
+
+def installed(conn: Connection) -> bool:
+    if conn.dialect.name != "sqlite":
+        return False
+    names = {r[0] for r in conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('movements_fts', 'bills_fts')")}
+    return len(names) == len(INDEXES)
+
+def _installed_cached(conn: Connection) -> bool:
+    ok = _INSTALLED.get(conn.engine)
+    if ok is None:
+        ok = _INSTALLED[conn.engine] = installed(conn)
+    return ok
+
+def install(conn: Connection):
+    """Cria as tabelas FTS, as triggers e indexa o conteúdo já existente."""
+    for fts, content, col in INDEXES:
+        conn.exec_driver_sql(_ddl(fts, content, col))
+    for name, body in TRIGGERS.items():
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+    rebuild(conn)
+    _INSTALLED.pop(conn.engine, None)
+
+def drop(conn: Connection):
+    for name in TRIGGERS:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    for fts, _, _ in INDEXES:
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {fts}")
+    _INSTALLED.pop(conn.engine, None)
+
+def rebuild(conn: Connection):
+    for fts, _, _ in INDEXES:
+        conn.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+# -----------------------------
+# Consulta
+# -----------------------------
+class SearchHit(NamedTuple):
+    source: str          # "movement" ou "bill"
+    id: int
+    date: date           # data da movimentação ou vencimento da conta
+    text: str
+    kind: str            # Receita / Despesa / Conta
+    amount: float
+    rank: float          # bm25 no índice da fonte (menor = mais relevante); não se compara entre fontes
+
+class SearchPage(NamedTuple):
+    hits: Tuple[SearchHit, ...]
+    has_more: bool
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+def fts_query(termos: List[str]) -> str:
+    """Termos -> consulta FTS5: todos os termos; só o último por prefixo (busca enquanto digita).
+
+    Prefixo em todos os termos faria cada palavra curta expandir para milhares de tokens.
+    """
+    return " ".join([f'"{t}"' for t in termos[:-1]] + [f'"{termos[-1]}"*'])
+
+def _fts(name: str):
+    return table(name, column("rowid"), column("rank"))
+
+def _match(name: str, q: str):
+    return literal_column(name).op("MATCH")(q)
+
+def _fts_stmts(uid: int, termos: List[str], n: int):
+    mf, bf = _fts("movements_fts"), _fts("bills_fts")
+    movs = (select(literal("movement"), Movement.id, Movement.date, Movement.description,
+                   Movement.kind, Movement.amount, mf.c.rank)
+            .select_from(mf).join(Movement, Movement.id == mf.c.rowid)
+            .where(_match("movements_fts", fts_query(termos)), Movement.user_id == uid)
+            .order_by(mf.c.rank, Movement.date.desc(), Movement.id.desc()).limit(n))
+    bills = (select(literal("bill"), Bill.id, Bill.due_date, Bill.title,
+                    literal("Conta"), Bill.amount, bf.c.rank)
+             .select_from(bf).join(Bill, Bill.id == bf.c.rowid)
+             .where(_match("bills_fts", fts_query(termos)), Bill.user_id == uid)
+             .order_by(bf.c.rank, Bill.due_date.desc(), Bill.id.desc()).limit(n))
+    return movs, bills
+
+def _like_stmts(uid: int, termos: List[str], n: int):
+    movs = (select(literal("movement"), Movement.id, Movement.date, Movement.description,
+                   Movement.kind, Movement.amount, literal(0.0))
+            .where(Movement.user_id == uid, *[Movement.description.ilike(f"%{t}%") for t in termos])
+            .order_by(Movement.date.desc(), Movement.id.desc()).limit(n))
+    bills = (select(literal("bill"), Bill.id, Bill.due_date, Bill.title,
+                    literal("Conta"), Bill.amount, literal(0.0))
+             .where(Bill.user_id == uid, *[Bill.title.ilike(f"%{t}%") for t in termos])
+             .order_by(Bill.due_date.desc()).limit(n))
+    return movs, bills
+
+def search(db: Session, uid: int, texto: str, limit: int = 20, offset: int = 0) -> SearchPage:
+    """Movimentações e contas do usuário que contêm todos os termos, das mais relevantes às menos."""
+    termos = _TOKEN.findall(texto or "")
+    if not termos:
+        return SearchPage((), False)
+    # Cada fonte devolve no máximo offset+limit+1 linhas, já na sua ordem
+    n = offset + limit + 1
+    fts = _installed_cached(db.connection())
+    stmts = _fts_stmts(uid, termos, n) if fts else _like_stmts(uid, termos, n)
+    fontes = [[SearchHit._make(r) for r in db.execute(stmt).tuples()] for stmt in stmts]
+    if fts:
+        # O bm25 depende das estatísticas de cada índice: as fontes se intercalam pela
+        # posição (1ª movimentação, 1ª conta, 2ª movimentação, ...), não pelo valor do rank
+        hits: List[SearchHit] = [h for h in chain.from_iterable(zip_longest(*fontes)) if h is not None]
+    else:
+        hits = sorted(chain.from_iterable(fontes), key=lambda h: (-h.date.toordinal(), h.id))
+    return SearchPage(tuple(hits[offset:offset + limit]), len(hits) > offset + limit)
+
+# -----------------------------
+# Linha de comando
+# -----------------------------
+if __name__ == "__main__":
+    import argparse
+    from sqlalchemy import create_engine
+    from models import Base, User
+    from migrations import run_migrations
+    from utils import date_br, money_br
+
+    p = argparse.ArgumentParser(description="Busca textual em movimentações e contas.")
+    p.add_argument("texto", nargs="*")
+    p.add_argument("--user", default="demo")
+    p.add_argument("--limit", type=int, default=20)
+    p.add_argument("--rebuild", action="store_true")
+    args = p.parse_args()
+
+    engine = create_engine(os.getenv("DATABASE_URL", "sqlite:///sql_app.db"), future=True)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    if args.rebuild:
+        with engine.begin() as conn:
+            rebuild(conn)
+        print("índices FTS recriados")
+    if args.texto:
+        texto = " ".join(args.texto)
+        with Session(engine) as db:
+            uid = db.execute(select(User.id).where(User.name == args.user)).scalar()
+            if uid is None:
+                print(f"usuário não encontrado: {args.user}", file=sys.stderr)
+                sys.exit(2)
+            for h in search(db, uid, texto, args.limit).hits:
+                print(f"{h.rank:8.3f}  {date_br(h.date):>10}  {h.kind:8} {money_br(h.amount):>14}  {h.text}")
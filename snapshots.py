@@ -0,0 +1,198 @@
+from datetime import date
+from typing import NamedTuple, Optional, Tuple
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session
+
+from money import to_cents, from_cents
+from models import UserProfile, Bucket, Giant, GiantPayment, Movement, Bill, BillRule, BillOccurrence
+
+# -----------------------------
+# Registros imutáveis (tuplas) lidos direto das colunas
+# -----------------------------
+class ProfileRow(NamedTuple):
+    id: int
+    user_id: int
+    monthly_income: float
+    monthly_expense: float
+    last_allocation_date: Optional[date]
+
+class BucketRow(NamedTuple):
+    id: int
+    user_id: int
+    name: str
+    description: str
+    percent: float
+    balance: float
+    type: str
+
+class GiantRow(NamedTuple):
+    id: int
+    user_id: int
+    name: str
+    total_to_pay: float
+    parcels: int
+    priority: int
+    status: str
+    weekly_goal: float
+    interest_rate: float
+    payoff_efficiency: float
+    progress: float
+
+class MovementRow(NamedTuple):
+    id: int
+    user_id: int
+    bucket_id: Optional[int]
+    kind: str
+    amount: float
+    description: str
+    date: date
+
+class BillRow(NamedTuple):
+    id: int
+    user_id: int
+    title: str
+    amount: float
+    due_date: date
+    is_critical: bool
+    paid: bool
+
+class BillRuleRow(NamedTuple):
+    id: int
+    user_id: int
+    title: str
+    amount: float
+    is_critical: bool
+    freq: str
+    interval: int
+    start_date: date
+    end_date: Optional[date]
+    day: Optional[int]
+
+class BillOccurrenceRow(NamedTuple):
+    rule_id: int
+    date: date
+    status: str
+
+class GiantTotalsRow(NamedTuple):
+    giant_id: int
+    paid: float
+    payments: int
+    last_payment: Optional[date]
+    remaining: float
+
+class LedgerFilter(NamedTuple):
+    """Filtros do Livro Caixa; hashable, entra direto na chave do cache."""
+    start: Optional[date] = None
+    end: Optional[date] = None
+    kind: Optional[str] = None         # "Receita" / "Despesa"
+    bucket_id: Optional[int] = None    # 0 = sem balde
+    text: str = ""
+
+class LedgerPage(NamedTuple):
+    rows: Tuple[MovementRow, ...]
+    next_cursor: Optional[Tuple[date, int]]   # (date, id) da última linha, se houver mais
+
+def columns(model, row_cls):
+    """Colunas do model na ordem dos campos do registro."""
+    return [getattr(model, f) for f in row_cls._fields]
+
+def _fetch(db: Session, row_cls, stmt) -> tuple:
+    return tuple(map(row_cls._make, db.execute(stmt).tuples()))
+
+# -----------------------------
+# Consultas
+# -----------------------------
+def profile_stmt(uid: int):
+    return select(*columns(UserProfile, ProfileRow)).where(UserProfile.user_id == uid)
+
+def buckets_stmt(uid: int):
+    return select(*columns(Bucket, BucketRow)).where(Bucket.user_id == uid)
+
+def giants_stmt(uid: int):
+    return select(*columns(Giant, GiantRow)).where(Giant.user_id == uid)
+
+def bills_stmt(uid: int):
+    return select(*columns(Bill, BillRow)).where(Bill.user_id == uid).order_by(Bill.due_date.asc())
+
+def bill_rules_stmt(uid: int):
+    return select(*columns(BillRule, BillRuleRow)).where(BillRule.user_id == uid).order_by(BillRule.id)
+
+def bill_occurrences_stmt(uid: int, start: date, end: date):
+    return (select(*columns(BillOccurrence, BillOccurrenceRow))
+            .where(BillOccurrence.user_id == uid, BillOccurrence.date.between(start, end)))
+
+def movements_stmt(uid: int, limit: int = 300):
+    return (select(*columns(Movement, MovementRow))
+            .where(Movement.user_id == uid).order_by(Movement.date.desc()).limit(limit))
+
+def ledger_stmt(uid: int, flt: LedgerFilter = LedgerFilter(),
+                after: Optional[Tuple[date, int]] = None, limit: int = 50):
+    """Página do Livro Caixa por keyset em (date, id) decrescente: custo igual em qualquer página."""
+    stmt = select(*columns(Movement, MovementRow)).where(Movement.user_id == uid)
+    if flt.start is not None:
+        stmt = stmt.where(Movement.date >= flt.start)
+    if flt.end is not None:
+        stmt = stmt.where(Movement.date <= flt.end)
+    if flt.kind:
+        stmt = stmt.where(Movement.kind == flt.kind)
+    if flt.bucket_id == 0:
+        stmt = stmt.where(Movement.bucket_id.is_(None))
+    elif flt.bucket_id is not None:
+        stmt = stmt.where(Movement.bucket_id == flt.bucket_id)
+    if flt.text:
+        stmt = stmt.where(Movement.description.ilike(f"%{flt.text}%"))
+    if after is not None:
+        stmt = stmt.where(tuple_(Movement.date, Movement.id) < tuple_(*after))
+    return stmt.order_by(Movement.date.desc(), Movement.id.desc()).limit(limit)
+
+def giant_totals_stmt(uid: int, giant_id: Optional[int] = None):
+    """Pago/quantidade/último pagamento de todos os gigantes do usuário num único GROUP BY."""
+    stmt = (select(Giant.id, Giant.total_to_pay,
+                   func.coalesce(func.sum(GiantPayment.amount), 0.0),
+                   func.count(GiantPayment.id),
+                   func.max(GiantPayment.date))
+            .outerjoin(GiantPayment, GiantPayment.giant_id == Giant.id)
+            .where(Giant.user_id == uid)
+            .group_by(Giant.id))
+    if giant_id is not None:
+        stmt = stmt.where(Giant.id == giant_id)
+    return stmt
+
+def fetch_profile(db: Session, uid: int) -> Optional[ProfileRow]:
+    row = db.execute(profile_stmt(uid)).first()
+    return ProfileRow._make(row) if row else None
+
+def fetch_buckets(db: Session, uid: int) -> Tuple[BucketRow, ...]:
+    return _fetch(db, BucketRow, buckets_stmt(uid))
+
+def fetch_giants(db: Session, uid: int) -> Tuple[GiantRow, ...]:
+    return _fetch(db, GiantRow, giants_stmt(uid))
+
+def fetch_bills(db: Session, uid: int) -> Tuple[BillRow, ...]:
+    return _fetch(db, BillRow, bills_stmt(uid))
+
+def fetch_bill_rules(db: Session, uid: int) -> Tuple[BillRuleRow, ...]:
+    return _fetch(db, BillRuleRow, bill_rules_stmt(uid))
+
+def fetch_bill_occurrences(db: Session, uid: int, start: date, end: date) -> Tuple[BillOccurrenceRow, ...]:
+    """Exceções (pagas/puladas) com data na janela [start, end]."""
+    return _fetch(db, BillOccurrenceRow, bill_occurrences_stmt(uid, start, end))
+
+def fetch_movements(db: Session, uid: int, limit: int = 300) -> Tuple[MovementRow, ...]:
+    return _fetch(db, MovementRow, movements_stmt(uid, limit))
+
+def fetch_ledger_page(db: Session, uid: int, flt: LedgerFilter = LedgerFilter(),
+                      after: Optional[Tuple[date, int]] = None, limit: int = 50) -> LedgerPage:
+    # Uma linha a mais diz se existe próxima página, sem COUNT(*)
+    rows = _fetch(db, MovementRow, ledger_stmt(uid, flt, after, limit + 1))
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return LedgerPage(rows, (rows[-1].date, rows[-1].id))
+    return LedgerPage(rows, None)
+
+def fetch_giant_totals(db: Session, uid: int, giant_id: Optional[int] = None) -> Tuple[GiantTotalsRow, ...]:
+    return tuple(
+        GiantTotalsRow(gid, paid or 0.0, n, last, from_cents(max(to_cents(total or 0) - to_cents(paid or 0), 0)))
+        for gid, total, paid, n, last in db.execute(giant_totals_stmt(uid, giant_id))
+    )
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do app ficam na raiz do repositório (sem pacote)
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+APP = os.path.join(RAIZ, "app.py")
+
+@pytest.fixture
+def app_login(monkeypatch):
+    """login(url, usuario, senha) -> AppTest já logado no app.py sobre a base `url`.
+
+    O user_cache é do processo e as bases dos testes repetem ids de usuário,
+    então ele é limpo a cada login.
+    """
+    import bootstrap
+    import user_cache
+    from streamlit.testing.v1 import AppTest
+
+    def login(url: str, usuario: str, senha: str):
+        monkeypatch.setattr(bootstrap, "DB_URL", url)
+        user_cache.USER_CACHE.clear()
+        at = AppTest.from_file(APP, default_timeout=120).run()
+        at.text_input(key="login_user").input(usuario)
+        at.text_input(key="login_pwd").input(senha)
+        next(b for b in at.button if b.label == "Entrar").click().run()
+        assert not at.exception, [e.message for e in at.exception]
+        return at
+    return login
+
+@pytest.fixture
+def runtimes(monkeypatch):
+    """Runtimes que o app.py recebeu de bootstrap.get_runtime; o último é o da execução mais recente.
+
+    O app importa get_runtime a cada rerun, então o wrapper pega o objeto do
+    st.cache_resource (fora de um rerun ele não cacheia).
+    """
+    import bootstrap
+
+    vistos = []
+    original = bootstrap.get_runtime
+
+    def get_runtime(*args, **kwargs):
+        rt = original(*args, **kwargs)
+        vistos.append(rt)
+        return rt
+    monkeypatch.setattr(bootstrap, "get_runtime", get_runtime)
+    return vistos
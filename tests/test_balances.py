@@ -0,0 +1,81 @@
+from datetime import date
+
+from sqlalchemy import create_engine, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from balances import set_balance, verify
+from models import Base, Bucket, BucketDelta, Movement, User
+from migrations import run_migrations
+from reconcile import check
+
+def test_ajuste_manual_fica_so_no_log_e_concilia(tmp_path):
+    """Saldo editado à mão não vira movimentação e a conciliação não acusa divergência."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'saldos.db'}", future=True)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "name": "ana", "password_hash": "x"}])
+        conn.execute(insert(Bucket), [{"id": 1, "user_id": 1, "name": "Reserva", "percent": 100.0,
+                                       "balance": 0.0, "type": "Reserva"}])
+    with Session(engine) as db:
+        assert set_balance(db, 1, 1, 250.75, date(2025, 5, 2)) == 25075
+        assert set_balance(db, 1, 1, 200.0, date(2025, 6, 1)) == -5075
+        db.commit()
+        assert db.scalar(select(func.count()).select_from(Movement)) == 0
+        assert check(db, [1]) == []
+    with engine.connect() as conn:
+        assert verify(conn, 1) == []
+    engine.dispose()
+
+def _base_com_gap(tmp_path, nome: str):
+    """Banco migrado com um balde de saldo 100 e movimentações que só explicam 60."""
+    engine = create_engine(f"sqlite:///{tmp_path / nome}", future=True)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "name": "ana", "password_hash": "x"}])
+        conn.execute(insert(Bucket), [{"id": 1, "user_id": 1, "name": "Contas", "percent": 100.0,
+                                       "balance": 100.0, "type": "Despesa"}])
+        conn.execute(insert(Movement), [{"user_id": 1, "bucket_id": 1, "kind": "Receita", "amount": 60.0,
+                                         "description": "Entrada diária (auto 100%)", "date": date(2025, 1, 5)}])
+    return engine
+
+def _drift(engine):
+    with Session(engine) as db:
+        return [(d.bucket_id, d.balance, d.expected) for d in check(db, [1])]
+
+def test_diferenca_da_carga_inicial_continua_divergencia(tmp_path):
+    """A migração 7 grava a diferença saldo - movimentações como historico_gap, que a conciliação aponta."""
+    engine = _base_com_gap(tmp_path, "carga.db")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM bucket_deltas")
+        conn.exec_driver_sql("DELETE FROM schema_migrations WHERE version >= 7")
+    run_migrations(engine)
+    with engine.connect() as conn:
+        fontes = dict(conn.exec_driver_sql("SELECT source, SUM(delta) FROM bucket_deltas GROUP BY source").all())
+    assert set(fontes) == {"historico", "historico_gap"}
+    assert _drift(engine) == [(1, 100.0, 60.0)]
+    engine.dispose()
+
+def test_migracao_10_separa_ajuste_da_diferenca_da_carga(tmp_path):
+    """Ajuste antigo com movimentação continua "ajuste" (e perde a movimentação); o resto vira historico_gap."""
+    engine = _base_com_gap(tmp_path, "m10.db")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM schema_migrations WHERE version = 10")
+        conn.execute(update(Bucket).values(balance=105.0))
+        conn.execute(insert(BucketDelta), [
+            {"user_id": 1, "bucket_id": 1, "date": date(2025, 1, 5), "delta": 60.0, "source": "historico"},
+            {"user_id": 1, "bucket_id": 1, "date": date(2025, 2, 1), "delta": 40.0, "source": "ajuste"},
+            {"user_id": 1, "bucket_id": 1, "date": date(2025, 3, 1), "delta": 5.0, "source": "ajuste"},
+        ])
+        conn.execute(insert(Movement), [{"user_id": 1, "bucket_id": 1, "kind": "Receita", "amount": 5.0,
+                                         "description": "Ajuste manual de saldo", "date": date(2025, 3, 1)}])
+    run_migrations(engine)
+    with engine.connect() as conn:
+        fontes = conn.exec_driver_sql("SELECT date, source FROM bucket_deltas ORDER BY date").all()
+        ajustes = conn.exec_driver_sql(
+            "SELECT COUNT(*) FROM movements WHERE description = 'Ajuste manual de saldo'").scalar()
+    assert [f[1] for f in fontes] == ["historico", "historico_gap", "ajuste"]
+    assert ajustes == 0
+    assert _drift(engine) == [(1, 105.0, 65.0)]
+    engine.dispose()
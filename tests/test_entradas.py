@@ -0,0 +1,90 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+@pytest.fixture
+def db_url(tmp_path):
+    from migrations import run_migrations
+    from models import Base, Bucket, User
+    from utils import hash_password
+
+    url = f"sqlite:///{tmp_path / 'entradas.db'}"
+    engine = create_engine(url, future=True)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "name": "ana", "password_hash": hash_password("x")}])
+        conn.execute(insert(Bucket), [
+            {"id": 1, "user_id": 1, "name": "Contas", "percent": 70.0, "balance": 0.0, "type": "Despesa"},
+            {"id": 2, "user_id": 1, "name": "Reserva", "percent": 30.0, "balance": 0.0, "type": "Reserva"},
+        ])
+    engine.dispose()
+    return url
+
+def _totais(url: str):
+    from aggregates import totals_by_kind
+    from rollups import verify
+
+    engine = create_engine(url, future=True)
+    try:
+        with Session(engine) as db:
+            totais = totals_by_kind(db, 1)
+        with engine.connect() as conn:
+            drift = verify(conn, 1)
+    finally:
+        engine.dispose()
+    return totais, drift
+
+def test_entrada_e_saida_contam_uma_vez(db_url, app_login):
+    """O rateio grava só as linhas por balde: receitas e despesas somam o valor lançado, sem linha pai."""
+    at = app_login(db_url, "ana", "x")
+    at.sidebar.radio[0].set_value("Entradas").run()
+    at.text_input(key="entrada_valor__txt").input("100,00")
+    next(b for b in at.button if b.label == "Registrar Entrada").click().run()
+    assert not at.exception, [e.message for e in at.exception]
+    at.run()                                  # o registro encerra o rerun com st.stop()
+    at.text_input(key="saida_valor__txt").input("10,00")
+    next(b for b in at.button if b.label == "Registrar Saída").click().run()
+    assert not at.exception, [e.message for e in at.exception]
+
+    totais, drift = _totais(db_url)
+    assert (totais.receitas, totais.despesas) == (100.0, 10.0)
+    assert drift == []
+
+def test_migracao_remove_linha_pai(db_url):
+    """A migração 9 apaga a linha pai que o rateio do mesmo dia cobre e refaz o rollup."""
+    from migrations import run_migrations
+    from models import Movement
+
+    dia = date(2025, 3, 10)
+    engine = create_engine(db_url, future=True)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM schema_migrations WHERE version = 9")
+        conn.execute(insert(Movement), [
+            {"user_id": 1, "bucket_id": None, "date": dia, "kind": "Receita", "amount": 100.0, "description": "Entrada (rateada)"},
+            {"user_id": 1, "bucket_id": 1, "date": dia, "kind": "Receita", "amount": 70.0,
+             "description": "Entrada diária (auto 70%)"},
+            {"user_id": 1, "bucket_id": 2, "date": dia, "kind": "Receita", "amount": 30.0,
+             "description": "Entrada diária (auto 30%)"},
+            # duas entradas no mesmo dia, com um centavo de arredondamento no rateio antigo
+            {"user_id": 1, "bucket_id": None, "date": dia, "kind": "Receita", "amount": 50.0, "description": "Entrada (rateada)"},
+            {"user_id": 1, "bucket_id": 1, "date": dia, "kind": "Receita", "amount": 35.01,
+             "description": "Entrada diária (auto 70%)"},
+            {"user_id": 1, "bucket_id": 2, "date": dia, "kind": "Receita", "amount": 15.0,
+             "description": "Entrada diária (auto 30%)"},
+            {"user_id": 1, "bucket_id": None, "date": dia, "kind": "Despesa", "amount": 10.0, "description": "Saída (Contas)"},
+            {"user_id": 1, "bucket_id": 1, "date": dia, "kind": "Despesa", "amount": 10.0,
+             "description": "Saída do balde Contas"},
+            # sem rateio correspondente: ficam
+            {"user_id": 1, "bucket_id": None, "date": dia, "kind": "Despesa", "amount": 5.0, "description": "Saída (Reserva)"},
+            {"user_id": 1, "bucket_id": None, "date": date(2025, 3, 11), "kind": "Receita", "amount": 20.0,
+             "description": "Entrada (rateada)"},
+        ])
+    run_migrations(engine)
+    engine.dispose()
+
+    totais, drift = _totais(db_url)
+    assert (totais.receitas, totais.despesas) == (170.01, 15.0)
+    assert drift == []
@@ -0,0 +1,54 @@
+import io
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+
+from importer import ERROR_SAMPLES, HASH_WINDOW_DAYS, StatementRow, _Hasher, import_file
+
+@pytest.fixture
+def engine(tmp_path):
+    from migrations import run_migrations
+    from models import Base, User
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'importer.db'}", future=True)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{"id": 1, "name": "ana", "password_hash": "x"}])
+    yield engine
+    engine.dispose()
+
+def _importar(engine, texto: str):
+    return import_file(engine, 1, io.StringIO(texto), "extrato.csv", batch_size=2)
+
+def test_linhas_iguais_fora_de_sequencia_nao_sao_duplicatas(engine):
+    """O mesmo lançamento repetido em dias alternados conta as duas vezes, e reimportar não duplica."""
+    csv = ("data;valor;descricao\n"
+           "01/03/2025;-10,00;Padaria\n"
+           "02/03/2025;-5,00;Onibus\n"
+           "01/03/2025;-10,00;Padaria\n")
+    rep = _importar(engine, csv)
+    assert (rep.read, rep.inserted, rep.duplicates) == (3, 3, 0)
+    rep = _importar(engine, csv)
+    assert (rep.read, rep.inserted, rep.duplicates) == (3, 0, 3)
+
+def test_erros_contam_todos_e_guardam_amostra(engine):
+    from models import Movement
+
+    csv = "data;valor;descricao\n" + "xx/03/2025;-1,00;ruim\n" * 50 + "03/03/2025;-1,00;boa\n"
+    rep = _importar(engine, csv)
+    assert rep.errors == 50
+    assert len(rep.error_samples) == ERROR_SAMPLES
+    assert rep.error_samples[0].startswith("linha 2:")
+    with engine.connect() as conn:
+        assert conn.execute(select(Movement.description)).scalars().all() == ["boa"]
+
+def test_contador_de_ocorrencias_fica_limitado():
+    """Num extrato longo, só os contadores dos últimos HASH_WINDOW_DAYS dias ficam em memória."""
+    h = _Hasher(1)
+    inicio = date(2020, 1, 1)
+    for i in range(20_000):
+        h(StatementRow(inicio + timedelta(days=i // 10), -1.0, f"compra {i % 10}"), -100)
+    assert len(h.days) == HASH_WINDOW_DAYS
+    assert sum(len(v) for v in h.days.values()) <= HASH_WINDOW_DAYS * 10
@@ -0,0 +1,41 @@
+import sqlite3
+
+from maintenance import NOT_CONVERTED, Maintainer, _convert
+from writer import WriteQueue, make_write_engine
+
+def _auto_vacuum(path: str) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+
+def test_vacuum_automatico_nao_converte_o_banco(tmp_path):
+    """Com auto_vacuum=NONE a passada registra o pulo (uma vez); a conversão é só pelo --convert."""
+    path = str(tmp_path / "m.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE t (x TEXT)")
+        conn.executemany("INSERT INTO t VALUES (?)", [("x" * 500,)] * 2000)
+        conn.execute("DELETE FROM t")
+    wq = WriteQueue(make_write_engine(f"sqlite:///{path}"))
+    try:
+        m = Maintainer(wq, path, idle_after=0)
+        vacuum = [r for r in m.tick(force=True) if r.task == "vacuum"]
+        assert [r.detail for r in vacuum] == [NOT_CONVERTED]
+        assert not [r for r in m.tick(force=True) if r.task == "vacuum"]
+        assert m.stats()["auto_vacuum"] == "NONE"
+        assert _auto_vacuum(path) == 0
+
+        run = m._run("convert", _convert)
+        assert not run.error and run.reclaimed > 0
+        assert _auto_vacuum(path) == 2
+        m.tick(force=True)
+        assert m.stats()["auto_vacuum"] == "INCREMENTAL"
+    finally:
+        wq.close()
+
+def test_banco_novo_nasce_com_vacuum_incremental(tmp_path):
+    import bootstrap
+
+    path = str(tmp_path / "novo.db")
+    engine = bootstrap._make_engine(f"sqlite:///{path}")
+    bootstrap._create_schema(engine)
+    engine.dispose()
+    assert _auto_vacuum(path) == 2
@@ -0,0 +1,7 @@
+from migrations import check_plans, full_scans
+
+def test_loader_plans_use_indexes():
+    """Nenhum loader faz full scan nem ordena em B-tree temporária no schema migrado."""
+    plans = check_plans()
+    assert plans
+    assert full_scans(plans) == {}
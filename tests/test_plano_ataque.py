@@ -0,0 +1,55 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event, insert
+
+GIGANTES = (5, 50, 200)
+
+@pytest.fixture(scope="module")
+def db_url(tmp_path_factory):
+    from migrations import run_migrations
+    from models import Base, Giant, GiantPayment, User
+    from utils import hash_password
+
+    url = f"sqlite:///{tmp_path_factory.mktemp('plano') / 'plano.db'}"
+    engine = create_engine(url, future=True)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    d0 = date(2025, 1, 1)
+    with engine.begin() as conn:
+        for uid, n in enumerate(GIGANTES, start=1):
+            conn.execute(insert(User), [{"id": uid, "name": f"g{n}", "password_hash": hash_password("x")}])
+            base = uid * 1000
+            conn.execute(insert(Giant), [
+                {"id": base + g, "user_id": uid, "name": f"gigante {g}", "total_to_pay": 5_000.0,
+                 "weekly_goal": 50.0, "interest_rate": 0.02, "priority": g % 3 + 1}
+                for g in range(n)
+            ])
+            conn.execute(insert(GiantPayment), [
+                {"user_id": uid, "giant_id": base + g, "amount": 25.0, "date": d0 + timedelta(days=7 * i)}
+                for g in range(n) for i in range(3)
+            ])
+    engine.dispose()
+    return url
+
+def _consultas_plano(at, rt) -> int:
+    """Consultas do rerun que abre o Plano de Ataque (loaders de gigantes ainda frios)."""
+    total = [0]
+    def contar(*_):
+        total[0] += 1
+    engines = {id(e): e for e in (rt.engine, rt.reader)}.values()
+    for e in engines:
+        event.listen(e, "before_cursor_execute", contar)
+    try:
+        at.sidebar.radio[0].set_value("Plano de Ataque").run()
+    finally:
+        for e in engines:
+            event.remove(e, "before_cursor_execute", contar)
+    assert not at.exception, [x.message for x in at.exception]
+    return total[0]
+
+def test_plano_ataque_queries_do_not_grow_with_giants(db_url, app_login, runtimes):
+    """load_giants + load_giant_totals (e o resto da página) não fazem uma consulta por gigante."""
+    contagens = {n: _consultas_plano(app_login(db_url, f"g{n}", "x"), runtimes[-1]) for n in GIGANTES}
+    assert contagens[GIGANTES[0]] > 0
+    assert len(set(contagens.values())) == 1, contagens
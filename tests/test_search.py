@@ -0,0 +1,54 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session
+
+import search
+from search import search as buscar
+
+@pytest.fixture
+def engine(tmp_path):
+    from migrations import run_migrations
+    from models import Base, Bill, Movement, User
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}", future=True)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    with engine.connect() as conn:
+        if not search.installed(conn):
+            pytest.skip("SQLite sem FTS5")
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "name": "ana", "password_hash": "x"}])
+        # muitas movimentações com o termo: o bm25 delas fica bem diferente do das contas
+        conn.execute(insert(Movement), [
+            {"user_id": 1, "bucket_id": None, "kind": "Despesa", "amount": 1.0,
+             "description": f"mercado {i}", "date": date(2025, 1, 1 + i % 28)} for i in range(30)
+        ])
+        conn.execute(insert(Bill), [
+            {"user_id": 1, "title": f"mercado conta {i}", "amount": 2.0, "due_date": date(2025, 2, 1 + i)}
+            for i in range(3)
+        ])
+    yield engine
+    engine.dispose()
+
+def test_fontes_intercaladas_pela_posicao(engine):
+    """Movimentações e contas se alternam na página, cada fonte na sua ordem de relevância."""
+    with Session(engine) as db:
+        pagina = buscar(db, 1, "mercado", limit=8)
+    assert [h.source for h in pagina.hits] == ["movement", "bill"] * 3 + ["movement"] * 2
+    assert pagina.has_more
+    with Session(engine) as db:
+        seguinte = buscar(db, 1, "mercado", limit=8, offset=8)
+    assert {(h.source, h.id) for h in pagina.hits}.isdisjoint((h.source, h.id) for h in seguinte.hits)
+
+def test_installed_consultado_uma_vez_por_engine(engine):
+    consultas = []
+    def contar(conn, cursor, statement, *_):
+        if "sqlite_master" in statement:
+            consultas.append(statement)
+    event.listen(engine, "before_cursor_execute", contar)
+    with Session(engine) as db:
+        for _ in range(3):
+            buscar(db, 1, "mercado")
+    assert len(consultas) == 1
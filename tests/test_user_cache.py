@@ -0,0 +1,18 @@
+import logging
+import time
+
+from user_cache import prefetch, user_cached
+
+def test_prefetch_registra_falha_do_loader(caplog):
+    """Erro de um loader na thread de pré-carga vai para o log, não some."""
+    @user_cached("teste")
+    def quebra(uid: int):
+        raise RuntimeError("banco fora")
+
+    with caplog.at_level(logging.ERROR, logger="user_cache"):
+        prefetch(quebra, 1)
+        limite = time.monotonic() + 5
+        while not any(r.exc_info for r in caplog.records) and time.monotonic() < limite:
+            time.sleep(0.01)
+    erros = [r for r in caplog.records if r.exc_info]
+    assert erros and "banco fora" in str(erros[0].exc_info[1])
@@ -0,0 +1,146 @@
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from metrics import count
+
+# Entidades cacheadas por usuário
+PROFILE   = "profile"
+BUCKETS   = "buckets"
+GIANTS    = "giants"
+BILLS     = "bills"
+MOVEMENTS = "movements"
+SEARCH    = "search"
+
+# Entidades derivadas: invalidar a origem invalida também estas
+DEPENDENTS = {
+    MOVEMENTS: (SEARCH,),
+    BILLS:     (SEARCH,),
+}
+
+class UserCache:
+    """Cache em processo com chave (user_id, entidade, args) e invalidação por versão.
+
+    Os valores são guardados por referência, então os loaders devem devolver
+    estruturas imutáveis (ver snapshots.py). Uma leitura iniciada antes de uma
+    invalidação não grava o valor antigo no cache.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[Tuple, Tuple[int, float, Any]]" = OrderedDict()
+        self._versions: Dict[Tuple[int, str], int] = {}
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def version(self, uid: int, entity: str) -> int:
+        return self._versions.get((uid, entity), 0)
+
+    def get_or_load(self, uid: int, entity: str, args: Tuple[Hashable, ...],
+                    loader: Callable[[], Any], ttl: float) -> Any:
+        key = (uid, entity, args)
+        now = time.monotonic()
+        with self._lock:
+            ver = self.version(uid, entity)
+            hit = self._entries.get(key)
+            if hit is not None:
+                hit_ver, expires, value = hit
+                if hit_ver == ver and expires > now:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    count("cache_hits")
+                    return value
+                del self._entries[key]
+                self._counters["evictions"] += 1
+            self._counters["misses"] += 1
+            count("cache_misses")
+
+        value = loader()
+        with self._lock:
+            if self.version(uid, entity) == ver:
+                self._entries[key] = (ver, time.monotonic() + ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._counters["evictions"] += 1
+        return value
+
+    def invalidate(self, uid: int, *entities: str):
+        """Invalida só as entidades informadas do usuário (todas, se nenhuma for passada)."""
+        with self._lock:
+            if not entities:
+                entities = tuple({e for (u, e) in self._versions if u == uid} |
+                                 {k[1] for k in self._entries if k[0] == uid})
+            else:
+                entities = tuple(dict.fromkeys(entities + tuple(d for e in entities for d in DEPENDENTS.get(e, ()))))
+            for entity in entities:
+                self._versions[(uid, entity)] = self.version(uid, entity) + 1
+                self._counters["invalidations"] += 1
+            stale = [k for k in self._entries if k[0] == uid and k[1] in entities]
+            for k in stale:
+                del self._entries[k]
+            self._counters["evictions"] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._counters["evictions"] += len(self._entries)
+            self._entries.clear()
+            for k in self._versions:
+                self._versions[k] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._counters)
+            s["entries"] = len(self._entries)
+        total = s["hits"] + s["misses"]
+        s["hit_rate"] = (s["hits"] / total) if total else 0.0
+        return s
+
+# Instância única do processo (módulos importados sobrevivem aos reruns do Streamlit)
+USER_CACHE = UserCache()
+
+def user_cached(entity: str, ttl: float = 120):
+    """Decorator para loaders `fn(uid, *args)` cacheados por (uid, entidade)."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(uid: int, *args):
+            # o nome do loader entra na chave: vários loaders compartilham a mesma entidade
+            return USER_CACHE.get_or_load(uid, entity, (fn.__qualname__,) + args, lambda: fn(uid, *args), ttl)
+        return wrapper
+    return deco
+
+# Pré-carga em segundo plano (ex.: próxima página do Livro Caixa). Roda fora do
+# script do Streamlit: os loaders não podem usar `st` (app.read_session).
+log = logging.getLogger(__name__)
+_PREFETCH = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch")
+_pending: set = set()
+_pending_lock = threading.Lock()
+
+def prefetch(loader: Callable, uid: int, *args):
+    """Aquece o cache de um loader `@user_cached` numa thread; repetir a chamada não enfileira de novo."""
+    key = (loader.__qualname__, uid) + args
+    with _pending_lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+
+    def run():
+        try:
+            loader(uid, *args)
+        except Exception:
+            # a leitura de verdade, no próximo rerun, mostra o erro na página
+            log.exception("prefetch de %s falhou (usuário %s)", loader.__qualname__, uid)
+        finally:
+            with _pending_lock:
+                _pending.discard(key)
+    _PREFETCH.submit(run)
+
+def invalidate(uid: int, *entities: str):
+    USER_CACHE.invalidate(uid, *entities)
+
+def cache_stats() -> Dict[str, Any]:
+    return USER_CACHE.stats()
@@ -1,18 +1,49 @@
+import hashlib
+import re
 from calendar import monthrange
-from babel.numbers import format_currency as babel_format_currency
-from babel.dates import format_date as babel_format_date
+from datetime import date
 
+def _to_float_br(texto: str) -> float:
+    if texto is None:
+        return 0.0
+    s = str(texto).strip()
+    s = re.sub(r"[^0-9,\.]", "", s)
+    if s == "":
+        return 0.0
+    if "," in s and "." in s:
+        s = s.replace(".", "").replace(",", ".")
+    elif "," in s:
+        s = s.replace(",", ".")
+    try:
+        return float(s)
+    except ValueError:
+        return 0.0
+
+# babel entra na primeira formatação, não no import (a tela de login não formata nada)
 def money_br(v: float) -> str:
     try:
-        return babel_format_currency(float(v), 'BRL', locale='pt_BR')
+        from babel.numbers import format_currency
+        return format_currency(float(v), 'BRL', locale='pt_BR')
     except Exception:
         return f"R$ {float(v):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
 def date_br(d) -> str:
     try:
-        return babel_format_date(d, format='short', locale='pt_BR')
+        from babel.dates import format_date
+        return format_date(d, format='short', locale='pt_BR')
     except Exception:
         return d.strftime('%d/%m/%y') if hasattr(d, "strftime") else str(d)
 
+def mes_br(meses: int, hoje=None) -> str:
+    """'mm/aaaa' do mês `meses` à frente de hoje (1 = mês atual); '—' se negativo."""
+    if meses is None or meses < 1:
+        return "—"
+    hoje = hoje or date.today()
+    n = hoje.year * 12 + hoje.month - 1 + meses - 1
+    return f"{n % 12 + 1:02d}/{n // 12}"
+
 def dias_do_mes(d) -> int:
     return monthrange(d.year, d.month)[1]
+
+def hash_password(plain: str) -> str:
+    return hashlib.sha256(plain.encode("utf-8")).hexdigest()
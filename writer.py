@@ -0,0 +1,240 @@
+"""Fila de escrita com um único escritor (SQLite aceita um writer por vez).
+
+Uma thread dedicada é dona da conexão de escrita: drena a fila, roda várias
+operações na mesma transação (commit em grupo, cada operação no seu SAVEPOINT)
+e devolve os resultados por futures só depois do commit. "database is locked"
+(outro processo escrevendo) vira nova tentativa com backoff exponencial.
+
+Operações são funções `op(db: Session) -> T`: não fazem commit nem chamam
+`st.*` (rodam fora da thread do Streamlit). `run_direct` é a exceção para
+manutenção (VACUUM, checkpoint): roda sozinha, na conexão crua, sem transação.
+"""
+import math
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker
+
+T = TypeVar("T")
+
+def make_write_engine(db_url: str) -> Engine:
+    """Engine de uma conexão só; no SQLite cada transação abre com BEGIN IMMEDIATE.
+
+    O pysqlite não emite BEGIN antes de SAVEPOINT e abre transações tarde demais;
+    com isolation_level=None o BEGIN fica por nossa conta (receita da documentação
+    do SQLAlchemy), e IMMEDIATE pega o lock de escrita já no início.
+    """
+    sqlite = db_url.startswith("sqlite")
+    engine = create_engine(
+        db_url, pool_size=1, max_overflow=0, pool_pre_ping=not sqlite, future=True,
+        connect_args={"check_same_thread": False} if sqlite else {},
+    )
+    if sqlite:
+        @event.listens_for(engine, "connect")
+        def _connect(dbapi_conn, _):
+            dbapi_conn.isolation_level = None
+            cur = dbapi_conn.cursor()
+            cur.execute("PRAGMA foreign_keys=ON")
+            cur.execute("PRAGMA busy_timeout=100")  # espera curta; o resto é backoff nosso
+            cur.close()
+
+        @event.listens_for(engine, "begin")
+        def _begin(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+    return engine
+
+def _p95(sorted_ms: List[float]) -> float:
+    return sorted_ms[max(math.ceil(len(sorted_ms) * 0.95) - 1, 0)] if sorted_ms else 0.0
+
+def _is_busy(exc: BaseException) -> bool:
+    msg = str(getattr(exc, "orig", exc)).lower()
+    return isinstance(exc, OperationalError) and ("locked" in msg or "busy" in msg)
+
+class _Op:
+    __slots__ = ("fn", "future", "enqueued", "direct")
+
+    def __init__(self, fn: Callable[[Any], Any], direct: bool = False):
+        self.fn = fn
+        self.future: Future = Future()
+        self.enqueued = time.perf_counter()
+        self.direct = direct
+
+_STOP = object()
+
+class WriteQueue:
+    """Serializa as escritas do processo numa thread com commit em grupo."""
+
+    def __init__(self, engine: Engine, max_batch: int = 64, max_retries: int = 8,
+                 base_delay: float = 0.01, max_delay: float = 0.5):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._Session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, future=True)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._commit_ms: deque = deque(maxlen=512)
+        self._wait_ms: deque = deque(maxlen=512)
+        self._counters = {"ops": 0, "failed_ops": 0, "batches": 0, "retries": 0,
+                          "failed_batches": 0, "max_depth": 0,
+                          "wait_ms": 0.0, "busy_ms": 0.0}   # acumulados: espera na fila e em "database is locked"
+        self._last_op = time.monotonic()
+        self._thread = threading.Thread(target=self._loop, name="sqlite-writer", daemon=True)
+        self._thread.start()
+
+    # -------- API --------
+    def submit(self, fn: Callable[[Session], T]) -> "Future[T]":
+        return self._enqueue(_Op(fn))
+
+    def _enqueue(self, op: _Op) -> Future:
+        self._queue.put(op)
+        depth = self._queue.qsize()
+        with self._lock:
+            if depth > self._counters["max_depth"]:
+                self._counters["max_depth"] = depth
+        return op.future
+
+    def run(self, fn: Callable[[Session], T], timeout: Optional[float] = 60) -> T:
+        """Enfileira e espera o commit; exceções da operação sobem para quem chamou."""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("WriteQueue.run chamado de dentro de uma operação de escrita.")
+        return self.submit(fn).result(timeout)
+
+    def run_direct(self, fn: Callable[[Any], T], timeout: Optional[float] = 600) -> T:
+        """Roda `fn(conexão DB-API)` na thread do escritor, sozinha e fora de transação.
+
+        Para comandos que o SQLite não aceita dentro de BEGIN (VACUUM, wal_checkpoint);
+        enquanto ela roda, nenhuma escrita do processo disputa o lock.
+        """
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("WriteQueue.run_direct chamado de dentro de uma operação de escrita.")
+        return self._enqueue(_Op(fn, direct=True)).result(timeout)
+
+    def idle_seconds(self) -> float:
+        """Segundos desde o último lote de escrita do app (0 se há operações na fila)."""
+        if self._queue.qsize():
+            return 0.0
+        return time.monotonic() - self._last_op
+
+    def close(self, timeout: float = 5.0):
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._counters)
+            commits = sorted(self._commit_ms)
+            waits = sorted(self._wait_ms)
+        s["depth"] = self._queue.qsize()
+        s["avg_batch"] = (s["ops"] / s["batches"]) if s["batches"] else 0.0
+        s["commit_ms_avg"] = (sum(commits) / len(commits)) if commits else 0.0
+        s["commit_ms_p95"] = _p95(commits)
+        s["wait_ms_p95"] = _p95(waits)
+        return s
+
+    # -------- thread do escritor --------
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    op = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if op is _STOP:
+                    stop = True
+                    break
+                batch.append(op)
+            self._dispatch(batch)
+            if stop:
+                return
+
+    def _dispatch(self, ops: List[_Op]):
+        """Operações diretas quebram o lote: o que veio antes é commitado antes delas."""
+        pending: List[_Op] = []
+        for op in ops:
+            if not op.direct:
+                pending.append(op)
+                continue
+            if pending:
+                self._run_batch(pending)
+                pending = []
+            self._run_direct(op)
+        if pending:
+            self._run_batch(pending)
+
+    def _run_direct(self, op: _Op):
+        conn = self.engine.raw_connection()
+        try:
+            op.future.set_result(op.fn(conn.driver_connection))
+        except Exception as e:
+            op.future.set_exception(e)
+        finally:
+            conn.close()
+
+    def _run_batch(self, batch: List[_Op]):
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            tentativa = time.perf_counter()
+            try:
+                results = self._execute(batch)
+                break
+            except Exception as e:
+                if _is_busy(e) and attempt < self.max_retries:
+                    delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+                    time.sleep(delay * random.uniform(0.5, 1.0))
+                    with self._lock:
+                        self._counters["retries"] += 1
+                        self._counters["busy_ms"] += (time.perf_counter() - tentativa) * 1000
+                    continue
+                with self._lock:
+                    self._counters["failed_batches"] += 1
+                    self._counters["failed_ops"] += len(batch)
+                for op in batch:
+                    op.future.set_exception(e)
+                return
+        elapsed = (time.perf_counter() - start) * 1000
+        self._last_op = time.monotonic()
+        with self._lock:
+            self._counters["batches"] += 1
+            self._counters["ops"] += len(batch)
+            self._commit_ms.append(elapsed)
+            for op in batch:
+                self._wait_ms.append((start - op.enqueued) * 1000)
+                self._counters["wait_ms"] += (start - op.enqueued) * 1000
+        for op, (value, exc) in zip(batch, results):
+            if exc is None:
+                op.future.set_result(value)
+            else:
+                with self._lock:
+                    self._counters["failed_ops"] += 1
+                op.future.set_exception(exc)
+
+    def _execute(self, batch: List[_Op]) -> List[Tuple[Any, Optional[BaseException]]]:
+        """Uma transação para o lote; erro numa operação desfaz só o SAVEPOINT dela."""
+        results: List[Tuple[Any, Optional[BaseException]]] = []
+        with self._Session() as db:
+            with db.begin():
+                for op in batch:
+                    try:
+                        with db.begin_nested():
+                            value = op.fn(db)
+                        results.append((value, None))
+                    except Exception as e:
+                        if _is_busy(e):
+                            raise  # a transação inteira é refeita
+                        results.append((None, e))
+        return results